@@ -4,6 +4,7 @@ from pydantic import BaseModel
 from typing import Optional, Dict, List, Any
 import subprocess
 import os
+import signal
 import sys
 import shlex
 import threading
@@ -192,7 +193,8 @@ async def run_foambench(request: RunRequest, background_tasks: BackgroundTasks):
                 stderr=log_file,
                 text=True,
                 bufsize=1,  # Line buffered
-                cwd=os.path.dirname(os.path.abspath(__file__))
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                start_new_session=True  # Its own process group, so that stopping it reaches every child
             )
         
         # Register the process
@@ -274,14 +276,18 @@ async def stop_process(process_id: str, background_tasks: BackgroundTasks):
             )
         
         try:
-            process_info["process"].terminate()
+            # Signal the whole process group: the workflow and its shells, which stop the Allrun they started
+            os.killpg(process_info["process"].pid, signal.SIGTERM)
             
             # Give it a few seconds to terminate gracefully
             def wait_and_kill(pid, proc):
                 try:
-                    proc.wait(timeout=5)
+                    proc.wait(timeout=10)
                 except subprocess.TimeoutExpired:
-                    proc.kill()
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
                 
                 with process_lock:
                     if pid in processes:
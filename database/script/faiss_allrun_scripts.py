@@ -8,6 +8,8 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_core.documents import Document
 
+from faiss_store import save_payloads, save_metadata_index
+
 
 def extract_field(field_name: str, text: str) -> str:
     """Extract the specified field from the given text."""
@@ -52,6 +54,7 @@ def main():
         raise ValueError("No cases found in the input file. Please check the file content.")
 
     documents = []
+    payloads = []
     for match in matches:
         # Extract <index> content
         index_match = re.search(r"<index>(.*?)</index>", match, re.DOTALL)
@@ -77,16 +80,19 @@ def main():
         script_match = re.search(r"<allrun_script>([\s\S]*?)</allrun_script>", full_content)
         case_allrun_script = script_match.group(1).strip() if script_match else "Unknown"
 
+        # Large fields go to the side store, the docstore only references them by payload_id
+        payload_id = str(len(documents))
+        payloads.append((payload_id, {"full_content": full_content, "allrun_script": case_allrun_script}))
+
         doc = Document(
             page_content=tokenize(index_content + dir_structure),
             metadata={
-                "full_content": full_content,
+                "payload_id": payload_id,
                 "case_name": case_name,
                 "case_domain": case_domain,
                 "case_category": case_category,
                 "case_solver": case_solver,
                 "dir_structure": dir_structure,
-                "allrun_script": case_allrun_script,
             },
         )
         documents.append(doc)
@@ -99,6 +105,12 @@ def main():
     persist_directory = os.path.join(database_path, "faiss/openfoam_allrun_scripts")
     vectordb.save_local(persist_directory)
 
+    # Step 6: Save the large fields outside of the pickled docstore
+    save_payloads(persist_directory, payloads)
+
+    # Step 7: Save the per-solver/domain/category document subsets
+    save_metadata_index(persist_directory, documents)
+
     print(f"{len(documents)} cases indexed successfully with metadata! Saved at: {persist_directory}")
 
 
@@ -1,5 +1,6 @@
 import os
 import re
+import json
 import argparse
 from pathlib import Path
 
@@ -7,6 +8,8 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_core.documents import Document
 
+from faiss_store import save_payloads
+
 def tokenize(text: str) -> str:
     # Replace underscores with spaces
     text = text.replace('_', ' ')
@@ -46,19 +49,23 @@ def main():
         raise ValueError("No cases found in the input file. Please check the file content.")
 
     documents = []
+    payloads = []
 
     for match in matches:
         command = re.search(r"<command>(.*?)</command>", match, re.DOTALL).group(1).strip()
         help_text = re.search(r"<help_text>(.*?)</help_text>", match, re.DOTALL).group(1).strip()
         full_content = match.strip()  # Store the complete case
         
+        # Large fields go to the side store, the docstore only references them by payload_id
+        payload_id = str(len(documents))
+        payloads.append((payload_id, {"full_content": full_content, "help_text": help_text}))
+
         # Create a Document instance
         documents.append(Document(
             page_content=tokenize(command), 
             metadata={
-                "full_content": full_content,
-                "command": command,
-                "help_text": help_text
+                "payload_id": payload_id,
+                "command": command
             }
         ))
 
@@ -70,6 +77,16 @@ def main():
     persist_directory = os.path.join(database_path, "faiss/openfoam_command_help")
     vectordb.save_local(persist_directory)
 
+    # Step 6: Save the large fields outside of the pickled docstore
+    save_payloads(persist_directory, payloads)
+
+    # Step 7: Save the records for the exact-name/BM25 index used before vector search
+    with open(os.path.join(persist_directory, "lexical_index.json"), "w", encoding="utf-8") as f:
+        json.dump([
+            {"page_content": doc.page_content, "metadata": doc.metadata, "help_text": fields["help_text"]}
+            for doc, (_, fields) in zip(documents, payloads)
+        ], f, ensure_ascii=False)
+
     print(f"{len(documents)} cases indexed successfully with metadata! Saved at: {persist_directory}")
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+import json
+import os
+import sqlite3
+
+
+def save_payloads(persist_directory: str, payloads: list) -> None:
+    """Store the large document fields in a SQLite side store next to the FAISS index."""
+    path = os.path.join(persist_directory, "payloads.sqlite")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE payloads (payload_id TEXT NOT NULL, field TEXT NOT NULL, content TEXT NOT NULL, PRIMARY KEY (payload_id, field))")
+    conn.executemany(
+        "INSERT INTO payloads (payload_id, field, content) VALUES (?, ?, ?)",
+        [(payload_id, field, content) for payload_id, fields in payloads for field, content in fields.items()],
+    )
+    conn.commit()
+    conn.close()
+
+
+def save_metadata_index(persist_directory: str, documents: list) -> None:
+    """Store the FAISS positions of the documents per solver, domain and category for filtered retrieval."""
+    metadata_index = {field: {} for field in ["case_solver", "case_domain", "case_category"]}
+    for position, doc in enumerate(documents):
+        for field, values in metadata_index.items():
+            values.setdefault(doc.metadata[field], []).append(position)
+    with open(os.path.join(persist_directory, "metadata_index.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata_index, f, ensure_ascii=False)
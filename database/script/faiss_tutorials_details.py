@@ -7,6 +7,8 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_core.documents import Document
 
+from faiss_store import save_payloads, save_metadata_index
+
 # Function to extract specific fields from text
 def extract_field(field_name: str, text: str) -> str:
     """Extracts the specified field from the given text."""
@@ -52,6 +54,7 @@ def main():
         raise ValueError("No cases found in the input file. Please check the file content.")
 
     documents = []
+    payloads = []
 
     for match in matches:
         full_content = match.strip()  # Store the complete case
@@ -67,17 +70,23 @@ def main():
         case_directory_structure = re.search(r"<directory_structure>([\s\S]*?)</directory_structure>", full_content).group(1)
         detailed_tutorial = re.search(r"<tutorials>([\s\S]*?)</tutorials>", full_content).group(1)
 
+        # Large fields go to the side store, the docstore only references them by payload_id
+        payload_id = str(len(documents))
+        payloads.append((payload_id, {
+            "full_content": full_content,  # Store full `<case_begin> ... </case_end>`
+            "tutorials": detailed_tutorial
+        }))
+
         # Create a Document instance
         documents.append(Document(
             page_content=tokenize(index_content+case_directory_structure),
             metadata={
-                "full_content": full_content,  # Store full `<case_begin> ... </case_end>`
+                "payload_id": payload_id,
                 "case_name": case_name,
                 "case_domain": case_domain,
                 "case_category": case_category,
                 "case_solver": case_solver,
-                'dir_structure': case_directory_structure,
-                'tutorials': detailed_tutorial
+                'dir_structure': case_directory_structure
             }
         ))
 
@@ -89,6 +98,12 @@ def main():
     persist_directory = os.path.join(database_path, "faiss/openfoam_tutorials_details")
     vectordb.save_local(persist_directory)
 
+    # Step 6: Save the large fields outside of the pickled docstore
+    save_payloads(persist_directory, payloads)
+
+    # Step 7: Save the per-solver/domain/category document subsets
+    save_metadata_index(persist_directory, documents)
+
     print(f"{len(documents)} cases indexed successfully with metadata! Saved at: {persist_directory}")
 
 if __name__ == "__main__":
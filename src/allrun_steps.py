@@ -0,0 +1,261 @@
+# allrun_steps.py
+"""
+Step-aware execution of the Allrun script.
+
+The Allrun is split into shell setup lines (shebang, cd, sourcing RunFunctions, variable assignments),
+which are always kept, and one step per command line. After a run, the content hashes of the files
+each step read and wrote are recorded in .allrun_steps.json. On the next run, the leading steps whose command, inputs and outputs
+are unchanged are skipped and only the remaining steps are executed from a generated Allrun.resume.
+
+Only applications with known inputs and outputs (meshing, setFields, ...) can be skipped. Solvers,
+unknown commands and mesh manipulations without -overwrite are always executed, and so is every step
+after them.
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_FILE = ".allrun_steps.json"
+STATUS_FILE = ".allrun_steps.status"
+RESUME_SCRIPT = "Allrun.resume"
+
+# Application: (input paths, output paths), relative to the case directory
+STEP_FILES = {
+    "blockMesh": (["system/blockMeshDict"], ["constant/polyMesh"]),
+    "surfaceFeatureExtract": (["system/surfaceFeatureExtractDict"], ["constant/extendedFeatureEdgeMesh", "constant/triSurface"]),
+    "surfaceFeatures": (["system/surfaceFeaturesDict"], ["constant/extendedFeatureEdgeMesh", "constant/triSurface"]),
+    "snappyHexMesh": (["system/snappyHexMeshDict", "system/meshQualityDict", "constant/triSurface", "constant/extendedFeatureEdgeMesh"], ["constant/polyMesh"]),
+    "extrudeMesh": (["system/extrudeMeshDict"], ["constant/polyMesh"]),
+    "topoSet": (["system/topoSetDict"], ["constant/polyMesh"]),
+    "createPatch": (["system/createPatchDict"], ["constant/polyMesh"]),
+    "refineMesh": (["system/refineMeshDict"], ["constant/polyMesh"]),
+    "transformPoints": ([], ["constant/polyMesh"]),
+    "fluentMeshToFoam": ([], ["constant/polyMesh"]),
+    "gmshToFoam": ([], ["constant/polyMesh"]),
+    "checkMesh": (["constant/polyMesh"], []),
+    "restore0Dir": (["0.orig"], ["0"]),
+    "setFields": (["system/setFieldsDict"], ["0"]),
+    # Cleaning only matters when the steps after it run again, which rebuild what it removed
+    "foamCleanTutorials": ([], []),
+    "cleanCase": ([], []),
+    "foamCleanCase": ([], []),
+}
+
+# Mesh manipulation applications that write the new mesh to a time directory (1/polyMesh, ...) unless
+# given -overwrite; without it their outputs are not the paths above and they always run again
+OVERWRITE_APPLICATIONS = ["snappyHexMesh", "refineMesh", "createPatch"]
+
+# Wrappers in front of the application name, and their options that take an argument
+RUN_WRAPPERS = ["runApplication", "runParallel"]
+WRAPPER_OPTIONS_WITH_ARGUMENT = ["-s", "-suffix", "-np", "-decomposeParDict"]
+
+PREAMBLE_PATTERN = re.compile(r"^\s*($|#|cd\s|\.\s|source\s|set\s|export\s|\w+=)")
+CONTROL_FLOW_PATTERN = re.compile(r"^\s*(if|then|else|elif|fi|for|while|until|do|done|case|esac|function|select)\b|^\s*[{}]\s*$|\(\)\s*\{?\s*$|\\\s*$")
+
+
+class AllrunStep:
+    def __init__(self, index: int, command: str):
+        self.index = index
+        self.command = command
+        self.application, arguments = split_command(command)
+        self.inputs, self.outputs = STEP_FILES.get(self.application, (None, None))
+        if self.application in OVERWRITE_APPLICATIONS and "-overwrite" not in arguments:
+            self.inputs, self.outputs = None, None
+
+    @property
+    def skippable(self) -> bool:
+        return self.inputs is not None
+
+
+def split_command(command: str) -> Tuple[str, List[str]]:
+    """
+    Return the application a command line runs and its arguments, e.g. ('topoSet', ['-dict', 'system/topoSetDict.1'])
+    for `runApplication -s 1 topoSet -dict system/topoSetDict.1`.
+    """
+    words = re.split(r"[>|&;]", command, maxsplit=1)[0].split()
+    position = 0
+    if words and words[0] == "mpirun":
+        position = 1
+        while position < len(words) and words[position].startswith("-"):
+            position += 2 if words[position] in ("-np", "-n") else 1
+    while position < len(words) and words[position] in RUN_WRAPPERS:
+        position += 1
+        while position < len(words) and words[position].startswith("-"):
+            position += 2 if words[position] in WRAPPER_OPTIONS_WITH_ARGUMENT else 1
+    if position >= len(words):
+        return "", []
+    return words[position], words[position + 1:]
+
+
+def split_allrun(script: str) -> Optional[Tuple[list, List[AllrunStep]]]:
+    """
+    Split an Allrun script into its lines, where every command line is replaced by an AllrunStep,
+    and the list of steps. Returns None for scripts with control flow or line continuations, which
+    must run as a whole.
+    """
+    lines, steps = [], []
+    for line in script.splitlines():
+        if CONTROL_FLOW_PATTERN.search(line):
+            return None
+        if PREAMBLE_PATTERN.match(line):
+            lines.append(line)
+        else:
+            step = AllrunStep(len(steps), line.strip())
+            lines.append(step)
+            steps.append(step)
+    return lines, steps
+
+
+def step_paths(case_dir: str, step: AllrunStep) -> Tuple[List[str], List[str]]:
+    """
+    Return the (inputs, outputs) paths of a skippable step, relative to the case directory.
+    """
+    # Files named on the command line (a .msh file, -dict system/topoSetDict.1) are inputs too
+    words = re.split(r"[>|&;]", step.command, maxsplit=1)[0].split()[1:]
+    arguments = [word for word in words if not word.startswith("-") and os.path.isfile(os.path.join(case_dir, word))]
+    inputs = [path for path in step.inputs + arguments if path not in step.outputs]
+    return inputs, list(step.outputs)
+
+
+def hash_paths(case_dir: str, paths: List[str]) -> str:
+    """
+    Content hash of the given files and directories (recursively), missing paths included.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        full_path = os.path.join(case_dir, path)
+        if os.path.isdir(full_path):
+            files = []
+            for root, _, names in os.walk(full_path):
+                files.extend(os.path.join(root, name) for name in names)
+        elif os.path.isfile(full_path):
+            files = [full_path]
+        else:
+            digest.update(f"missing:{path}\n".encode())
+            continue
+        for file in sorted(files):
+            digest.update(f"file:{os.path.relpath(file, case_dir)}\n".encode())
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(case_dir: str) -> List[dict]:
+    path = os.path.join(case_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("steps", [])
+    except (OSError, ValueError):
+        return []
+
+
+def first_step_to_run(case_dir: str, steps: List[AllrunStep]) -> int:
+    """
+    Return the index of the first step that must be executed; all steps before it can be skipped.
+    """
+    records = _load_manifest(case_dir)
+    start = 0
+    for step in steps:
+        record = records[step.index] if step.index < len(records) else None
+        if not step.skippable or record is None or record.get("command") != step.command or record.get("status") != 0:
+            break
+        inputs, outputs = step_paths(case_dir, step)
+        if record.get("inputs") != hash_paths(case_dir, inputs) or record.get("outputs") != hash_paths(case_dir, outputs):
+            break
+        start = step.index + 1
+
+    # A skipped step must not share outputs with a step that runs again: re-running createPatch on a
+    # mesh it already patched is wrong, so the mesh is rebuilt from its first producer.
+    changed = True
+    while changed:
+        changed = False
+        rerun_outputs = {path for step in steps[start:] if step.skippable for path in step.outputs}
+        for step in steps[:start]:
+            if rerun_outputs.intersection(step.outputs):
+                start = step.index
+                changed = True
+                break
+    return start
+
+
+def write_resume_script(case_dir: str, lines: list, start: int) -> str:
+    """
+    Write Allrun.resume, which keeps the preamble lines, runs the steps from `start` on and records
+    the exit status of each. Returns the path of the script.
+    """
+    status_path = os.path.join(case_dir, STATUS_FILE)
+    if os.path.exists(status_path):
+        os.remove(status_path)
+    script = []
+    for line in lines:
+        if not isinstance(line, AllrunStep):
+            script.append(line)
+        elif line.index < start:
+            script.append(f"echo {json.dumps(f'Skipped {line.command} (outputs up to date)')}")
+        else:
+            script.append(line.command)
+            script.append(f'echo "{line.index} $?" >> {STATUS_FILE}')
+    path = os.path.join(case_dir, RESUME_SCRIPT)
+    with open(path, "w") as f:
+        f.write("\n".join(script) + "\n")
+    return path
+
+
+def _write_manifest(case_dir: str, records: List[dict]) -> None:
+    with open(os.path.join(case_dir, MANIFEST_FILE), "w") as f:
+        json.dump({"steps": records}, f, indent=2)
+
+
+def _step_record(case_dir: str, step: AllrunStep, status: int) -> dict:
+    record = {"command": step.command, "status": status}
+    if step.skippable:
+        inputs, outputs = step_paths(case_dir, step)
+        record["inputs"] = hash_paths(case_dir, inputs)
+        record["outputs"] = hash_paths(case_dir, outputs)
+    return record
+
+
+def mark_steps_done(case_dir: str, steps: List[AllrunStep], end: int) -> None:
+    """
+    Record steps[:end] as successfully run with the current files, e.g. after restoring their outputs from a cache.
+    """
+    _write_manifest(case_dir, [_step_record(case_dir, step, 0) for step in steps[:end]])
+
+
+def record_steps(case_dir: str, steps: List[AllrunStep], start: int) -> List[dict]:
+    """
+    Update .allrun_steps.json after running the steps from `start` on and return its records.
+    Steps after the first failed or unfinished one are forgotten.
+    """
+    statuses: Dict[int, int] = {}
+    status_path = os.path.join(case_dir, STATUS_FILE)
+    if os.path.exists(status_path):
+        with open(status_path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[0].isdigit() and parts[1].lstrip("-").isdigit():
+                    statuses[int(parts[0])] = int(parts[1])
+
+    records = _load_manifest(case_dir)[:start]
+    for step in steps[start:]:
+        status = statuses.get(step.index)
+        if status is None:
+            break
+        records.append(_step_record(case_dir, step, status))
+        if status != 0:
+            break
+    _write_manifest(case_dir, records)
+    return records
+
+
+def skipped_logs(steps: List[AllrunStep], start: int) -> List[str]:
+    """
+    Prefixes of the log files of skipped steps, which are kept when the previous logs are cleaned up.
+    """
+    rerun_applications = {step.application for step in steps[start:]}
+    return [f"log.{step.application}" for step in steps[:start] if step.application not in rerun_applications]
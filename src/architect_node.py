@@ -2,6 +2,8 @@
 import os
 import re
 from utils import save_file, retrieve_faiss, parse_directory_structure
+from allrun_steps import AllrunStep
+from mesh_cache import get_mesh_cache, mesh_key
 from pydantic import BaseModel, Field
 from typing import List
 import shutil
@@ -155,34 +157,46 @@ functions
         dest_msh = os.path.join(mesh_dir, msh_filename)
         shutil.copy2(config.msh_file, dest_msh)
         
-        # Run fluentMeshToFoam on the MSH file
-        print(f"Running fluentMeshToFoam on {msh_filename}")
-        fluent_cmd = f"cd {state.case_dir} && fluentMeshToFoam {msh_filename}"
-        print(fluent_cmd)
-        fluent_out = os.path.join(mesh_dir, "fluentMeshToFoam.out")
-        fluent_err = os.path.join(mesh_dir, "fluentMeshToFoam.err")
-        
-        # Run the command and check for errors
-        os.system(f"{fluent_cmd} > {fluent_out} 2> {fluent_err}")
-        
-        # Check for errors in fluentMeshToFoam
-        if os.path.exists(fluent_err) and os.path.getsize(fluent_err) > 0:
-            with open(fluent_err, 'r') as f:
-                errors = f.read().strip()
-                if errors:
-                    print(f"Warning: Errors during fluentMeshToFoam: {errors}")
-        
-        print("Mesh conversion completed")
+        # Reuse the converted mesh if the same MSH file was converted before
+        mesh_cache = get_mesh_cache(config)
+        fluent_key = mesh_key(state.case_dir, [AllrunStep(0, f"fluentMeshToFoam {msh_filename}")])
+        if mesh_cache is not None and mesh_cache.restore(fluent_key, state.case_dir):
+            print("Mesh conversion completed")
+        else:
+            # Run fluentMeshToFoam on the MSH file
+            print(f"Running fluentMeshToFoam on {msh_filename}")
+            fluent_cmd = f"cd {state.case_dir} && fluentMeshToFoam {msh_filename}"
+            print(fluent_cmd)
+            fluent_out = os.path.join(mesh_dir, "fluentMeshToFoam.out")
+            fluent_err = os.path.join(mesh_dir, "fluentMeshToFoam.err")
+            
+            # Run the command and check for errors
+            os.system(f"{fluent_cmd} > {fluent_out} 2> {fluent_err}")
+            
+            # Check for errors in fluentMeshToFoam
+            errors = ""
+            if os.path.exists(fluent_err) and os.path.getsize(fluent_err) > 0:
+                with open(fluent_err, 'r') as f:
+                    errors = f.read().strip()
+                    if errors:
+                        print(f"Warning: Errors during fluentMeshToFoam: {errors}")
+            if mesh_cache is not None and not errors:
+                mesh_cache.store(fluent_key, state.case_dir)
+            
+            print("Mesh conversion completed")
 
     # Step 3: Retrieve a similar reference case from the FAISS databases.
     # Retrieve by case info
     case_info = f"case name: {state.case_name}\ncase domain: {state.case_domain}\ncase category: {state.case_category}\ncase solver: {state.case_solver}"
     
-    faiss_structure = retrieve_faiss("openfoam_tutorials_structure", case_info, topk=state.config.searchdocs)
+    # Only search tutorials of the parsed solver and domain; retrieve_faiss relaxes the filter if nothing matches
+    case_filters = {"case_solver": state.case_solver, "case_domain": state.case_domain}
+    
+    faiss_structure = retrieve_faiss("openfoam_tutorials_structure", case_info, topk=state.config.searchdocs, filters=case_filters)
     faiss_structure = faiss_structure[0]['full_content']
     
     # Retrieve by case info + directory structure
-    faiss_detailed = retrieve_faiss("openfoam_tutorials_details", faiss_structure, topk=state.config.searchdocs)
+    faiss_detailed = retrieve_faiss("openfoam_tutorials_details", faiss_structure, topk=state.config.searchdocs, filters=case_filters)
     faiss_detailed = faiss_detailed[0]['full_content']
     
     dir_structure = re.search(r"<directory_structure>(.*?)</directory_structure>", faiss_detailed, re.DOTALL).group(1).strip()
@@ -194,7 +208,7 @@ functions
     
     # Retrieve a reference Allrun script from the FAISS "Allrun" database.
     index_content = f"<index>\ncase name: {state.case_name}\ncase solver: {state.case_solver}</index>\n<directory_structure>{dir_structure}</directory_structure>"
-    faiss_allrun = retrieve_faiss("openfoam_allrun_scripts", index_content, topk=state.config.searchdocs)
+    faiss_allrun = retrieve_faiss("openfoam_allrun_scripts", index_content, topk=state.config.searchdocs, filters={"case_solver": state.case_solver})
     allrun_reference = "Similar cases are ordered, with smaller numbers indicating greater similarity. For example, similar_case_1 is more similar than similar_case_2, and similar_case_2 is more similar than similar_case_3.\n"
     for idx, item in enumerate(faiss_allrun):
         allrun_reference += f"<similar_case_{idx + 1}>{item['full_content']}</similar_case_{idx + 1}>\n\n\n"
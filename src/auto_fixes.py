@@ -0,0 +1,354 @@
+# auto_fixes.py
+"""
+Deterministic fixes for common OpenFOAM errors, applied without asking the LLM.
+
+Each error log (from check_foam_errors or the pre-flight validation) is matched against a registry of
+rules. A rule that recognizes the error patches the affected foamfiles directly, e.g. it adds a missing
+patchField entry, defines an undefined scheme or solver, creates a missing turbulence field or corrects
+the dimensions of a field. Applied fixes are recorded in a JSON file with their success rate, judged by
+whether the error is gone after the next run.
+"""
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from foam_edit import find_entry, set_entry, rename_entry
+from foam_parser import FoamDict, FoamParseError, entry_words, parse_foam_dict, tokenize_foam, unquote
+from foam_validator import CONSTRAINT_PATCH_TYPES, FIELD_DIMENSIONS, REQUIRED_KEYWORDS, mesh_patches
+from review_history import error_signature
+
+# Default entries of the fvSchemes sub-dictionaries
+SCHEME_DEFAULTS = {
+    "ddtSchemes": "Euler",
+    "gradSchemes": "Gauss linear",
+    "laplacianSchemes": "Gauss linear corrected",
+    "interpolationSchemes": "linear",
+    "snGradSchemes": "corrected",
+}
+
+# Defaults of the pressure-velocity coupling controls in fvSolution
+ALGORITHM_DEFAULTS = {
+    "nNonOrthogonalCorrectors": "0",
+    "nCorrectors": "2",
+    "nOuterCorrectors": "1",
+    "momentumPredictor": "yes",
+    "pRefCell": "0",
+    "pRefValue": "0",
+}
+
+PRESSURE_FIELDS = ["p", "p_rgh", "pcorr", "Phi", "pd"]
+
+# Initial values of the turbulence fields that can be created when missing
+FIELD_DEFAULTS = {"nut": "0", "nuTilda": "0", "k": "0.1", "epsilon": "0.1", "omega": "1", "alphat": "0"}
+
+WALL_FUNCTIONS = {
+    "U": "{\n    type noSlip;\n}",
+    "nut": "{\n    type nutkWallFunction;\n    value uniform 0;\n}",
+    "k": "{\n    type kqRWallFunction;\n    value $internalField;\n}",
+    "epsilon": "{\n    type epsilonWallFunction;\n    value $internalField;\n}",
+    "omega": "{\n    type omegaWallFunction;\n    value $internalField;\n}",
+    "alphat": "{\n    type compressible::alphatWallFunction;\n    value $internalField;\n}",
+}
+
+# Foundation releases report `keyword X is undefined in dictionary "..."`, openfoam.com releases (v2206)
+# `Entry 'X' not found in dictionary "..."`
+UNDEFINED_KEYWORD_PATTERN = re.compile(r'(?:keyword (\S+) is undefined|Entry \'([^\']+)\' not found) in dictionary "([^"]+)"')
+DICTIONARY_PATH_PATTERN = re.compile(r"(?:^|/)(system|constant|0)/([A-Za-z]\w*)(?:[/.](.*))?$")
+MISSING_PATCH_FIELD_PATTERN = re.compile(r"Cannot find patchField entry for (\S+)")
+FIELD_FILE_PATTERN = re.compile(r"file:\s*\S*?/?(0)/(\w+)[./]boundaryField")
+MISSING_FILE_PATTERN = re.compile(r'cannot find file\s*"?([^"\s]+)"?')
+PREFLIGHT_FILE_PATTERN = re.compile(r"^preflight:(\w+)/(\S+)$")
+MISSING_KEYWORD_PATTERN = re.compile(r"Required keyword '(\S+)' is missing in \S+?\.(?: Found '(\S+)', did you mean)?")
+
+
+class FoamfileSet:
+    """The foamfiles of a case by (folder, file name), with the changes made by fixes."""
+    def __init__(self, foamfiles, case_dir: str):
+        self.case_dir = case_dir
+        self.contents: Dict[Tuple[str, str], str] = {}
+        for foamfile in foamfiles:
+            self.contents[(foamfile.folder_name.strip("./") or ".", foamfile.file_name)] = foamfile.content
+        self.changed: Dict[Tuple[str, str], str] = {}
+
+    def get(self, folder_name: str, file_name: str) -> Optional[str]:
+        key = (folder_name, file_name)
+        return self.changed.get(key, self.contents.get(key))
+
+    def set(self, folder_name: str, file_name: str, content: str) -> None:
+        self.changed[(folder_name, file_name)] = content
+
+    def parsed(self, folder_name: str, file_name: str) -> Optional[FoamDict]:
+        content = self.get(folder_name, file_name)
+        if content is None:
+            return None
+        try:
+            return parse_foam_dict(content)
+        except FoamParseError:
+            return None
+
+    def patch_types(self) -> Dict[str, str]:
+        """
+        Patch name to type, from the generated mesh (constant/polyMesh/boundary) or blockMeshDict.
+        """
+        boundary_path = os.path.join(self.case_dir, "constant", "polyMesh", "boundary")
+        if os.path.exists(boundary_path):
+            with open(boundary_path, "r") as f:
+                patches = _polymesh_patches(f.read())
+            if patches:
+                return patches
+        block_mesh_dict = self.parsed("system", "blockMeshDict")
+        return (mesh_patches(block_mesh_dict) if block_mesh_dict is not None else None) or {}
+
+
+def _polymesh_patches(boundary: str) -> Dict[str, str]:
+    # constant/polyMesh/boundary is `N ( name { type wall; ... } ... )` after its FoamFile header
+    try:
+        tokens = tokenize_foam(boundary)
+    except FoamParseError:
+        return {}
+    patches, depth = {}, 0
+    for position, token in enumerate(tokens):
+        if token == "{":
+            if depth == 0 and position > 0 and tokens[position - 1] != "FoamFile":
+                name = str(tokens[position - 1])
+                for inner in range(position + 1, len(tokens) - 1):
+                    if tokens[inner] == "}":
+                        break
+                    if tokens[inner] == "type":
+                        patches[name] = str(tokens[inner + 1])
+                        break
+            depth += 1
+        elif token == "}":
+            depth -= 1
+    return patches
+
+
+def _patch_field(field: str, patch: str, patch_type: str) -> str:
+    if patch_type in CONSTRAINT_PATCH_TYPES:
+        return f"{{\n    type {patch_type};\n}}"
+    if patch_type == "wall" and field in WALL_FUNCTIONS:
+        return WALL_FUNCTIONS[field]
+    if field in ("nut", "alphat"):
+        return "{\n    type calculated;\n    value uniform 0;\n}"
+    if field in FIELD_DEFAULTS and "inlet" in patch.lower():
+        return "{\n    type fixedValue;\n    value $internalField;\n}"
+    return "{\n    type zeroGradient;\n}"
+
+
+# Rules take (error log, foamfiles) and return a description of the fix, or None if they do not apply
+
+def fix_undefined_keyword(error_log: dict, files: FoamfileSet) -> Optional[str]:
+    match = UNDEFINED_KEYWORD_PATTERN.search(error_log["error_content"])
+    if not match:
+        return None
+    keyword = match.group(1) or match.group(2)
+    location = DICTIONARY_PATH_PATTERN.search(match.group(3))
+    if not location:
+        return None
+    folder_name, file_name = location.group(1), location.group(2)
+    sub_path = [part for part in re.split(r"[/.]", location.group(3) or "") if part]
+    content = files.get(folder_name, file_name)
+    if content is None or len(sub_path) != 1:
+        return None
+    section = sub_path[0]
+
+    if file_name == "fvSchemes":
+        if section == "divSchemes":
+            value = "Gauss upwind" if keyword.startswith("div(phi") or keyword.startswith("div(rhoPhi") else "Gauss linear"
+        elif section in SCHEME_DEFAULTS:
+            value = SCHEME_DEFAULTS[section]
+        elif section == "wallDist" and keyword == "method":
+            value = "meshWave"
+        else:
+            return None
+    elif file_name == "fvSolution" and section == "solvers":
+        field = keyword.strip('"')
+        base = field[:-len("Final")] if field.endswith("Final") else field
+        if base != field and find_entry(content, ["solvers", base]) is not None:
+            value = f"{{\n    ${base};\n    relTol 0;\n}}"
+        elif base in PRESSURE_FIELDS:
+            value = "{\n    solver GAMG;\n    smoother GaussSeidel;\n    tolerance 1e-06;\n    relTol %s;\n}" % ("0" if base != field else "0.05")
+        else:
+            value = "{\n    solver smoothSolver;\n    smoother symGaussSeidel;\n    tolerance 1e-06;\n    relTol %s;\n}" % ("0" if base != field else "0.1")
+    elif file_name == "fvSolution" and section in ("SIMPLE", "PISO", "PIMPLE") and keyword in ALGORITHM_DEFAULTS:
+        value = ALGORITHM_DEFAULTS[keyword]
+    else:
+        return None
+    files.set(folder_name, file_name, set_entry(content, [section, keyword], value))
+    return f"defined {keyword} in {folder_name}/{file_name} {section}"
+
+
+def _field_file(error_log: dict) -> Optional[Tuple[str, str]]:
+    preflight = PREFLIGHT_FILE_PATTERN.match(str(error_log.get("file", "")))
+    if preflight:
+        return preflight.group(1), preflight.group(2)
+    match = FIELD_FILE_PATTERN.search(error_log["error_content"])
+    return (match.group(1), match.group(2)) if match else None
+
+
+def fix_missing_patch_field(error_log: dict, files: FoamfileSet) -> Optional[str]:
+    match = MISSING_PATCH_FIELD_PATTERN.search(error_log["error_content"])
+    location = _field_file(error_log)
+    if not match or not location:
+        return None
+    folder_name, field = location
+    patch = match.group(1).strip(".'\"")
+    content = files.get(folder_name, field)
+    if content is None:
+        return None
+    patch_type = files.patch_types().get(patch, "patch")
+    files.set(folder_name, field, set_entry(content, ["boundaryField", patch], _patch_field(field, patch, patch_type)))
+    return f"added a patchField for {patch} (type {patch_type}) to {folder_name}/{field}"
+
+
+def fix_missing_field_file(error_log: dict, files: FoamfileSet) -> Optional[str]:
+    match = MISSING_FILE_PATTERN.search(error_log["error_content"])
+    if not match:
+        return None
+    location = re.search(r"(?:^|/)0/(\w+)$", match.group(1))
+    if not location or location.group(1) not in FIELD_DEFAULTS:
+        return None
+    field = location.group(1)
+    # Take the patches from an existing field file
+    template = next((files.parsed("0", name) for name in ["p", "U", "p_rgh", "T"] if files.parsed("0", name) is not None), None)
+    if template is None or not isinstance(template.get("boundaryField"), FoamDict):
+        return None
+    patch_types = files.patch_types()
+    dimensions = " ".join(str(exponent) for exponent in FIELD_DIMENSIONS.get(field, [[0, 0, 0, 0, 0, 0, 0]])[0])
+    content = (
+        "FoamFile\n{\n    version     2.0;\n    format      ascii;\n    class       volScalarField;\n"
+        f"    object      {field};\n}}\n\n"
+        f"dimensions      [{dimensions}];\n\n"
+        f"internalField   uniform {FIELD_DEFAULTS[field]};\n\n"
+        "boundaryField\n{\n}\n"
+    )
+    for patch, patch_field in template["boundaryField"].items():
+        patch_type = patch_types.get(unquote(patch))
+        if patch_type is None and isinstance(patch_field, FoamDict):
+            # Fall back to the type used in the template, which is the patch type for constraint patches
+            template_type = (entry_words(patch_field.get("type")) or ["patch"])[0]
+            patch_type = template_type if template_type in CONSTRAINT_PATCH_TYPES else "patch"
+        content = set_entry(content, ["boundaryField", patch], _patch_field(field, patch, patch_type or "patch"))
+    files.set("0", field, content)
+    return f"created 0/{field}"
+
+
+def fix_dimensions(error_log: dict, files: FoamfileSet) -> Optional[str]:
+    if error_log.get("check") != "dimensions":
+        return None
+    location = _field_file(error_log)
+    if not location:
+        return None
+    folder_name, file_name = location
+    content = files.get(folder_name, file_name)
+    if content is None:
+        return None
+    if folder_name == "0" and file_name in FIELD_DIMENSIONS:
+        dimensions = " ".join(str(exponent) for exponent in FIELD_DIMENSIONS[file_name][0])
+        files.set(folder_name, file_name, set_entry(content, ["dimensions"], f"[{dimensions}]"))
+        return f"set the dimensions of {file_name} to [{dimensions}]"
+    if (folder_name, file_name) == ("constant", "transportProperties"):
+        entry = find_entry(content, ["nu"])
+        if entry is None or entry.block is not None:
+            return None
+        value = re.sub(r"\[[^\]]*\]", "[0 2 -1 0 0 0 0]", content[entry.start:entry.end], count=1)
+        files.set(folder_name, file_name, content[:entry.start] + value + content[entry.end:])
+        return "set the dimensions of nu to [0 2 -1 0 0 0 0]"
+    return None
+
+
+def fix_missing_keyword(error_log: dict, files: FoamfileSet) -> Optional[str]:
+    match = MISSING_KEYWORD_PATTERN.search(error_log["error_content"])
+    location = _field_file(error_log)
+    if not match or not location or error_log.get("check") != "keyword":
+        return None
+    content = files.get(*location)
+    if content is None:
+        return None
+    keyword, misspelled = match.group(1), match.group(2)
+    # The close match may be another required keyword rather than a misspelling
+    if misspelled and misspelled not in REQUIRED_KEYWORDS.get(location[1], []):
+        files.set(*location, rename_entry(content, [misspelled], keyword))
+        return f"renamed {misspelled} to {keyword} in {location[0]}/{location[1]}"
+    if location[1] == "fvSchemes" and keyword in SCHEME_DEFAULTS:
+        files.set(*location, set_entry(content, [keyword, "default"], SCHEME_DEFAULTS[keyword]))
+        return f"added {keyword} with default {SCHEME_DEFAULTS[keyword]} to {location[0]}/{location[1]}"
+    return None
+
+
+AUTO_FIX_RULES: Dict[str, Callable[[dict, FoamfileSet], Optional[str]]] = {
+    "undefined_keyword": fix_undefined_keyword,
+    "missing_patch_field": fix_missing_patch_field,
+    "missing_field_file": fix_missing_field_file,
+    "dimensions": fix_dimensions,
+    "missing_keyword": fix_missing_keyword,
+}
+
+
+class AutoFixer:
+    def __init__(self, stats_path: str):
+        self.stats_path = str(stats_path)
+        self.stats: Dict[str, Dict[str, int]] = {}
+        if os.path.exists(self.stats_path):
+            try:
+                with open(self.stats_path, "r") as f:
+                    self.stats = json.load(f)
+            except (OSError, ValueError):
+                self.stats = {}
+        # (rule, error signature) of the fixes applied before the last run
+        self.pending: List[Tuple[str, str]] = []
+        # Fixes that did not remove their error are not tried again
+        self.failed = set()
+
+    def apply(self, foamfiles, case_dir: str, error_logs: list) -> Tuple[Dict[Tuple[str, str], str], list, List[str]]:
+        """
+        Try the rules on every error log. Returns the changed files as {(folder, file): content},
+        the error logs no rule could fix and a description of each applied fix.
+        """
+        files = FoamfileSet(foamfiles, case_dir)
+        unresolved, descriptions = [], []
+        for error_log in error_logs:
+            signature = error_signature([error_log])
+            fixed = False
+            for rule, fixer in AUTO_FIX_RULES.items():
+                if (rule, signature) in self.failed:
+                    continue
+                try:
+                    description = fixer(error_log, files)
+                except FoamParseError:
+                    description = None
+                if description:
+                    print(f"Auto-fix {rule}: {description} ({self.success_rate(rule)})")
+                    self.pending.append((rule, signature))
+                    descriptions.append(description)
+                    fixed = True
+                    break
+            if not fixed:
+                unresolved.append(error_log)
+        return files.changed, unresolved, descriptions
+
+    def success_rate(self, rule: str) -> str:
+        stats = self.stats.get(rule, {"applied": 0, "succeeded": 0})
+        if stats["applied"] == 0:
+            return "not applied before"
+        return f"succeeded {stats['succeeded']}/{stats['applied']} times before"
+
+    def record_outcome(self, error_logs: list) -> None:
+        """
+        Judge the fixes applied before the last run by the errors it produced and update the statistics.
+        """
+        if not self.pending:
+            return
+        signatures = {error_signature([error_log]) for error_log in error_logs}
+        for rule, signature in self.pending:
+            stats = self.stats.setdefault(rule, {"applied": 0, "succeeded": 0})
+            stats["applied"] += 1
+            if signature in signatures:
+                self.failed.add((rule, signature))
+            else:
+                stats["succeeded"] += 1
+        self.pending = []
+        os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+        with open(self.stats_path, "w") as f:
+            json.dump(self.stats, f, indent=2)
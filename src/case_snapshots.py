@@ -0,0 +1,222 @@
+# case_snapshots.py
+"""
+Snapshots of a case directory per repair iteration, with rollback and diffs between iterations.
+
+File contents go to a content-addressed object store under <case_dir>/.snapshots/objects, so a file
+that did not change between iterations (a mesh, an unchanged dictionary) is stored once. A snapshot
+is a small JSON manifest mapping relative paths to object hashes. Time folders other than 0,
+processor*, postProcessing and dynamicCode folders and the run logs are simulation output and are
+not recorded. With config.auto_rollback, a fix whose run ends with all the errors of the previous run
+plus new ones from the same logs is rolled back.
+"""
+import difflib
+import fnmatch
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from mesh_cache import clone_file
+
+SNAPSHOT_DIR = ".snapshots"
+# Bookkeeping and output of the runner: it must survive a rollback unchanged, and the logs are
+# rewritten by every run and can be hundreds of MB
+EXCLUDED_FILES = [".allrun_steps.json", ".allrun_steps.status", "log.*", "Allrun.out", "Allrun.err", "Allrun.resume"]
+# Output folders besides the time folders: decomposed cases, function object results and compiled coded boundary conditions
+EXCLUDED_FOLDERS = ["processor*", "postProcessing", "dynamicCode", SNAPSHOT_DIR]
+# Files larger than this are reported as changed without a text diff
+MAX_DIFF_BYTES = 256 * 1024
+
+
+def _is_result_folder(name: str) -> bool:
+    if any(fnmatch.fnmatchcase(name, pattern) for pattern in EXCLUDED_FOLDERS):
+        return True
+    try:
+        return name != "0" and float(name) >= 0
+    except ValueError:
+        return False
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CaseSnapshots:
+    def __init__(self, case_dir: str):
+        self.case_dir = case_dir
+        self.snapshot_dir = os.path.join(case_dir, SNAPSHOT_DIR)
+        self.objects_dir = os.path.join(self.snapshot_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # (size, mtime_ns, hash) of the files seen in the last snapshot, to avoid rehashing unchanged files
+        self._stat_cache: Dict[str, tuple] = {}
+        # (error signatures, label) of the last snapshot that was not rolled back
+        self.last_kept: Optional[tuple] = None
+
+    def _object_path(self, file_hash: str) -> str:
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash)
+
+    def _manifest_path(self, label) -> str:
+        return os.path.join(self.snapshot_dir, f"{label}.json")
+
+    def _case_files(self) -> List[str]:
+        files = []
+        for root, dirs, names in os.walk(self.case_dir):
+            if root == self.case_dir:
+                dirs[:] = [name for name in dirs if not _is_result_folder(name)]
+                names = [name for name in names if not any(fnmatch.fnmatchcase(name, pattern) for pattern in EXCLUDED_FILES)]
+            files.extend(os.path.relpath(os.path.join(root, name), self.case_dir) for name in names)
+        return sorted(files)
+
+    def _current_hash(self, relative_path: str) -> str:
+        path = os.path.join(self.case_dir, relative_path)
+        stat = os.stat(path)
+        cached = self._stat_cache.get(relative_path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        file_hash = _file_hash(path)
+        self._stat_cache[relative_path] = (stat.st_size, stat.st_mtime_ns, file_hash)
+        return file_hash
+
+    def take(self, label, metadata: Optional[dict] = None) -> dict:
+        """
+        Record the current case tree under label (e.g. the iteration number) and return the snapshot.
+        """
+        files = {}
+        for relative_path in self._case_files():
+            path = os.path.join(self.case_dir, relative_path)
+            file_hash = self._current_hash(relative_path)
+            object_path = self._object_path(file_hash)
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                # Objects are copies (or reflinks), so in-place writes to the case never reach the store
+                clone_file(path, object_path + ".tmp")
+                os.replace(object_path + ".tmp", object_path)
+            files[relative_path] = {"hash": file_hash, "mode": os.stat(path).st_mode & 0o777}
+        snapshot = {"label": str(label), "metadata": metadata or {}, "files": files}
+        with open(self._manifest_path(label), "w") as f:
+            json.dump(snapshot, f)
+        return snapshot
+
+    def load(self, label) -> dict:
+        path = self._manifest_path(label)
+        if not os.path.exists(path):
+            raise KeyError(f"No snapshot {label} in {self.snapshot_dir}")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def labels(self) -> List[str]:
+        names = [name[:-len(".json")] for name in os.listdir(self.snapshot_dir) if name.endswith(".json")]
+        return sorted(names, key=lambda name: (not name.isdigit(), int(name) if name.isdigit() else 0, name))
+
+    def restore(self, label) -> dict:
+        """
+        Roll the case tree back to the snapshot `label`: changed files are restored and files that did
+        not exist then are removed. Result folders are left alone. Returns the snapshot.
+        """
+        snapshot = self.load(label)
+        files = snapshot["files"]
+        for relative_path in self._case_files():
+            if relative_path not in files:
+                os.remove(os.path.join(self.case_dir, relative_path))
+        for relative_path, entry in files.items():
+            path = os.path.join(self.case_dir, relative_path)
+            if os.path.exists(path):
+                if self._current_hash(relative_path) == entry["hash"]:
+                    continue
+                os.remove(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            clone_file(self._object_path(entry["hash"]), path)
+            os.chmod(path, entry["mode"])
+        print(f"Rolled the case back to snapshot {label}.")
+        return snapshot
+
+    def diff(self, old_label, new_label) -> str:
+        """
+        Return a unified diff of the text files that changed between two snapshots, and a summary
+        line for added, removed and large or binary files.
+        """
+        old_files, new_files = self.load(old_label)["files"], self.load(new_label)["files"]
+        output = []
+        for relative_path in sorted(set(old_files) | set(new_files)):
+            old_entry, new_entry = old_files.get(relative_path), new_files.get(relative_path)
+            if old_entry and new_entry and old_entry["hash"] == new_entry["hash"]:
+                continue
+            old_text = self._read_text(old_entry["hash"]) if old_entry else ""
+            new_text = self._read_text(new_entry["hash"]) if new_entry else ""
+            if old_text is None or new_text is None:
+                status = "added" if not old_entry else "removed" if not new_entry else "changed"
+                output.append(f"Binary or large file {relative_path} {status}\n")
+                continue
+            output.extend(difflib.unified_diff(
+                old_text.splitlines(keepends=True),
+                new_text.splitlines(keepends=True),
+                fromfile=f"{old_label}/{relative_path}" if old_entry else "/dev/null",
+                tofile=f"{new_label}/{relative_path}" if new_entry else "/dev/null",
+            ))
+        return "".join(output)
+
+    def _read_text(self, file_hash: str) -> Optional[str]:
+        path = self._object_path(file_hash)
+        if os.path.getsize(path) > MAX_DIFF_BYTES:
+            return None
+        with open(path, "rb") as f:
+            content = f.read()
+        try:
+            return content.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+
+def rollback_case(state, label) -> None:
+    """
+    Roll state.case_dir back to a snapshot and reload the content of state.foamfiles from disk.
+    """
+    state.snapshots.restore(label)
+    foamfiles = []
+    for foamfile in state.foamfiles.list_foamfile:
+        path = os.path.join(state.case_dir, foamfile.folder_name, foamfile.file_name)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                foamfile.content = f.read()
+            foamfiles.append(foamfile)
+    state.foamfiles.list_foamfile = foamfiles
+
+
+def error_signature(error_log: dict) -> str:
+    """
+    The log and first line of an error, with numbers (time, cell counts, iterations) masked, so that
+    the same error of two runs has the same signature.
+    """
+    lines = [line.strip() for line in str(error_log.get("error_content", "")).splitlines() if line.strip()]
+    first_line = re.sub(r"\d+(\.\d+)?([eE][-+]?\d+)?", "#", lines[0]) if lines else ""
+    return f"{error_log.get('file', '')}: {first_line}"
+
+
+def snapshot_iteration(state, label) -> bool:
+    """
+    Snapshot the case after a run with its errors. With config.auto_rollback, if the run failed in
+    the same logs with all the errors of the last kept snapshot and more, the case files are rolled
+    back to that snapshot and True is returned. state.error_logs is left as the run reported it.
+    """
+    error_logs = list(getattr(state, "error_logs", []))
+    signatures = sorted({error_signature(error_log) for error_log in error_logs})
+    state.snapshots.take(label, {"errors": len(error_logs), "error_logs": error_logs, "signatures": signatures})
+    last_kept = state.snapshots.last_kept
+    # Error counts of different stages (a preflight error, a mesh error, a solver error) are not
+    # comparable, so only the same errors plus new ones from the same logs count as worse
+    if state.config.auto_rollback and last_kept is not None:
+        kept_signatures = set(last_kept[0])
+        same_logs = {signature.partition(": ")[0] for signature in signatures} == {signature.partition(": ")[0] for signature in kept_signatures}
+        if same_logs and kept_signatures < set(signatures):
+            print(f"The last fix kept the {len(kept_signatures)} previous errors and added {len(set(signatures) - kept_signatures)}.")
+            rollback_case(state, last_kept[1])
+            if hasattr(state, "review_history") and len(state.review_history) > 0:
+                state.review_history.attempts[-1].outcome = f"made things worse (new errors: {'; '.join(sorted(set(signatures) - kept_signatures))}), rolled back"
+            return True
+    state.snapshots.last_kept = (signatures, str(label))
+    return False
@@ -8,11 +8,41 @@ class Config:
     
     batchsize: int = 10
     searchdocs: int = 2
+    input_writer_max_concurrency: int = 4 # Max foamfiles generated in parallel by the input writer
+    input_writer_context_tokens: int = 4000 # Token budget for the already generated files in each input writer prompt
+    llm_early_stop: bool = True # Stop generating foamfiles and Allrun scripts once they are complete
+    reference_siblings: int = 1 # Extra tutorial files from the same folder shown next to the matching reference file
     run_times: int = 1  # current run number (for directory naming)
     database_path: str = Path(__file__).resolve().parent.parent / "database"
     run_directory: str = Path(__file__).resolve().parent.parent / "runs"
     case_dir: str = ""
     max_time_limit = 36000 # Max time limit after which the openfoam run will be terminated
+    abort_on_fatal_error: bool = True # Stop the Allrun as soon as a FOAM FATAL ERROR appears in its output or logs
+    cache_openfoam_env: bool = True # Source the OpenFOAM bashrc once and start every execution with the captured environment
+    monitor_interval: float = 1.0 # Seconds between checks of a running Allrun
+    divergence_max_courant: float = 1e3 # Stop the solver when the max Courant number exceeds this
+    divergence_max_residual: float = 1e3 # Stop the solver when an initial residual exceeds this (or is nan/inf)
+    stall_timeout: float = 1800 # Stop the solver after this many seconds without a new time step (0 disables)
+    parallel_run: bool = False # Run medium and large cases with decomposePar/mpirun/reconstructPar
+    parallel_min_cells: int = 100000 # Smallest mesh that is run in parallel
+    parallel_cells_per_core: int = 50000 # Target mesh cells per MPI rank
+    parallel_max_cores: int = 64 # Upper bound on the MPI ranks of a parallel run
+    resume_allrun: bool = True # Skip the leading Allrun steps (meshing, setFields) whose inputs and outputs are unchanged
+    mesh_cache: bool = True # Reuse meshes whose defining inputs were meshed before
+    mesh_cache_dir: str = Path(__file__).resolve().parent.parent / "database" / "cache" / "mesh"
+    mesh_cache_quota_gb: float = 20 # Disk quota of the mesh cache, least recently used meshes are evicted first
+    mesh_cache_hardlinks: bool = False # Restore meshes with hardlinks (only safe if no step rewrites constant/polyMesh in place)
+    smoke_test: bool = False # Run a few time steps before the full simulation and review their errors first
+    smoke_test_steps: int = 10 # Time steps of the smoke run
+    case_snapshots: bool = True # Snapshot the case directory after every run for rollback and diffs between iterations
+    auto_rollback: bool = False # Roll back a fix whose run keeps all previous errors of the same logs and adds new ones
+    review_history_keep_last: int = 2 # Reviewer attempts kept verbatim in the history, older ones are summarized
+    review_history_tokens: int = 3000 # Token budget of the history in reviewer prompts
+    auto_fix: bool = True # Repair errors with a known deterministic fix (auto_fixes.py) before asking the LLM
+    auto_fix_stats_path: str = Path(__file__).resolve().parent.parent / "database" / "cache" / "auto_fix_stats.json"
+    scoped_review_files: bool = True # Only put the files involved in the errors into the reviewer and rewrite prompts
+    patch_rewrite: bool = True # Ask the rewrite step for key-path edits or unified diffs instead of complete files
+    preflight_validation: bool = True # Validate the generated dictionaries before running the Allrun
     model_provider: str = "ollama" # [openai, bedrock, ollama, deepseek]
     # model_provider: str = "deepseek" # [openai, bedrock, ollama, deepseek]
     # model_provider: str = "ollama" # [openai, bedrock, ollama, deepseek]
@@ -22,4 +52,6 @@ class Config:
     # model_version: str = "qwen3:32b-fp16"
     temperature: float = 0.6
     msh_file: str = ""  # Path to the MSH file for fluentMeshToFoam
+    llm_cache_mode: str = "off" # [off, read_through, record, replay]
+    llm_cache_dir: str = Path(__file__).resolve().parent.parent / "database" / "cache" / "llm_responses"
     
@@ -0,0 +1,131 @@
+# embedding_cache.py
+"""
+Persistent cache for query embeddings.
+
+Vectors are keyed by a hash of the embedding model name and the normalized query text.
+Lookups go through an in-memory LRU first and fall back to a SQLite table that is shared
+by every process using the same cache file.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional
+
+DEFAULT_CACHE_PATH = f"{Path(__file__).resolve().parent.parent}/database/cache/query_embeddings.sqlite"
+
+
+def normalize_query(text: str) -> str:
+    # Collapse whitespace so that formatting differences do not produce new cache entries
+    return " ".join(text.split())
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_memory_entries: int = 4096):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+                )
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                # Keep working with the in-memory tier only
+                print(f"Warning: Embedding cache at {self.path} is not available: {e}")
+                self.path = None
+        return self._conn
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = embedding_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+
+            conn = self._connection() if self.path else None
+            if conn is None:
+                return None
+            row = conn.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            vector = array("f", row[0]).tolist()
+            self._remember(key, vector)
+            return vector
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        key = embedding_key(model, text)
+        # Store the float32 values so memory and disk hits return identical vectors
+        vector = array("f", vector).tolist()
+        with self._lock:
+            self._remember(key, vector)
+            conn = self._connection() if self.path else None
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                    (key, model, len(vector), array("f", vector).tobytes()),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Failed to write embedding cache entry: {e}")
+
+    def get_or_embed(self, model: str, text: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """
+        Return the cached vector for the query, computing and storing it with `embed` on a miss.
+        """
+        vector = self.get(model, text)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = embed(text)
+        self.put(model, text, vector)
+        return vector
+
+    def get_or_embed_many(self, model: str, texts: List[str], embed_many: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Batched variant of get_or_embed: all cache misses are embedded with a single `embed_many` call.
+        The returned vectors follow the order of `texts`.
+        """
+        vectors = [self.get(model, text) for text in texts]
+        missing = []
+        for text, vector in zip(texts, vectors):
+            if vector is None and text not in missing:
+                missing.append(text)
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+
+        if missing:
+            computed = dict(zip(missing, embed_many(missing)))
+            for text, vector in computed.items():
+                self.put(model, text, vector)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
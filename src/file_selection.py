@@ -0,0 +1,121 @@
+# file_selection.py
+"""
+Selection of the foamfiles relevant to a set of errors, for the reviewer and rewrite prompts.
+
+The failing log (log.<command>) gives the command, and a static table maps each command to the files
+it reads. The error text adds the files it names (system/fvSchemes, 0/U, ...), the field files of the
+fields it mentions, and the field files and mesh dictionaries of the patches it mentions. Errors that
+cannot be attributed fall back to all files.
+"""
+import fnmatch
+import re
+from typing import List, Optional, Set, Tuple
+
+from foam_parser import FoamDict, FoamParseError, parse_foam_dict
+
+# Files read by each command, as folder/file patterns. Commands not listed are treated as solvers.
+COMMAND_FILES = {
+    "blockMesh": ["system/blockMeshDict", "constant/polyMesh/blockMeshDict"],
+    "snappyHexMesh": ["system/snappyHexMeshDict", "system/meshQualityDict", "system/blockMeshDict", "constant/triSurface/*"],
+    "surfaceFeatureExtract": ["system/surfaceFeatureExtractDict", "constant/triSurface/*"],
+    "surfaceFeatures": ["system/surfaceFeaturesDict", "constant/triSurface/*"],
+    "extrudeMesh": ["system/extrudeMeshDict"],
+    "extrudeToRegionMesh": ["system/extrudeToRegionMeshDict"],
+    "mirrorMesh": ["system/mirrorMeshDict"],
+    "createPatch": ["system/createPatchDict"],
+    "topoSet": ["system/topoSetDict"],
+    "createBaffles": ["system/createBafflesDict"],
+    "refineMesh": ["system/refineMeshDict"],
+    "transformPoints": [],
+    "fluentMeshToFoam": [],
+    "checkMesh": ["system/blockMeshDict", "system/snappyHexMeshDict"],
+    "decomposePar": ["system/decomposeParDict"],
+    "reconstructPar": ["system/controlDict"],
+    "setFields": ["system/setFieldsDict", "0/*"],
+    "mapFields": ["system/mapFieldsDict", "0/*"],
+    "changeDictionary": ["system/changeDictionaryDict", "0/*"],
+    "potentialFoam": ["system/fvSchemes", "system/fvSolution", "0/U", "0/p"],
+}
+
+# Files read by every solver; field files are added only when the error concerns them
+SOLVER_FILES = ["system/controlDict", "system/fvSchemes", "system/fvSolution", "system/fvOptions", "constant/*"]
+
+LOG_COMMAND_PATTERN = re.compile(r"^log\.([A-Za-z]\w*)")
+FILE_PATH_PATTERN = re.compile(r"(?:^|[/\s\"'])(system|constant|0)/(\w[\w.]*)")
+# Words that make an error concern the boundary conditions of all fields
+BOUNDARY_WORDS = ["patchField", "boundaryField", "patch type", "boundary condition"]
+
+
+def _path(foamfile) -> str:
+    folder_name = foamfile.folder_name.strip("./")
+    return f"{folder_name}/{foamfile.file_name}" if folder_name else foamfile.file_name
+
+
+def _patch_names(foamfiles) -> Set[str]:
+    # Patch names are the keys of the boundaryField dictionaries of the field files
+    patches = set()
+    for foamfile in foamfiles:
+        if foamfile.folder_name.strip("./") != "0":
+            continue
+        try:
+            boundary_field = parse_foam_dict(foamfile.content).get("boundaryField")
+        except FoamParseError:
+            continue
+        if isinstance(boundary_field, FoamDict):
+            patches.update(key for key in boundary_field if not key.startswith('"'))
+    return patches
+
+
+def _mentions(text: str, word: str) -> bool:
+    return re.search(rf"(?<![\w.]){re.escape(word)}(?![\w.])", text) is not None
+
+
+def error_patterns(error_log: dict, foamfiles, patches: Set[str]) -> Optional[List[str]]:
+    """
+    Return the file patterns relevant to one error log, or None if the error cannot be attributed.
+    """
+    source, text = str(error_log.get("file", "")), str(error_log.get("error_content", ""))
+    field_names = [foamfile.file_name for foamfile in foamfiles if foamfile.folder_name.strip("./") == "0"]
+    patterns = []
+
+    if source.startswith("preflight:"):
+        patterns.append(source[len("preflight:"):])
+        if error_log.get("check") == "boundary":
+            patterns.extend(COMMAND_FILES["blockMesh"])
+        elif error_log.get("check") == "solver":
+            patterns.append("Allrun")
+    else:
+        command = LOG_COMMAND_PATTERN.match(source)
+        if not command:
+            # Errors of the Allrun itself (Allrun.err) or of unknown origin
+            return None
+        patterns.extend(COMMAND_FILES.get(command.group(1), SOLVER_FILES))
+
+    patterns.extend(f"{folder}/{name}" for folder, name in FILE_PATH_PATTERN.findall(text))
+    # A patch missing from every field file is only named in the mesh dictionaries, which give its type
+    if any(word in text for word in BOUNDARY_WORDS) or any(_mentions(text, patch) for patch in patches):
+        patterns.append("0/*")
+        patterns.extend(COMMAND_FILES["blockMesh"] + ["system/snappyHexMeshDict"])
+    patterns.extend(f"0/{field}" for field in field_names if _mentions(text, field))
+    if "command not found" in text or "No such file" in text:
+        patterns.append("Allrun")
+    return patterns
+
+
+def select_foamfiles(foamfiles, error_logs: list) -> Tuple[list, bool]:
+    """
+    Return the foamfiles involved in error_logs, in their original order, and whether the selection
+    is a strict subset. All files are returned if any error cannot be attributed.
+    """
+    foamfiles = list(foamfiles)
+    patches = _patch_names(foamfiles)
+    patterns = []
+    for error_log in error_logs:
+        error_log_patterns = error_patterns(error_log, foamfiles, patches)
+        if error_log_patterns is None:
+            return foamfiles, False
+        patterns.extend(error_log_patterns)
+    selected = [foamfile for foamfile in foamfiles if any(fnmatch.fnmatchcase(_path(foamfile), pattern) for pattern in patterns)]
+    if not selected:
+        return foamfiles, False
+    return selected, len(selected) < len(foamfiles)
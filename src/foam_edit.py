@@ -0,0 +1,174 @@
+# foam_edit.py
+"""
+Targeted edits of OpenFOAM dictionary text.
+
+Entries are addressed by key paths such as ["divSchemes", "div(phi,U)"] or ["boundaryField", "inlet"].
+Setting, deleting or renaming an entry rewrites only the characters of that entry, so comments and
+formatting of the rest of the file are preserved.
+"""
+from typing import Dict, List, Optional
+
+from foam_parser import DIRECTIVES_WITH_ARGUMENT, FoamParseError, Token, tokenize_foam
+
+INDENT = "    "
+
+
+class EntrySpan:
+    def __init__(self, key: Token, end: int, block: Optional["DictSpan"] = None):
+        self.key = key
+        # Offset just after the closing ';' or '}' of the entry
+        self.end = end
+        # Set for `key { ... }` entries
+        self.block = block
+
+    @property
+    def start(self) -> int:
+        return self.key.start
+
+
+class DictSpan:
+    def __init__(self, open_brace: Optional[Token]):
+        self.open_brace = open_brace
+        # Offset of the closing '}', or the end of the text for the top level
+        self.close = 0
+        self.entries: Dict[str, EntrySpan] = {}
+
+
+def _scan_dict(tokens: List[Token], position: int, open_brace: Optional[Token], text_length: int):
+    span = DictSpan(open_brace)
+    while position < len(tokens):
+        token = tokens[position]
+        if token == "}":
+            if open_brace is None:
+                raise FoamParseError("unexpected '}' without a matching '{'", token.line)
+            span.close = token.start
+            return span, position + 1
+        if token == ";":
+            position += 1
+            continue
+        if token in DIRECTIVES_WITH_ARGUMENT:
+            position += 2
+            continue
+        if position + 1 < len(tokens) and tokens[position + 1] == "{":
+            block, next_position = _scan_dict(tokens, position + 2, tokens[position + 1], text_length)
+            span.entries[str(token)] = EntrySpan(token, block.close + 1, block)
+            position = next_position
+            continue
+        # A plain entry ends at the first ';' outside brackets
+        depth, end = 0, position + 1
+        while end < len(tokens):
+            if tokens[end] in ("(", "[", "{"):
+                depth += 1
+            elif tokens[end] in (")", "]", "}"):
+                if depth == 0:
+                    break
+                depth -= 1
+            elif tokens[end] == ";" and depth == 0:
+                break
+            end += 1
+        if end >= len(tokens) or tokens[end] != ";":
+            raise FoamParseError(f"missing ';' after the value of '{token}'", token.line)
+        span.entries[str(token)] = EntrySpan(token, tokens[end].end)
+        position = end + 1
+    if open_brace is not None:
+        raise FoamParseError(f"'{{' opened on line {open_brace.line} is never closed", tokens[-1].line if tokens else 1)
+    span.close = text_length
+    return span, position
+
+
+def scan(text: str) -> DictSpan:
+    """
+    Return the entry spans of a dictionary text. Raises FoamParseError on syntax errors.
+    """
+    span, _ = _scan_dict(tokenize_foam(text), 0, None, len(text))
+    return span
+
+
+def find_entry(text: str, key_path: List[str]) -> Optional[EntrySpan]:
+    span = scan(text)
+    entry = None
+    for key in key_path:
+        if span is None or key not in span.entries:
+            return None
+        entry = span.entries[key]
+        span = entry.block
+    return entry
+
+
+def _line_indent(text: str, offset: int) -> str:
+    line_start = text.rfind("\n", 0, offset) + 1
+    prefix = text[line_start:offset]
+    return prefix[:len(prefix) - len(prefix.lstrip())]
+
+
+def _render_entry(key: str, value: str, indent: str) -> str:
+    value = value.strip()
+    if value.startswith("{"):
+        # Block values are given with braces; re-indent their lines under the key
+        lines = value.splitlines()
+        return f"{key}\n" + "\n".join(indent + line if line.strip() else line for line in lines)
+    return f"{key} {value.rstrip(';')};"
+
+
+def set_entry(text: str, key_path: List[str], value: str) -> str:
+    """
+    Set the entry at key_path to value, e.g. "Gauss linear" or "{ type zeroGradient; }". Missing
+    parent dictionaries are created. Returns the new text.
+    """
+    span = scan(text)
+    parent_indent = ""
+    for depth, key in enumerate(key_path):
+        entry = span.entries.get(key)
+        is_last = depth == len(key_path) - 1
+        if entry is not None and is_last:
+            indent = _line_indent(text, entry.start)
+            return text[:entry.start] + _render_entry(key, value, indent) + text[entry.end:]
+        if entry is not None and entry.block is not None:
+            parent_indent = _line_indent(text, entry.start)
+            span = entry.block
+            continue
+        # Insert the rest of the path as new nested entries before the closing brace of this dictionary
+        indent = parent_indent + INDENT if span.open_brace is not None else ""
+        new_value = value
+        for missing_key in reversed(key_path[depth + 1:]):
+            new_value = "{\n" + INDENT + _render_entry(missing_key, new_value, INDENT) + "\n}"
+        new_entry = _render_entry(key, new_value, indent)
+        if entry is not None:
+            # A plain entry is in the way of the path; replace it by the dictionary
+            return text[:entry.start] + new_entry + text[entry.end:]
+        insert_at = span.close
+        before = text[:insert_at].rstrip(" \t")
+        after = text[insert_at:]
+        if not before.endswith("\n"):
+            before += "\n"
+        closing_indent = parent_indent if span.open_brace is not None else ""
+        return f"{before}{indent}{new_entry}\n{closing_indent}{after.lstrip(' ')}"
+    return text
+
+
+def delete_entry(text: str, key_path: List[str]) -> str:
+    """
+    Remove the entry at key_path, together with the rest of its line if nothing else is on it.
+    Returns the text unchanged if the entry does not exist.
+    """
+    entry = find_entry(text, key_path)
+    if entry is None:
+        return text
+    start = entry.start - len(_line_indent(text, entry.start))
+    if text[start:entry.start].strip():
+        start = entry.start
+    end = entry.end
+    line_end = text.find("\n", end)
+    if line_end != -1 and not text[end:line_end].strip():
+        end = line_end + 1
+    return text[:start] + text[end:]
+
+
+def rename_entry(text: str, key_path: List[str], new_key: str) -> str:
+    """
+    Rename the last key of key_path, keeping its value. Returns the text unchanged if it does not exist.
+    """
+    entry = find_entry(text, key_path)
+    if entry is None:
+        return text
+    return text[:entry.key.start] + new_key + text[entry.key.end:]
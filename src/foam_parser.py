@@ -0,0 +1,259 @@
+# foam_parser.py
+"""
+A small tokenizer and parser for OpenFOAM dictionary files.
+
+Dictionaries are parsed into FoamDict (an ordered dict). A keyword followed by `{ ... }` maps to a
+nested FoamDict; any other entry maps to a FoamEntry, the list of value items up to its `;`.
+Value items are tokens (str), FoamList for `( ... )`, FoamDimensions for `[ ... ]` and FoamDict for
+dictionaries nested in lists, such as the patches of blockMeshDict's `boundary` list.
+"""
+from typing import List, Optional
+
+# Case folders whose files are OpenFOAM dictionaries with a FoamFile header
+DICTIONARY_FOLDERS = ["system", "constant", "0"]
+
+PUNCTUATION = "{}()[];"
+# Directives that take one argument token, e.g. #include "file"
+DIRECTIVES_WITH_ARGUMENT = ("#include", "#includeEtc", "#includeIfPresent", "#includeFunc", "#remove", "#inputMode", "#sinclude")
+
+
+class FoamParseError(Exception):
+    def __init__(self, message: str, line: int):
+        super().__init__(f"line {line}: {message}")
+        self.message = message
+        self.line = line
+
+
+class Token(str):
+    """A token that remembers the line and the offset it was read from."""
+    def __new__(cls, value: str, line: int, start: int = 0):
+        token = super().__new__(cls, value)
+        token.line = line
+        token.start = start
+        return token
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self)
+
+
+class FoamDict(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Arguments of #include-like directives, in order of appearance
+        self.includes = []
+
+
+class FoamEntry(list):
+    pass
+
+
+class FoamList(list):
+    pass
+
+
+class FoamDimensions(list):
+    pass
+
+
+def tokenize_foam(text: str) -> List[Token]:
+    """
+    Split a dictionary into tokens, dropping comments. Strings keep their quotes, and `#{ ... #}`
+    code blocks and `${...}` macros are returned as one token. Words may contain balanced
+    parentheses, as in div(phi,U), but the size of a counted list such as 3(1 2 3) is its own token.
+    """
+    tokens = []
+    position, line, length = 0, 1, len(text)
+    while position < length:
+        c = text[position]
+        if c == "\n":
+            line += 1
+            position += 1
+        elif c.isspace():
+            position += 1
+        elif text.startswith("//", position):
+            end = text.find("\n", position)
+            position = length if end == -1 else end
+        elif text.startswith("/*", position):
+            end = text.find("*/", position + 2)
+            if end == -1:
+                raise FoamParseError("unterminated /* comment", line)
+            line += text.count("\n", position, end)
+            position = end + 2
+        elif text.startswith("#{", position):
+            end = text.find("#}", position + 2)
+            if end == -1:
+                raise FoamParseError("unterminated #{ code block", line)
+            tokens.append(Token(text[position:end + 2], line, position))
+            line += text.count("\n", position, end)
+            position = end + 2
+        elif text.startswith("${", position):
+            end = text.find("}", position + 2)
+            if end == -1:
+                raise FoamParseError("unterminated ${ macro", line)
+            tokens.append(Token(text[position:end + 1], line, position))
+            position = end + 1
+        elif c == '"':
+            end = position + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            if end >= length:
+                raise FoamParseError("unterminated string", line)
+            tokens.append(Token(text[position:end + 1], line, position))
+            line += text.count("\n", position, end)
+            position = end + 1
+        elif c in PUNCTUATION:
+            tokens.append(Token(c, line, position))
+            position += 1
+        else:
+            end, depth = position, 0
+            while end < length:
+                ch = text[end]
+                if ch.isspace() or ch in "{}[];\"" or text.startswith("//", end) or text.startswith("/*", end):
+                    break
+                if ch == "(":
+                    if depth == 0 and text[position:end].isdigit():
+                        # N( starts a counted list
+                        break
+                    depth += 1
+                elif ch == ")":
+                    if depth == 0:
+                        break
+                    depth -= 1
+                end += 1
+            tokens.append(Token(text[position:end], line, position))
+            position = end
+    return tokens
+
+
+class _Parser:
+    DIRECTIVES_WITH_ARGUMENT = DIRECTIVES_WITH_ARGUMENT
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+
+    def _next(self) -> Optional[Token]:
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _last_line(self) -> int:
+        return self.tokens[-1].line if self.tokens else 1
+
+    def parse_dict(self, opening: Optional[Token] = None) -> FoamDict:
+        result = FoamDict()
+        while True:
+            token = self._next()
+            if token is None:
+                if opening is not None:
+                    raise FoamParseError(f"'{{' opened on line {opening.line} is never closed", self._last_line())
+                return result
+            if token == "}":
+                if opening is None:
+                    raise FoamParseError("unexpected '}' without a matching '{'", token.line)
+                return result
+            if token == ";":
+                continue
+            if token in self.DIRECTIVES_WITH_ARGUMENT:
+                argument = self._next()
+                if argument is None:
+                    raise FoamParseError(f"{token} without an argument", token.line)
+                result.includes.append((str(token), str(argument)))
+                continue
+            if token in PUNCTUATION:
+                raise FoamParseError(f"expected a keyword but found '{token}'", token.line)
+            if self._peek() == "{":
+                brace = self._next()
+                result[token] = self.parse_dict(brace)
+            else:
+                result[token] = self.parse_value(token)
+
+    def parse_value(self, keyword: Token) -> FoamEntry:
+        items = FoamEntry()
+        while True:
+            token = self._next()
+            if token is None:
+                raise FoamParseError(f"missing ';' after the value of '{keyword}'", keyword.line)
+            if token == ";":
+                return items
+            if token == "}":
+                raise FoamParseError(f"missing ';' after the value of '{keyword}'", keyword.line)
+            items.append(self._parse_item(token, items))
+
+    def parse_list(self, opening: Token) -> list:
+        closing = ")" if opening == "(" else "]"
+        items = FoamList() if opening == "(" else FoamDimensions()
+        while True:
+            token = self._next()
+            if token is None:
+                raise FoamParseError(f"'{opening}' opened on line {opening.line} is never closed", self._last_line())
+            if token == closing:
+                return items
+            if token in (";", "}"):
+                raise FoamParseError(f"unexpected '{token}' inside the list opened on line {opening.line}", token.line)
+            items.append(self._parse_item(token, items))
+
+    def _parse_uniform_list(self, opening: Token) -> FoamList:
+        # N{value} is a list of N copies of value
+        items = FoamList()
+        while True:
+            token = self._next()
+            if token is None:
+                raise FoamParseError(f"'{{' opened on line {opening.line} is never closed", self._last_line())
+            if token == "}":
+                return items
+            items.append(self._parse_item(token, items))
+
+    def _parse_item(self, token: Token, previous: list):
+        if token in ("(", "["):
+            return self.parse_list(token)
+        if token == "{" and previous and isinstance(previous[-1], str) and previous[-1].isdigit():
+            return self._parse_uniform_list(token)
+        if token == "{":
+            return self.parse_dict(token)
+        if token in (")", "]"):
+            raise FoamParseError(f"unexpected '{token}' without a matching opening bracket", token.line)
+        return token
+
+
+def parse_foam_dict(text: str) -> FoamDict:
+    """
+    Parse the content of an OpenFOAM dictionary file. Raises FoamParseError on syntax errors.
+    """
+    return _Parser(tokenize_foam(text)).parse_dict()
+
+
+def unquote(token: str) -> str:
+    if len(token) >= 2 and token[0] == token[-1] == '"':
+        return token[1:-1]
+    return token
+
+
+def entry_words(value) -> List[str]:
+    """Return the plain tokens of an entry value, e.g. ['uniform', ...] or ['simpleFoam']."""
+    if isinstance(value, FoamEntry):
+        return [str(item) for item in value if isinstance(item, str)]
+    return []
+
+
+def find_dimensions(value) -> Optional[List[float]]:
+    """
+    Return the numeric dimension set of an entry such as `dimensions [0 1 -1 0 0 0 0];` or
+    `nu [0 2 -1 0 0 0 0] 1e-05;`, padded to 7 exponents. None if absent or not numeric.
+    """
+    if not isinstance(value, FoamEntry):
+        return None
+    for item in value:
+        if isinstance(item, FoamDimensions):
+            try:
+                exponents = [float(exponent) for exponent in item]
+            except (TypeError, ValueError):
+                return None
+            return (exponents + [0.0] * 7)[:7]
+    return None
@@ -0,0 +1,140 @@
+# foam_patch.py
+"""
+Targeted edits of foamfiles returned by the rewrite step instead of complete files.
+
+An edit sets or deletes the entry at a key path of a dictionary (foam_edit), applies a unified diff,
+or, as a fallback, replaces the whole file. All edits of a response are applied to copies of the
+current contents and the edited dictionaries must still parse; any failure rejects the whole response
+so that the caller can fall back to a full-file rewrite. Files that did not parse before the edit
+are not checked, since the parser does not cover all of the OpenFOAM syntax.
+"""
+import re
+from typing import Dict, List, Tuple
+
+from foam_edit import delete_entry, find_entry, set_entry
+from foam_parser import DICTIONARY_FOLDERS, FoamParseError, parse_foam_dict
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class FoamPatchError(Exception):
+    pass
+
+
+def _parse_hunks(diff: str) -> List[Tuple[int, List[str], List[str]]]:
+    hunks = []
+    for line in diff.splitlines():
+        header = HUNK_HEADER_PATTERN.match(line)
+        if header:
+            hunks.append((int(header.group(1)), [], []))
+            continue
+        if not hunks or line.startswith("---") or line.startswith("+++") or line.startswith("\\"):
+            continue
+        _, old_lines, new_lines = hunks[-1]
+        # Models often drop the leading space of empty context lines
+        marker, body = (line[0], line[1:]) if line else (" ", "")
+        if marker == "-":
+            old_lines.append(body)
+        elif marker == "+":
+            new_lines.append(body)
+        elif marker == " ":
+            old_lines.append(body)
+            new_lines.append(body)
+        else:
+            raise FoamPatchError(f"unexpected line in diff hunk: {line!r}")
+    if not hunks:
+        raise FoamPatchError("the diff contains no '@@' hunk")
+    return hunks
+
+
+def _find_block(lines: List[str], block: List[str], hint: int) -> int:
+    # The nearest exact match to the line number given in the hunk header, then ignoring indentation
+    for normalize in (str.rstrip, str.strip):
+        wanted = [normalize(line) for line in block]
+        matches = [
+            start for start in range(len(lines) - len(block) + 1)
+            if [normalize(line) for line in lines[start:start + len(block)]] == wanted
+        ]
+        if matches:
+            return min(matches, key=lambda start: abs(start - hint))
+    raise FoamPatchError("the lines to replace were not found:\n" + "\n".join(block[:5]))
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """
+    Apply a unified diff to text. Hunks are located by their context, so slightly wrong line
+    numbers are tolerated. Raises FoamPatchError if a hunk does not match.
+    """
+    lines = text.splitlines()
+    offset = 0
+    for old_start, old_lines, new_lines in _parse_hunks(diff):
+        hint = max(0, old_start - 1 + offset)
+        start = _find_block(lines, old_lines, hint) if old_lines else min(hint, len(lines))
+        lines[start:start + len(old_lines)] = new_lines
+        offset += len(new_lines) - len(old_lines)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def apply_edit(text: str, edit) -> str:
+    """
+    Apply one edit (an object with action, key_path, value and content) to text.
+    """
+    if edit.action == "set":
+        if not edit.key_path:
+            raise FoamPatchError("a 'set' edit needs a key_path")
+        return set_entry(text, list(edit.key_path), edit.value)
+    if edit.action == "delete":
+        if find_entry(text, list(edit.key_path)) is None:
+            raise FoamPatchError(f"cannot delete {'/'.join(edit.key_path)}, the entry does not exist")
+        return delete_entry(text, list(edit.key_path))
+    if edit.action == "diff":
+        return apply_unified_diff(text, edit.content)
+    if edit.action == "rewrite":
+        return edit.content
+    raise FoamPatchError(f"unknown edit action '{edit.action}'")
+
+
+def _folder(folder_name: str) -> str:
+    return folder_name.strip("./") or "."
+
+
+def _parses(text: str) -> bool:
+    try:
+        parse_foam_dict(text)
+        return True
+    except FoamParseError:
+        return False
+
+
+def apply_edits(foamfiles, edits) -> Dict[Tuple[str, str], str]:
+    """
+    Apply the edits to the contents of foamfiles (objects with file_name, folder_name and content).
+    Returns the edited files as {(folder, file): content}, with the folder names of foamfiles for
+    existing files. Raises FoamPatchError if an edit cannot be applied, an edited dictionary no longer
+    parses or no file changes at all.
+    """
+    # Folders are compared without "./" prefixes or trailing slashes, as "./0", "0/" and "0" are the same folder
+    contents = {(_folder(foamfile.folder_name), foamfile.file_name): foamfile.content for foamfile in foamfiles}
+    folder_names = {(_folder(foamfile.folder_name), foamfile.file_name): foamfile.folder_name for foamfile in foamfiles}
+    changed = {}
+    for edit in edits:
+        key = (_folder(edit.folder_name), edit.file_name)
+        folder_names.setdefault(key, edit.folder_name)
+        if key not in changed and key not in contents and edit.action in ("set", "delete"):
+            raise FoamPatchError(f"{edit.folder_name}/{edit.file_name} does not exist, create it with a 'rewrite' edit")
+        text = changed.get(key, contents.get(key, ""))
+        try:
+            changed[key] = apply_edit(text, edit)
+        except FoamParseError as e:
+            raise FoamPatchError(f"cannot edit {edit.folder_name}/{edit.file_name}: {e}")
+    for (folder_name, file_name), content in changed.items():
+        # Files the parser could not read before the edit are not held to it afterwards
+        if folder_name in DICTIONARY_FOLDERS and _parses(contents.get((folder_name, file_name), "")):
+            try:
+                parse_foam_dict(content)
+            except FoamParseError as e:
+                raise FoamPatchError(f"{folder_name}/{file_name} does not parse after editing: {e}")
+    changed = {key: content for key, content in changed.items() if content != contents.get(key)}
+    if not changed:
+        raise FoamPatchError("the edits do not change any file")
+    return {(folder_names[key], key[1]): content for key, content in changed.items()}
@@ -0,0 +1,165 @@
+# foam_validator.py
+"""
+Pre-flight validation of generated foamfiles before the Allrun is executed.
+
+Every dictionary is parsed locally and checked on its own (FoamFile header, required keywords,
+field dimensions) and against the other files (mesh patches versus boundaryField entries,
+controlDict application versus the parsed case solver). Errors use the same shape as
+utils.check_foam_errors so that the reviewer can consume them directly. Files the parser cannot
+read are only reported as a warning, since the parser does not cover all of the OpenFOAM syntax.
+"""
+import difflib
+import re
+from typing import Dict, List, Optional
+
+from foam_parser import DICTIONARY_FOLDERS, FoamDict, FoamList, FoamParseError, parse_foam_dict, unquote, entry_words, find_dimensions
+
+REQUIRED_KEYWORDS = {
+    # startFrom, stopAt and writeControl have defaults
+    "controlDict": ["application", "endTime", "deltaT", "writeInterval"],
+    "fvSchemes": ["ddtSchemes", "gradSchemes", "divSchemes", "laplacianSchemes", "interpolationSchemes", "snGradSchemes"],
+    "fvSolution": ["solvers"],
+}
+
+# Accepted dimension sets [kg m s K mol A cd] of common fields; p and p_rgh are kinematic or absolute
+FIELD_DIMENSIONS = {
+    "U": [[0, 1, -1, 0, 0, 0, 0]],
+    "p": [[0, 2, -2, 0, 0, 0, 0], [1, -1, -2, 0, 0, 0, 0]],
+    "p_rgh": [[0, 2, -2, 0, 0, 0, 0], [1, -1, -2, 0, 0, 0, 0]],
+    "k": [[0, 2, -2, 0, 0, 0, 0]],
+    "epsilon": [[0, 2, -3, 0, 0, 0, 0]],
+    "omega": [[0, 0, -1, 0, 0, 0, 0]],
+    "nut": [[0, 2, -1, 0, 0, 0, 0]],
+    "nuTilda": [[0, 2, -1, 0, 0, 0, 0]],
+    "T": [[0, 0, 0, 1, 0, 0, 0]],
+    "alphat": [[1, -1, -1, 0, 0, 0, 0]],
+}
+
+# Patch types covered by `#includeEtc "caseDicts/setConstraintTypes"` in field files
+CONSTRAINT_PATCH_TYPES = ["empty", "symmetry", "symmetryPlane", "wedge", "cyclic", "cyclicAMI", "cyclicSlip", "processor"]
+
+
+def _error(folder_name: str, file_name: str, check: str, message: str) -> dict:
+    return {
+        "file": f"preflight:{folder_name}/{file_name}",
+        "check": check,
+        "error_content": f"ERROR: {message}",
+    }
+
+
+def _close_match_hint(keyword: str, present: List[str]) -> str:
+    matches = difflib.get_close_matches(keyword, present, n=1, cutoff=0.75)
+    return f" Found '{matches[0]}', did you mean '{keyword}'?" if matches else ""
+
+
+def mesh_patches(block_mesh_dict: FoamDict) -> Optional[Dict[str, str]]:
+    """
+    Return {patch name: patch type} from blockMeshDict, or None if it defines no patches.
+    Faces not assigned to any patch end up in defaultFaces, which needs no boundaryField entry when empty.
+    """
+    patches = {}
+    boundary = block_mesh_dict.get("boundary")
+    if boundary:
+        items = [item for item in boundary[0]] if isinstance(boundary[0], FoamList) else []
+        for name, value in zip(items, items[1:]):
+            if isinstance(name, str) and isinstance(value, FoamDict):
+                patches[unquote(name)] = (entry_words(value.get("type")) or ["patch"])[0]
+    # Legacy `patches ( type name ( faces ) ... );` syntax
+    legacy = block_mesh_dict.get("patches")
+    if legacy and isinstance(legacy[0], FoamList):
+        items = list(legacy[0])
+        for position in range(0, len(items) - 2, 3):
+            patch_type, name = items[position], items[position + 1]
+            if isinstance(patch_type, str) and isinstance(name, str):
+                patches[unquote(name)] = patch_type
+    return patches or None
+
+
+def _boundary_field_covers(boundary_field: FoamDict, patch: str) -> bool:
+    for key in boundary_field:
+        pattern = unquote(key)
+        if key == patch:
+            return True
+        if key.startswith('"'):
+            try:
+                if re.fullmatch(pattern, patch):
+                    return True
+            except re.error:
+                continue
+    return False
+
+
+def validate_foamfiles(foamfiles, case_solver: Optional[str] = None) -> List[dict]:
+    """
+    Validate the generated foamfiles (objects with file_name, folder_name and content).
+    Returns a list of {"file", "check", "error_content"} dictionaries; empty means no problem was found.
+    """
+    errors = []
+    parsed = {}
+
+    for foamfile in foamfiles:
+        folder_name, file_name = foamfile.folder_name.strip("./") or ".", foamfile.file_name
+        if folder_name not in DICTIONARY_FOLDERS:
+            continue
+        try:
+            dictionary = parse_foam_dict(foamfile.content)
+        except FoamParseError as e:
+            # The parser does not cover every OpenFOAM syntax, so a file it cannot read must not block the run
+            print(f"Warning: pre-flight validation skipped {folder_name}/{file_name}, it cannot be parsed ({e}).")
+            continue
+        if "FoamFile" not in dictionary or not isinstance(dictionary["FoamFile"], FoamDict):
+            errors.append(_error(folder_name, file_name, "header", f"{folder_name}/{file_name} has no 'FoamFile' header dictionary."))
+        parsed[(folder_name, file_name)] = dictionary
+
+    # Required keywords
+    for (folder_name, file_name), dictionary in parsed.items():
+        for keyword in REQUIRED_KEYWORDS.get(file_name, []):
+            if keyword not in dictionary:
+                hint = _close_match_hint(keyword, list(dictionary))
+                errors.append(_error(folder_name, file_name, "keyword", f"Required keyword '{keyword}' is missing in {folder_name}/{file_name}.{hint}"))
+
+    # Field dimensions
+    for (folder_name, file_name), dictionary in parsed.items():
+        if folder_name == "0" and file_name in FIELD_DIMENSIONS and "dimensions" in dictionary:
+            dimensions = find_dimensions(dictionary["dimensions"])
+            if dimensions is not None and dimensions not in [[float(d) for d in expected] for expected in FIELD_DIMENSIONS[file_name]]:
+                expected = " or ".join(str(expected) for expected in FIELD_DIMENSIONS[file_name])
+                errors.append(_error(folder_name, file_name, "dimensions", f"Field {file_name} has dimensions {[int(d) if d.is_integer() else d for d in dimensions]}, expected {expected}."))
+    transport = parsed.get(("constant", "transportProperties"))
+    if transport is not None and "nu" in transport:
+        dimensions = find_dimensions(transport["nu"])
+        if dimensions is not None and dimensions != [0.0, 2.0, -1.0, 0.0, 0.0, 0.0, 0.0]:
+            errors.append(_error("constant", "transportProperties", "dimensions", "Kinematic viscosity nu must have dimensions [0 2 -1 0 0 0 0]."))
+
+    # Mesh patches versus boundaryField entries. snappyHexMesh adds patches from the geometry, so
+    # the check only applies when blockMeshDict defines the whole mesh.
+    block_mesh_dict = parsed.get(("system", "blockMeshDict"))
+    patches = mesh_patches(block_mesh_dict) if block_mesh_dict is not None and ("system", "snappyHexMeshDict") not in parsed else None
+    if patches:
+        for (folder_name, file_name), dictionary in parsed.items():
+            boundary_field = dictionary.get("boundaryField")
+            if folder_name != "0" or not isinstance(boundary_field, FoamDict):
+                continue
+            includes = dictionary.includes + boundary_field.includes
+            if any(directive in ("#include", "#includeIfPresent", "#sinclude") for directive, _ in includes):
+                # The included file may define the missing entries
+                continue
+            constraint_types_included = any("setConstraintTypes" in argument for _, argument in includes)
+            for patch, patch_type in patches.items():
+                if _boundary_field_covers(boundary_field, patch):
+                    continue
+                if constraint_types_included and patch_type in CONSTRAINT_PATCH_TYPES:
+                    continue
+                errors.append(_error(folder_name, file_name, "boundary",
+                                     f"Cannot find patchField entry for {patch} in {folder_name}/{file_name}. "
+                                     f"Patch '{patch}' (type {patch_type}) is defined in system/blockMeshDict but missing from boundaryField."))
+
+    # controlDict application versus the case solver
+    control_dict = parsed.get(("system", "controlDict"))
+    if case_solver and control_dict is not None and "application" in control_dict:
+        application = (entry_words(control_dict["application"]) or [""])[0]
+        if application and application != case_solver:
+            errors.append(_error("system", "controlDict", "solver",
+                                 f"controlDict application is '{application}' but the case solver is '{case_solver}'."))
+
+    return errors
@@ -1,8 +1,9 @@
 # input_writer_node.py
 import os
-from utils import save_file, parse_context, retrieve_faiss, FoamPydantic, FoamfilePydantic
+import asyncio
+from utils import save_file, parse_context, retrieve_faiss_batch, FoamPydantic, FoamfilePydantic, parse_tutorial_files, find_reference_files
 import re
-from typing import List
+from typing import List, Dict, Tuple
 from pydantic import BaseModel, Field
 
 
@@ -17,6 +18,65 @@ def compute_priority(subtask):
         return 3
         
 
+# Files whose content the keyed file must agree with, besides the folder rules in build_dependency_graph.
+# Names that are not part of the current case are ignored.
+FILE_DEPENDENCIES = {
+    "snappyHexMeshDict": ["blockMeshDict", "surfaceFeatureExtractDict", "surfaceFeaturesDict"],
+    "fvSchemes": ["turbulenceProperties", "momentumTransport", "thermophysicalProperties", "physicalProperties"],
+    "fvSolution": ["turbulenceProperties", "momentumTransport", "thermophysicalProperties", "physicalProperties"],
+    "setFieldsDict": ["blockMeshDict"],
+    "topoSetDict": ["blockMeshDict"],
+}
+
+# Files that define the mesh patches, which every field file in 0 must reference
+MESH_DEFINITION_FILES = ["blockMeshDict", "snappyHexMeshDict"]
+
+
+def build_dependency_graph(subtasks) -> Dict[Tuple[str, str], List[Tuple[str, str]]]:
+    """
+    Map each (folder_name, file_name) to the files it has to be generated after.
+    - 0/* depends on the mesh definition files and every constant file (patch names, nu, turbulence model).
+    - Files outside system, constant and 0 depend on everything in those folders, as in compute_priority.
+    - FILE_DEPENDENCIES adds the remaining known dependencies by file name.
+    """
+    keys = [(subtask.folder_name, subtask.file_name) for subtask in subtasks]
+    graph = {}
+    for folder_name, file_name in keys:
+        dependencies = []
+        for other_folder, other_file in keys:
+            if (other_folder, other_file) == (folder_name, file_name):
+                continue
+            if folder_name == "0":
+                depends = other_folder == "constant" or (other_folder == "system" and other_file in MESH_DEFINITION_FILES)
+            elif folder_name not in ("system", "constant"):
+                depends = other_folder in ("system", "constant", "0")
+            else:
+                depends = False
+            if depends or other_file in FILE_DEPENDENCIES.get(file_name, []):
+                dependencies.append((other_folder, other_file))
+        graph[(folder_name, file_name)] = dependencies
+
+    # The declared dependencies should be acyclic; drop the closing edge of any cycle so that generation cannot deadlock
+    priority = {(subtask.folder_name, subtask.file_name): compute_priority(subtask) for subtask in subtasks}
+    visiting, done = set(), set()
+
+    def _visit(key):
+        visiting.add(key)
+        for dependency in list(graph[key]):
+            if dependency in visiting:
+                print(f"Warning: dependency cycle between {key} and {dependency}, ignoring the edge.")
+                graph[key].remove(dependency)
+            elif dependency not in done:
+                _visit(dependency)
+        visiting.discard(key)
+        done.add(key)
+
+    for key in sorted(graph, key=lambda key: priority[key]):
+        if key not in done:
+            _visit(key)
+    return graph
+
+
 def parse_allrun(text: str) -> str:
     match = re.search(r'```(.*?)```', text, re.DOTALL)
     
@@ -33,6 +93,170 @@ class CommandsPydantic(BaseModel):
 
     
     
+def compact_foamfile(content: str) -> str:
+    """
+    Reduce a foamfile to what other files need to stay consistent with it: keywords and their values,
+    dictionary names (patch names, field names), dimensions and coefficients.
+    Comments are removed and long lists (vertices, blocks, nonuniform fields) are replaced by their length.
+    """
+    text = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
+    text = re.sub(r'//.*', '', text)
+
+    # Collapse lists that span several lines and hold no dictionaries (vertices, faces, field values)
+    pieces = []
+    position = 0
+    while True:
+        start = text.find("(", position)
+        if start == -1:
+            break
+        depth, end = 0, start
+        while end < len(text):
+            if text[end] == "(":
+                depth += 1
+            elif text[end] == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            end += 1
+        body = text[start + 1:end]
+        if "{" not in body and body.count("\n") > 3:
+            entries = [line for line in body.splitlines() if line.strip()]
+            pieces.append(text[position:start] + f"( /* {len(entries)} entries omitted */ )")
+            position = end + 1
+        elif "{" in body:
+            # Keep the list but look for collapsible lists inside its dictionaries
+            pieces.append(text[position:start + 1])
+            position = start + 1
+        else:
+            pieces.append(text[position:end + 1])
+            position = end + 1
+    pieces.append(text[position:])
+    text = "".join(pieces)
+
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    return "\n".join(lines)
+
+
+def build_generated_files_context(previous_files: List[FoamfilePydantic], max_tokens: int) -> str:
+    """
+    Render the already generated files a new file depends on within a token budget (about 4 characters per token).
+    Files are included verbatim when they fit, otherwise as compact extracts, and the extracts are
+    truncated evenly as a last resort.
+    """
+    def _render(contents):
+        return "\n".join(
+            f"<file folder_name='{foamfile.folder_name}' file_name='{foamfile.file_name}'>\n{content}\n</file>"
+            for foamfile, content in zip(previous_files, contents)
+        )
+
+    max_chars = max_tokens * 4
+    contents = [foamfile.content for foamfile in previous_files]
+    if len(_render(contents)) <= max_chars:
+        return _render(contents)
+
+    contents = [compact_foamfile(content) for content in contents]
+    if len(_render(contents)) <= max_chars:
+        return _render(contents)
+
+    overhead = len(_render([""] * len(contents)))
+    share = max(0, (max_chars - overhead) // max(1, len(contents)))
+    print(f"Warning: generated files context exceeds {max_tokens} tokens, truncating each file to {share} characters.")
+    return _render([content if len(content) <= share else content[:share] + "\n..." for content in contents])
+
+
+def build_reference_slice(state, folder_name: str, file_name: str) -> str:
+    """
+    Return the part of the tutorial reference relevant to one file: the case index and directory structure,
+    the matching reference file and a few files of the same directory.
+    Falls back to the whole reference if its <tutorials> block cannot be parsed.
+    """
+    tutorial_files = getattr(state, "tutorial_files", None)
+    if tutorial_files is None:
+        tutorial_files = state.tutorial_files = parse_tutorial_files(state.tutorial_reference)
+    if not tutorial_files:
+        return state.tutorial_reference
+    
+    reference_files = find_reference_files(tutorial_files, folder_name, file_name, state.config.reference_siblings)
+    header = state.tutorial_reference.split("<tutorials>", 1)[0].strip()
+    files_text = "\n".join(
+        f"<file_begin>directory name: {ref_folder}, file name: {ref_file}\n<file_content>{content}</file_content>\n</file_end>"
+        for (ref_folder, ref_file), content in reference_files
+    )
+    if not reference_files:
+        files_text = "No file of the similar case corresponds to this file."
+    return f"{header}\n<tutorials>\n{files_text}\n</tutorials>"
+
+
+def build_foamfile_prompts(state, file_name: str, folder_name: str, previous_files: List[FoamfilePydantic]) -> Tuple[str, str]:
+    """
+    Build the system and user prompts for generating one foamfile.
+    previous_files are the already generated files the new file has to be consistent with.
+    """
+    # Retrieve a similar reference foamfile from the tutorial.
+    similar_file_text = build_reference_slice(state, folder_name, file_name)
+    
+    # Generate the complete foamfile.
+    code_system_prompt = (
+        "You are an expert in OpenFOAM simulation and numerical modeling."
+        f"Your task is to generate a complete and functional file named: <file_name>{file_name}</file_name> within the <folder_name>{folder_name}</folder_name> directory. "
+        "Ensure all required values are present and match with the files content already generated."
+        "Before finalizing the output, ensure:\n"
+        "- All necessary fields exist (e.g., if `nu` is defined in `constant/transportProperties`, it must be used correctly in `0/U`).\n"
+        "- Cross-check field names between different files to avoid mismatches.\n"
+        "- Ensure units and dimensions are correct** for all physical variables.\n"
+        f"- Ensure case solver settings are consistent with the user's requirements. Available solvers are: {state.case_stats['case_solver']}.\n"
+        "Provide only the code—no explanations, comments, or additional text."
+    )
+
+    code_user_prompt = (
+        f"User requirement: {state.user_requirement}\n"
+        f"Refer to the following similar case file content to ensure the generated file aligns with the user requirement:\n<similar_case_reference>{similar_file_text}</similar_case_reference>\n"
+        f"Similar case reference is always correct. If you find the user requirement is very consistent with the similar case reference, you should use the similar case reference as the template to generate the file."
+        f"Just modify the necessary parts to make the file complete and functional."
+        "Please ensure that the generated file is complete, functional, and logically sound."
+        "Additionally, apply your domain expertise to verify that all numerical values are consistent with the user's requirements, maintaining accuracy and coherence."
+    )
+    if len(previous_files) > 0:
+        generated_context = build_generated_files_context(previous_files, state.config.input_writer_context_tokens)
+        code_user_prompt += f"The following are files content already generated: {generated_context}\n\n\nYou should ensure that the new file is consistent with the previous files. Such as boundary conditions, mesh settings, etc."
+    
+    return code_system_prompt, code_user_prompt
+
+
+async def generate_foamfiles(state, subtasks, max_concurrency: int) -> Dict[Tuple[str, str], FoamfilePydantic]:
+    """
+    Generate all foamfiles following the dependency graph. Each file starts as soon as the files it
+    depends on are written, with at most max_concurrency LLM requests in flight.
+    """
+    graph = build_dependency_graph(subtasks)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    generated = {}
+    tasks = {}
+    
+    async def _generate(key):
+        folder_name, file_name = key
+        if graph[key]:
+            await asyncio.gather(*(tasks[dependency] for dependency in graph[key]))
+        previous_files = [generated[dependency] for dependency in graph[key]]
+        
+        file_path = os.path.join(state.case_dir, folder_name, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        code_system_prompt, code_user_prompt = build_foamfile_prompts(state, file_name, folder_name, previous_files)
+        
+        async with semaphore:
+            print(f"Generating file: {file_name} in folder: {folder_name}")
+            generation_response = await state.llm_service.ainvoke(code_user_prompt, code_system_prompt, early_stop=state.config.llm_early_stop)
+        
+        code_context = parse_context(generation_response)
+        save_file(file_path, code_context)
+        generated[key] = FoamfilePydantic(file_name=file_name, folder_name=folder_name, content=code_context)
+    
+    for key in graph:
+        tasks[key] = asyncio.ensure_future(_generate(key))
+    await asyncio.gather(*tasks.values())
+    return generated
+
+
 def input_writer_node(state):
     """
     InputWriter node: Generate the complete OpenFOAM foamfile.
@@ -42,58 +266,19 @@ def input_writer_node(state):
     
     subtasks = sorted(subtasks, key=compute_priority)
     
-    writed_files = []
     dir_structure = {}
     
     for subtask in subtasks:
-        file_name = subtask.file_name
-        folder_name = subtask.folder_name
-        
-        if folder_name not in dir_structure:
-            dir_structure[folder_name] = []
-        dir_structure[folder_name].append(file_name)
-        
-        print(f"Generating file: {file_name} in folder: {folder_name}")
-        
-        if not file_name or not folder_name:
+        if not subtask.file_name or not subtask.folder_name:
             raise ValueError(f"Invalid subtask format: {subtask}")
-
-        file_path = os.path.join(state.case_dir, folder_name, file_name)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
-        # Retrieve a similar reference foamfile from the tutorial.
-        similar_file_text = state.tutorial_reference
-        
-        # Generate the complete foamfile.
-        code_system_prompt = (
-            "You are an expert in OpenFOAM simulation and numerical modeling."
-            f"Your task is to generate a complete and functional file named: <file_name>{file_name}</file_name> within the <folder_name>{folder_name}</folder_name> directory. "
-            "Ensure all required values are present and match with the files content already generated."
-            "Before finalizing the output, ensure:\n"
-            "- All necessary fields exist (e.g., if `nu` is defined in `constant/transportProperties`, it must be used correctly in `0/U`).\n"
-            "- Cross-check field names between different files to avoid mismatches.\n"
-            "- Ensure units and dimensions are correct** for all physical variables.\n"
-            f"- Ensure case solver settings are consistent with the user's requirements. Available solvers are: {state.case_stats['case_solver']}.\n"
-            "Provide only the code—no explanations, comments, or additional text."
-        )
-
-        code_user_prompt = (
-            f"User requirement: {state.user_requirement}\n"
-            f"Refer to the following similar case file content to ensure the generated file aligns with the user requirement:\n<similar_case_reference>{similar_file_text}</similar_case_reference>\n"
-            f"Similar case reference is always correct. If you find the user requirement is very consistent with the similar case reference, you should use the similar case reference as the template to generate the file."
-            f"Just modify the necessary parts to make the file complete and functional."
-            "Please ensure that the generated file is complete, functional, and logically sound."
-            "Additionally, apply your domain expertise to verify that all numerical values are consistent with the user's requirements, maintaining accuracy and coherence."
-        )
-        if len(writed_files) > 0:
-            code_user_prompt += f"The following are files content already generated: {str(writed_files)}\n\n\nYou should ensure that the new file is consistent with the previous files. Such as boundary conditions, mesh settings, etc."
-
-        generation_response = state.llm_service.invoke(code_user_prompt, code_system_prompt)
-        
-        code_context = parse_context(generation_response)
-        save_file(file_path, code_context)
-        
-        writed_files.append(FoamfilePydantic(file_name=file_name, folder_name=folder_name, content=code_context))
+        if subtask.folder_name not in dir_structure:
+            dir_structure[subtask.folder_name] = []
+        dir_structure[subtask.folder_name].append(subtask.file_name)
+    
+    # Independent files (e.g. fvSchemes and fvSolution) are generated in parallel
+    generated = asyncio.run(generate_foamfiles(state, subtasks, config.input_writer_max_concurrency))
+    writed_files = [generated[key] for key in dict.fromkeys((subtask.folder_name, subtask.file_name) for subtask in subtasks)]
     
     state.dir_structure = dir_structure
     
@@ -131,8 +316,7 @@ def input_writer_node(state):
     state.commands = command_response.commands
     
     commands_help = []
-    for command in command_response.commands:
-        command_help = retrieve_faiss("openfoam_command_help", command, topk=state.config.searchdocs)
+    for command_help in retrieve_faiss_batch("openfoam_command_help", command_response.commands, topk=state.config.searchdocs):
         commands_help.append(command_help[0]['full_content'])
     commands_help = "\n".join(commands_help)
 
@@ -153,7 +337,7 @@ def input_writer_node(state):
         "Generate the Allrun script strictly based on the above information. Do not include explanations, comments, or additional text. Put the code in ``` tags."
     )
     
-    allrun_response = state.llm_service.invoke(allrun_user_prompt, allrun_system_prompt)
+    allrun_response = state.llm_service.invoke(allrun_user_prompt, allrun_system_prompt, early_stop=config.llm_early_stop)
     
     allrun_script = parse_allrun(allrun_response)
     save_file(allrun_file_path, allrun_script)
@@ -0,0 +1,141 @@
+# lexical_index.py
+"""
+Exact-name and BM25 keyword indexes that sit next to a FAISS store.
+
+Queries against openfoam_command_help are nearly always OpenFOAM binary names, so an exact
+dictionary lookup answers most of them without touching the embedder. Other queries are answered by
+vector search, with the BM25 matches over the help text fused into its ranking by reciprocal-rank
+fusion, so that keyword hits can lift a document but a single shared word cannot take over.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, List, Optional
+
+LEXICAL_INDEX_FILE = "lexical_index.json"
+
+# Words in front of a command name that still make the query a name lookup
+NAME_QUERY_PREFIXES = ["runApplication", "runParallel", "mpirun"]
+
+# Rank offset of reciprocal-rank fusion (the usual 60) and the weight of the BM25 ranking against
+# the vector ranking: a document only BM25 finds cannot outrank the top vector match
+RRF_K = 60
+LEXICAL_WEIGHT = 0.5
+
+
+def split_terms(text: str) -> List[str]:
+    # Split camelCase and snake_case names the same way utils.tokenize does, then keep alphanumerics
+    text = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', text.replace('_', ' '))
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+class BM25Index:
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(terms) for terms in documents]
+        self.doc_lengths = [len(terms) for terms in documents]
+        self.avg_doc_length = sum(self.doc_lengths) / len(documents) if documents else 0.0
+
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        n_docs = len(documents)
+        self.idf = {term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def search(self, terms: List[str], topk: int = 1) -> List[tuple]:
+        """
+        Return up to topk (document position, score) pairs with a positive score, best first.
+        """
+        query_terms = [term for term in set(terms) if term in self.idf]
+        if not query_terms:
+            return []
+
+        scores = []
+        for position, freqs in enumerate(self.term_freqs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / (self.avg_doc_length or 1.0))
+            for term in query_terms:
+                tf = freqs.get(term, 0)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((position, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:topk]
+
+
+class CommandLexicalIndex:
+    """
+    Exact-name dictionary plus a BM25 index over the command name and help text.
+    Each record holds the page_content and metadata of the matching FAISS document, plus the help
+    text when the metadata keeps it in the payload store.
+    """
+    def __init__(self, records: List[dict]):
+        self.records = records
+        self.by_name = {}
+        self.by_lower_name = {}
+        for position, record in enumerate(records):
+            command = record["metadata"].get("command", "")
+            self.by_name.setdefault(command, position)
+            self.by_lower_name.setdefault(command.lower(), position)
+        self.bm25 = BM25Index([
+            split_terms(record["metadata"].get("command", "")) + split_terms(record.get("help_text", record["metadata"].get("help_text", "")))
+            for record in records
+        ])
+
+    @classmethod
+    def from_docstore(cls, docs) -> "CommandLexicalIndex":
+        return cls([{"page_content": doc.page_content, "metadata": dict(doc.metadata or {})} for doc in docs])
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["CommandLexicalIndex"]:
+        path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, index_dir: str) -> None:
+        with open(os.path.join(index_dir, LEXICAL_INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False)
+
+    def exact(self, query: str) -> Optional[int]:
+        """
+        Look the query up as a command name. Falls back to a case-insensitive match, and to the name
+        in a command line such as "runApplication blockMesh" or "mpirun -np 4 simpleFoam -parallel".
+        Words of a longer sentence are not looked up: a query that merely mentions a command is not a lookup.
+        """
+        query = query.strip()
+        words = [word for word in query.split() if not word.startswith("-") and not word.isdigit() and word not in NAME_QUERY_PREFIXES]
+        for candidate in [query] + (words if len(words) == 1 else []):
+            if candidate in self.by_name:
+                return self.by_name[candidate]
+            if candidate.lower() in self.by_lower_name:
+                return self.by_lower_name[candidate.lower()]
+        return None
+
+    def search(self, query: str, topk: int = 1) -> List[dict]:
+        """
+        Return up to topk BM25 matches of the query, best first.
+        """
+        return [self.records[position] for position, _ in self.bm25.search(split_terms(query), topk)]
+
+
+def reciprocal_rank_fusion(rankings: List[list], weights: List[float], topk: int, key: Callable = lambda item: item) -> list:
+    """
+    Merge rankings (lists of items, best first) by weighted reciprocal-rank fusion: an item scores
+    weight / (RRF_K + rank) in every ranking it appears in. Items are identified by key(item); ties
+    keep the order of the earlier rankings. Returns the topk best items.
+    """
+    scores, items = {}, {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            items.setdefault(item_key, item)
+            scores[item_key] = scores.get(item_key, 0.0) + weight / (RRF_K + rank)
+    ordered = sorted(items, key=lambda item_key: scores[item_key], reverse=True)
+    return [items[item_key] for item_key in ordered[:topk]]
+
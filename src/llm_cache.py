@@ -0,0 +1,89 @@
+# llm_cache.py
+"""
+Content-addressed on-disk cache for LLM responses.
+
+Each response is stored as a JSON file named by the hash of everything that determines it:
+provider, model, temperature, system prompt, user prompt, the structured-output schema and whether
+the response was streamed with early stopping (such a response may end before the full answer would).
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Optional, Type
+
+from pydantic import BaseModel
+
+# off: never use the cache
+# read_through: return cached responses, call the provider and record on a miss
+# record: always call the provider and record the response
+# replay: only return cached responses, a miss is an error
+LLM_CACHE_MODES = ["off", "read_through", "record", "replay"]
+
+
+class LLMCacheMiss(Exception):
+    pass
+
+
+class LLMResponseCache:
+    def __init__(self, cache_dir: str, mode: str = "read_through"):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"{mode} is not a supported LLM cache mode, expected one of {LLM_CACHE_MODES}")
+        self.cache_dir = str(cache_dir)
+        self.mode = mode
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in ("read_through", "replay")
+
+    @property
+    def writes(self) -> bool:
+        return self.mode in ("read_through", "record")
+
+    def key(self,
+            model_provider: str,
+            model_version: str,
+            temperature: float,
+            system_prompt: Optional[str],
+            user_prompt: str,
+            pydantic_obj: Optional[Type[BaseModel]] = None,
+            early_stop: bool = False) -> str:
+        payload = {
+            "model_provider": model_provider.lower(),
+            "model_version": model_version,
+            "temperature": temperature,
+            "system_prompt": system_prompt or "",
+            "user_prompt": user_prompt,
+            "schema": pydantic_obj.model_json_schema() if pydantic_obj else None,
+        }
+        if early_stop:
+            # Only added when set, so the keys of full responses recorded before stay valid
+            payload["early_stop"] = True
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str, pydantic_obj: Optional[Type[BaseModel]] = None) -> Any:
+        """
+        Return the cached response, rebuilt as `pydantic_obj` for structured output.
+        Raises LLMCacheMiss if the response is not cached.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise LLMCacheMiss(f"No cached LLM response for key {key}")
+        with open(path, "r", encoding="utf-8") as f:
+            response = json.load(f)["response"]
+        return pydantic_obj.model_validate(response) if pydantic_obj else response
+
+    def put(self, key: str, response: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(response, BaseModel):
+            response = response.model_dump()
+        # Write to a temporary file first so that concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"response": response}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -3,14 +3,17 @@ from typing import List, Optional
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 import argparse
+import signal
+import sys
 from pathlib import Path
-from utils import LLMService
+from utils import LLMService, FAISS_DB_REGISTRY
 
 from config import Config
 from architect_node import architect_node
 from input_writer_node import input_writer_node
 from runner_node import runner_node
 from reviewer_node import reviewer_node
+from case_snapshots import CaseSnapshots, snapshot_iteration
 import json
 
 @dataclass
@@ -31,15 +34,27 @@ def main(user_requirement: str, config: Config):
     state = GraphState(user_requirement=user_requirement, config=config)
     state.llm_service = LLMService(config)
     
+    # Load the databases used by the architect while the case description is being parsed.
+    # openfoam_command_help is only loaded once the input writer asks for it.
+    FAISS_DB_REGISTRY.preload(["openfoam_tutorials_structure", "openfoam_tutorials_details", "openfoam_allrun_scripts"])
+    
     state.case_stats = json.load(open(f"{state.config.database_path}/raw/openfoam_case_stats.json", "r"))
     
     architect_node(state)
     input_writer_node(state)
     
+    # Record the case after every run; with config.auto_rollback a fix that made things worse is rolled back
+    state.snapshots = CaseSnapshots(state.case_dir) if config.case_snapshots else None
+    
     max_loop = config.max_loop
     for i in range(max_loop):
         print(f"Loop {i+1}: ")
         runner_response = runner_node(state)
+        if getattr(state, "auto_fixer", None) is not None:
+            # The errors of this run tell whether the deterministic fixes applied before it worked
+            state.auto_fixer.record_outcome(getattr(state, "error_logs", []))
+        if state.snapshots is not None:
+            snapshot_iteration(state, i + 1)
         if runner_response["goto"] == "end":
             break
         
@@ -106,6 +121,14 @@ if __name__ == "__main__":
         help="Path to MSH file for fluentMeshToFoam",
     )
     
+    parser.add_argument(
+        "--llm_cache_mode",
+        type=str,
+        default=None,
+        choices=["off", "read_through", "record", "replay"],
+        help="LLM response cache mode. 'replay' serves every call from the cache without a model server.",
+    )
+    
     args = parser.parse_args()
     print(args)
     
@@ -127,7 +150,14 @@ if __name__ == "__main__":
     if args.msh:
         config.msh_file = args.msh
     
+    # Set the LLM response cache mode if provided
+    if args.llm_cache_mode:
+        config.llm_cache_mode = args.llm_cache_mode
+    
     with open(args.prompt_path, 'r') as f:
         user_requirement = f.read()
     
+    # Exit through SystemExit on SIGTERM, so that run_command stops the Allrun process group it started
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    
     main(user_requirement, config)
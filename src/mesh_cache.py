@@ -0,0 +1,173 @@
+# mesh_cache.py
+"""
+Content-addressed cache of generated meshes.
+
+A mesh is stored under the hash of everything that defines it: the meshing commands, the content of
+their input files (blockMeshDict, snappyHexMeshDict, triSurface, .msh files, ...) and the OpenFOAM
+version. Restoring clones the cached files into the case (reflinks where the filesystem supports them,
+optionally hardlinks) instead of running the meshing again. Entries are evicted least recently used
+first once the cache exceeds its disk quota.
+"""
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+from allrun_steps import AllrunStep, hash_paths, step_paths
+
+# Paths written by meshing steps that are stored in the cache
+MESH_OUTPUTS = ["constant/polyMesh", "constant/extendedFeatureEdgeMesh", "constant/triSurface"]
+
+# Linux ioctl that makes the target file share the blocks of the source file (copy-on-write)
+FICLONE = 0x40049409
+
+
+def openfoam_version() -> str:
+    return os.getenv("WM_PROJECT_VERSION") or os.path.basename(os.getenv("WM_PROJECT_DIR") or "") or "unknown"
+
+
+def clone_file(source: str, target: str, hardlink: bool = False) -> None:
+    if hardlink:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, target)
+        return
+    except OSError:
+        pass
+    shutil.copy2(source, target)
+
+
+def clone_tree(source: str, target: str, hardlink: bool = False) -> None:
+    for root, _, names in os.walk(source):
+        target_root = os.path.join(target, os.path.relpath(root, source))
+        os.makedirs(target_root, exist_ok=True)
+        for name in names:
+            clone_file(os.path.join(root, name), os.path.join(target_root, name), hardlink)
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def mesh_steps_end(steps: List[AllrunStep]) -> int:
+    """
+    Return the number of leading steps that only build the mesh (cleaning, meshing, checkMesh).
+    The prefix ends before a snappyHexMesh without -overwrite, which is not skippable, and is empty
+    if a later step may still write the mesh, since the mesh is stored after the whole run.
+    """
+    end = 0
+    for step in steps:
+        if not step.skippable or not set(step.outputs) <= set(MESH_OUTPUTS):
+            break
+        end = step.index + 1
+    # Trailing cleaning or checkMesh steps do not produce a mesh on their own
+    while end > 0 and not steps[end - 1].outputs:
+        end -= 1
+    # e.g. `cp -r 1/polyMesh constant` after a snappyHexMesh without -overwrite
+    for step in steps[end:]:
+        if "polyMesh" in step.command or set(step.outputs or []) & set(MESH_OUTPUTS):
+            return 0
+    return end
+
+
+def mesh_key(case_dir: str, steps: List[AllrunStep]) -> str:
+    """
+    Cache key of the mesh produced by the given steps in case_dir.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"openfoam:{openfoam_version()}\n".encode())
+    inputs = set()
+    for step in steps:
+        digest.update(f"step:{step.command}\n".encode())
+        step_inputs, _ = step_paths(case_dir, step)
+        inputs.update(path for path in step_inputs if path != "constant/polyMesh")
+    digest.update(hash_paths(case_dir, sorted(inputs)).encode())
+    return digest.hexdigest()
+
+
+class MeshCache:
+    def __init__(self, cache_dir: str, quota_bytes: int, hardlink: bool = False):
+        self.cache_dir = str(cache_dir)
+        self.quota_bytes = quota_bytes
+        # Hardlinked files are shared with the cache, so only use them when nothing rewrites the mesh in place
+        self.hardlink = hardlink
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def restore(self, key: str, case_dir: str) -> bool:
+        """
+        Clone the cached mesh into case_dir. Returns False if the key is not cached.
+        """
+        entry = self._entry(key)
+        if not os.path.isdir(entry):
+            return False
+        for path in os.listdir(entry):
+            target = os.path.join(case_dir, "constant", path)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            clone_tree(os.path.join(entry, path), target, self.hardlink)
+        # The modification time of an entry is its last use for the LRU eviction
+        os.utime(entry)
+        print(f"Restored the mesh from the mesh cache ({key[:12]}).")
+        return True
+
+    def store(self, key: str, case_dir: str) -> None:
+        """
+        Store the mesh outputs of case_dir under key and evict old entries beyond the quota.
+        """
+        entry = self._entry(key)
+        if os.path.isdir(entry) or not os.path.isdir(os.path.join(case_dir, "constant", "polyMesh")):
+            return
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            for path in MESH_OUTPUTS:
+                source = os.path.join(case_dir, path)
+                if os.path.isdir(source):
+                    clone_tree(source, os.path.join(staging, os.path.basename(path)))
+            os.replace(staging, entry)
+        except OSError as e:
+            print(f"Warning: could not store the mesh in the mesh cache: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = [self._entry(name) for name in os.listdir(self.cache_dir) if not name.startswith(".")]
+        entries.sort(key=os.path.getmtime)
+        sizes = {entry: _tree_size(entry) for entry in entries}
+        total = sum(sizes.values())
+        for entry in entries:
+            if total <= self.quota_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
+            print(f"Evicted {os.path.basename(entry)[:12]} from the mesh cache.")
+
+
+_MESH_CACHE: Optional[MeshCache] = None
+
+
+def get_mesh_cache(config) -> Optional[MeshCache]:
+    """
+    Return the process-wide mesh cache for config, or None if it is disabled.
+    """
+    global _MESH_CACHE
+    if not config.mesh_cache:
+        return None
+    if _MESH_CACHE is None:
+        _MESH_CACHE = MeshCache(config.mesh_cache_dir, int(config.mesh_cache_quota_gb * 1024 ** 3), config.mesh_cache_hardlinks)
+    return _MESH_CACHE
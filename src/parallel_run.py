@@ -0,0 +1,160 @@
+# parallel_run.py
+"""
+Opt-in parallel execution of generated cases.
+
+The mesh size is estimated from system/blockMeshDict (or from an existing mesh / checkMesh log),
+a core count is picked from it, system/decomposeParDict is written or patched, and the solver call
+in the Allrun is replaced by decomposePar, `mpirun -np N <solver> -parallel` and reconstructPar.
+Every step still writes its own log.<application>, so check_foam_errors and the run monitors
+keep working unchanged.
+"""
+import os
+import re
+from typing import Optional
+
+from foam_parser import FoamList, FoamParseError, parse_foam_dict
+
+DECOMPOSE_PAR_DICT_TEMPLATE = """FoamFile
+{{
+    version     2.0;
+    format      ascii;
+    class       dictionary;
+    object      decomposeParDict;
+}}
+
+numberOfSubdomains {subdomains};
+
+method          scotch;
+"""
+
+CHECK_MESH_CELLS_PATTERN = re.compile(r"^\s*cells:\s+(\d+)", re.MULTILINE)
+OWNER_CELLS_PATTERN = re.compile(r"nCells:\s*(\d+)")
+PARALLEL_ALLRUN_PATTERN = re.compile(r"-parallel\b|\bmpirun\b|\brunParallel\b")
+
+
+def _block_mesh_cells(block_mesh_dict_path: str) -> Optional[int]:
+    with open(block_mesh_dict_path, "r") as f:
+        try:
+            dictionary = parse_foam_dict(f.read())
+        except FoamParseError:
+            return None
+    blocks = dictionary.get("blocks")
+    if not blocks or not isinstance(blocks[0], FoamList):
+        return None
+    # Each block is `hex (vertices) (nx ny nz) grading (...)`, the cell counts follow the vertex list
+    items = list(blocks[0])
+    cells = 0
+    for position, item in enumerate(items):
+        if item != "hex" or position + 2 >= len(items):
+            continue
+        counts = items[position + 2]
+        if not isinstance(counts, FoamList) or len(counts) != 3:
+            return None
+        try:
+            nx, ny, nz = (int(count) for count in counts)
+        except (TypeError, ValueError):
+            # Counts given through #calc or $variables cannot be evaluated here
+            return None
+        cells += nx * ny * nz
+    return cells or None
+
+
+def estimate_cell_count(case_dir: str) -> Optional[int]:
+    """
+    Estimate the number of mesh cells of a case, or None if it cannot be determined before running it.
+    """
+    check_mesh_log = os.path.join(case_dir, "log.checkMesh")
+    if os.path.exists(check_mesh_log):
+        with open(check_mesh_log, "r", errors="replace") as f:
+            match = CHECK_MESH_CELLS_PATTERN.search(f.read())
+        if match:
+            return int(match.group(1))
+
+    owner_file = os.path.join(case_dir, "constant", "polyMesh", "owner")
+    if os.path.exists(owner_file):
+        with open(owner_file, "r", errors="replace") as f:
+            match = OWNER_CELLS_PATTERN.search(f.read(4096))
+        if match:
+            return int(match.group(1))
+
+    block_mesh_dict = os.path.join(case_dir, "system", "blockMeshDict")
+    if os.path.exists(block_mesh_dict) and not os.path.exists(os.path.join(case_dir, "system", "snappyHexMeshDict")):
+        return _block_mesh_cells(block_mesh_dict)
+    return None
+
+
+def choose_core_count(cells: Optional[int], config: object) -> int:
+    """
+    Pick the number of subdomains for a mesh: one core per config.parallel_cells_per_core cells,
+    capped by config.parallel_max_cores and the cores of this machine. 1 means run serially.
+    """
+    if not cells or cells < config.parallel_min_cells:
+        return 1
+    max_cores = min(config.parallel_max_cores, os.cpu_count() or 1)
+    return max(1, min(max_cores, cells // config.parallel_cells_per_core))
+
+
+def write_decompose_par_dict(case_dir: str, subdomains: int) -> None:
+    """
+    Write system/decomposeParDict, or set numberOfSubdomains in an existing one.
+    """
+    path = os.path.join(case_dir, "system", "decomposeParDict")
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            content = f.read()
+        content, replaced = re.subn(r"^(\s*numberOfSubdomains\s+)[^;]*;", rf"\g<1>{subdomains};", content, flags=re.MULTILINE)
+        if replaced:
+            with open(path, "w") as f:
+                f.write(content)
+            return
+        print("Warning: decomposeParDict has no numberOfSubdomains entry. Overwriting it.")
+    with open(path, "w") as f:
+        f.write(DECOMPOSE_PAR_DICT_TEMPLATE.format(subdomains=subdomains))
+
+
+def parallelize_allrun(script: str, solver: str, subdomains: int) -> Optional[str]:
+    """
+    Replace the serial solver call of an Allrun script by decomposePar, mpirun and reconstructPar.
+    Returns None if the solver call cannot be found.
+    """
+    call = re.compile(
+        rf"^(?P<indent>[ \t]*)(?:runApplication[ \t]+)?(?:{re.escape(solver)}|\$\(getApplication\))\b(?P<args>[^\n>|&;]*)(?P<rest>[^\n]*)$",
+        re.MULTILINE,
+    )
+    match = call.search(script)
+    if match is None:
+        return None
+    indent, args = match.group("indent"), match.group("args").rstrip()
+    replacement = "\n".join([
+        f"{indent}decomposePar -force > log.decomposePar 2>&1",
+        f"{indent}mpirun -np {subdomains} {solver}{args} -parallel > log.{solver} 2>&1",
+        f"{indent}reconstructPar > log.reconstructPar 2>&1",
+    ])
+    return script[:match.start()] + replacement + script[match.end():]
+
+
+def prepare_parallel_run(case_dir: str, solver: Optional[str], config: object) -> int:
+    """
+    Switch the case in case_dir to a parallel run if its mesh is large enough.
+    Returns the number of subdomains used (1 when the case keeps running serially).
+    """
+    if not solver:
+        return 1
+    subdomains = choose_core_count(estimate_cell_count(case_dir), config)
+    if subdomains <= 1:
+        return 1
+    allrun_file_path = os.path.join(case_dir, "Allrun")
+    with open(allrun_file_path, "r") as f:
+        script = f.read()
+    if PARALLEL_ALLRUN_PATTERN.search(script):
+        # Already decomposed by the generated script or a previous run
+        return 1
+    parallel_script = parallelize_allrun(script, solver, subdomains)
+    if parallel_script is None:
+        print(f"Could not switch the Allrun to a parallel run of {solver}. Running it as generated.")
+        return 1
+    write_decompose_par_dict(case_dir, subdomains)
+    with open(allrun_file_path, "w") as f:
+        f.write(parallel_script)
+    print(f"Running {solver} in parallel on {subdomains} cores.")
+    return subdomains
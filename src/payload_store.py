@@ -0,0 +1,42 @@
+# payload_store.py
+"""
+Side store for the large document fields of the FAISS databases.
+
+The FAISS docstore is unpickled in full by every process, so the builder scripts keep only small
+metadata in it and write heavy fields (full_content, tutorials, allrun_script, help_text) to a
+SQLite file next to the index. Retrieval reads those fields for the few documents it returns.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+PAYLOAD_STORE_FILE = "payloads.sqlite"
+PAYLOAD_FIELDS = ["full_content", "tutorials", "allrun_script", "help_text"]
+
+
+class PayloadStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # Read-only: the store is written once by the builder scripts
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    @classmethod
+    def open(cls, index_dir: str) -> Optional["PayloadStore"]:
+        path = os.path.join(index_dir, PAYLOAD_STORE_FILE)
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def get(self, payload_id: str, fields: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Return the stored fields of one document, restricted to `fields` when given.
+        """
+        query = "SELECT field, content FROM payloads WHERE payload_id = ?"
+        params = [payload_id]
+        if fields:
+            query += f" AND field IN ({', '.join('?' for _ in fields)})"
+            params.extend(fields)
+        with self._lock:
+            return dict(self._conn.execute(query, params).fetchall())
@@ -0,0 +1,135 @@
+# review_history.py
+"""
+Bounded history of the reviewer's repair attempts.
+
+The last few attempts are kept verbatim (error logs, review analysis, modified files). Older attempts
+are folded into a digest grouped by error signature, listing the fixes tried and their outcome, and
+the whole history is kept within a token budget (about 4 characters per token).
+"""
+import re
+from typing import List, Optional
+
+MAX_SUMMARY_CHARS = 200
+
+
+def error_signature(error_logs: list) -> str:
+    """
+    A short, stable description of a set of errors: the log file and the first line of each error,
+    with numbers masked so that the same error at another time step has the same signature.
+    """
+    signatures = []
+    for error_log in error_logs:
+        lines = []
+        for line in str(error_log.get("error_content", "")).splitlines():
+            # Drop the "ERROR:" and "--> FOAM FATAL ERROR" banners in favour of the text that says what went wrong
+            line = re.sub(r"^\s*(ERROR:)?\s*(-->)?\s*(FOAM FATAL (IO )?ERROR:?( \(.*?\))?)?\s*", "", line).strip()
+            if line:
+                lines.append(line)
+        first_line = re.sub(r"\d+(\.\d+)?(e[-+]?\d+)?", "N", lines[0] if lines else "")
+        signature = f"{error_log.get('file', '')}: {first_line[:MAX_SUMMARY_CHARS]}"
+        if signature not in signatures:
+            signatures.append(signature)
+    signature = "; ".join(signatures) or "no error"
+    return signature if len(signature) <= MAX_SUMMARY_CHARS * 2 else signature[:MAX_SUMMARY_CHARS * 2] + "..."
+
+
+def _summary(text: str) -> str:
+    for line in str(text).splitlines():
+        line = line.strip(" #*-")
+        if line:
+            return line if len(line) <= MAX_SUMMARY_CHARS else line[:MAX_SUMMARY_CHARS] + "..."
+    return ""
+
+
+class ReviewAttempt:
+    def __init__(self, number: int, error_logs: list, review: str):
+        self.number = number
+        self.error_logs = error_logs
+        self.signature = error_signature(error_logs)
+        self.review = review
+        self.modified_files: List[str] = []
+        self.outcome: Optional[str] = None
+
+    def render(self, max_chars: Optional[int] = None) -> str:
+        error_logs, review = str(self.error_logs), str(self.review)
+        if max_chars is not None:
+            share = max(0, max_chars // 2)
+            error_logs = error_logs if len(error_logs) <= share else error_logs[:share] + "..."
+            review = review if len(review) <= share else review[:share] + "..."
+        return (
+            f"<Attempt {self.number}>\n"
+            f"<Error_Logs>\n{error_logs}\n</Error_Logs>\n"
+            f"<Review_Analysis>\n{review}\n</Review_Analysis>\n"
+            f"<Modified_Files>{', '.join(self.modified_files) or 'none'}</Modified_Files>\n"
+            f"<Outcome>{self.outcome or 'pending'}</Outcome>\n"
+            f"</Attempt>"
+        )
+
+
+class ReviewHistory:
+    def __init__(self, keep_last: int = 2, max_tokens: int = 3000):
+        self.keep_last = keep_last
+        self.max_tokens = max_tokens
+        self.attempts: List[ReviewAttempt] = []
+
+    def __len__(self) -> int:
+        return len(self.attempts)
+
+    def add_attempt(self, error_logs: list, review: str) -> ReviewAttempt:
+        """
+        Record a new review of error_logs. The errors also give the outcome of the previous attempt.
+        """
+        attempt = ReviewAttempt(len(self.attempts) + 1, error_logs, review)
+        if self.attempts and self.attempts[-1].outcome is None:
+            previous = self.attempts[-1]
+            previous.outcome = "the same error persisted" if attempt.signature == previous.signature else f"the error changed to: {attempt.signature}"
+        self.attempts.append(attempt)
+        return attempt
+
+    def record_modified_files(self, modified_files: List[str]) -> None:
+        if self.attempts:
+            self.attempts[-1].modified_files = list(modified_files)
+
+    def _digest_blocks(self, attempts: List[ReviewAttempt]) -> List[str]:
+        # Group the older attempts by error signature, keeping each distinct fix once
+        groups = {}
+        for attempt in attempts:
+            fix = f"modified {', '.join(attempt.modified_files) or 'no files'}: {_summary(attempt.review)}"
+            group = groups.setdefault(attempt.signature, {"attempts": [], "fixes": {}})
+            group["attempts"].append(str(attempt.number))
+            group["fixes"].setdefault(fix, []).append(attempt.outcome or "pending")
+        blocks = []
+        for signature, group in groups.items():
+            lines = [f"- Error (attempts {', '.join(group['attempts'])}): {signature}"]
+            for fix, outcomes in group["fixes"].items():
+                lines.append(f"  Tried: {fix} -> {'; '.join(dict.fromkeys(outcomes))}")
+            blocks.append("\n".join(lines))
+        return blocks
+
+    def render(self) -> str:
+        """
+        Render the history within the token budget: a digest of the older attempts followed by the
+        last attempts verbatim. Recent attempts are truncated evenly and the digest entries of the
+        oldest errors dropped if the budget is exceeded.
+        """
+        if not self.attempts:
+            return ""
+        max_chars = self.max_tokens * 4
+        recent = self.attempts[-self.keep_last:] if self.keep_last > 0 else []
+        older = self.attempts[:len(self.attempts) - len(recent)]
+
+        recent_text = "\n".join(attempt.render() for attempt in recent)
+        if len(recent_text) > max_chars // 2 and older:
+            # Leave room for the digest
+            share = (max_chars // 2) // max(1, len(recent)) - 200
+            recent_text = "\n".join(attempt.render(max(0, share)) for attempt in recent)
+        elif len(recent_text) > max_chars:
+            share = max_chars // max(1, len(recent)) - 200
+            recent_text = "\n".join(attempt.render(max(0, share)) for attempt in recent)
+
+        digest_blocks = self._digest_blocks(older)
+        overhead = len("<Earlier_Attempts_Digest>\n\n</Earlier_Attempts_Digest>\n")
+        while digest_blocks and overhead + sum(len(block) + 1 for block in digest_blocks) + len(recent_text) > max_chars:
+            digest_blocks.pop(0)
+        digest = "<Earlier_Attempts_Digest>\n" + "\n".join(digest_blocks) + "\n</Earlier_Attempts_Digest>\n" if digest_blocks else ""
+        return digest + recent_text
@@ -1,6 +1,10 @@
 # reviewer_node.py
 import os
-from utils import save_file, FoamPydantic
+from utils import save_file, FoamPydantic, FoamfilePydantic, FoamEditsPydantic
+from review_history import ReviewHistory
+from auto_fixes import AutoFixer
+from foam_patch import FoamPatchError, apply_edits
+from file_selection import select_foamfiles
 from pydantic import BaseModel, Field
 from typing import List
 import datetime
@@ -73,6 +77,21 @@ REWRITE_SYSTEM_PROMPT = (
     "Ensure your response includes only the modified file content with no extra text, as it will be parsed using Pydantic."
 )
 
+REWRITE_EDITS_SYSTEM_PROMPT = (
+    "You are an expert in OpenFOAM simulation and numerical modeling. "
+    "Your task is to fix the reported error with the smallest possible edits of the OpenFOAM files. "
+    "Please do not propose solutions that require modifying any parameters declared in the user requirement, try other approaches instead."
+    "The user will provide the error content, error command, reviewer's suggestions, and all relevant foam files. "
+    "Return a list of edits in the following JSON format: "
+    "list of edit: [{file_name: 'file_name', folder_name: 'folder_name', action: 'action', key_path: ['key', ...], value: 'value', content: 'content'}]. "
+    "Use action 'set' to add or replace the dictionary entry at key_path with value, e.g. key_path ['divSchemes', 'div(phi,U)'] and value 'Gauss upwind', "
+    "or key_path ['boundaryField', 'outlet'] and value '{ type zeroGradient; }'. Missing parent dictionaries are created. "
+    "Use action 'delete' to remove the entry at key_path. "
+    "Use action 'diff' with a unified diff in content (with '@@' hunk headers and unchanged context lines) for changes that are not single entries, e.g. in the Allrun script. "
+    "Use action 'rewrite' with the complete file in content only to create a new file or when most of a file changes. "
+    "Ensure your response includes only the edits with no extra text, as it will be parsed using Pydantic."
+)
+
 
 def save_to_txt(content, file_prefix, folder="output25"):
     """将内容保存到txt文件，文件名包含时间戳"""
@@ -92,6 +111,29 @@ def save_to_txt(content, file_prefix, folder="output25"):
 
     print(f"已保存至: {file_path}")
 
+def apply_foamfiles(state, foamfiles) -> None:
+    """
+    Write the given foamfiles to the case directory and replace them in state.foamfiles.
+    """
+    for foamfile in foamfiles:
+        print(f"Modified the file: {foamfile.file_name} in folder: {foamfile.folder_name}")
+        file_path = os.path.join(state.case_dir, foamfile.folder_name, foamfile.file_name)
+        save_file(file_path, foamfile.content)
+        
+        # Update state
+        if foamfile.folder_name not in state.dir_structure:
+            state.dir_structure[foamfile.folder_name] = []
+        if foamfile.file_name not in state.dir_structure[foamfile.folder_name]:
+            state.dir_structure[foamfile.folder_name].append(foamfile.file_name)
+        
+        for f in state.foamfiles.list_foamfile:
+            if f.folder_name == foamfile.folder_name and f.file_name == foamfile.file_name:
+                state.foamfiles.list_foamfile.remove(f)
+                break
+            
+        state.foamfiles.list_foamfile.append(foamfile)
+
+
 def reviewer_node(state):
     """
     Reviewer node: Reviews the error logs and determines if the error
@@ -104,8 +146,36 @@ def reviewer_node(state):
         print("No error to review.")
         return {"goto": "end"}
     
+    # Initialize review_history if it doesn't exist
+    if not hasattr(state, "review_history"):
+        state.review_history = ReviewHistory(config.review_history_keep_last, config.review_history_tokens)
+    
+    # Errors with a known deterministic fix are repaired without the LLM, which only sees the remaining errors
+    error_logs = state.error_logs
+    auto_fixes, auto_fixed_files = [], []
+    if config.auto_fix:
+        if not hasattr(state, "auto_fixer"):
+            state.auto_fixer = AutoFixer(config.auto_fix_stats_path)
+        changed, error_logs, auto_fixes = state.auto_fixer.apply(state.foamfiles.list_foamfile, state.case_dir, state.error_logs)
+        auto_fixed_files = [f"{folder_name}/{file_name}" for folder_name, file_name in changed]
+        if changed:
+            print(f"============================== Auto-fix ==============================")
+            apply_foamfiles(state, [FoamfilePydantic(file_name=file_name, folder_name=folder_name, content=content)
+                                    for (folder_name, file_name), content in changed.items()])
+        if len(error_logs) == 0:
+            state.review_history.add_attempt(state.error_logs, "Deterministic auto-fix: " + "; ".join(auto_fixes))
+            state.review_history.record_modified_files(auto_fixed_files)
+            return {"goto": "runner"}
+    
+    # Only the files involved in the remaining errors go into the prompts
+    selected_foamfiles, scoped = select_foamfiles(state.foamfiles.list_foamfile, error_logs) if config.scoped_review_files else (state.foamfiles.list_foamfile, False)
+    foamfiles_text = str(FoamPydantic(list_foamfile=selected_foamfiles))
+    if scoped:
+        foamfiles_text += "\n(Only the files involved in the errors are shown; the other case files exist and are unchanged.)"
+        print(f"Files in the prompt: {', '.join(os.path.normpath(os.path.join(f.folder_name, f.file_name)) for f in selected_foamfiles)}")
+    
     # Analysis the reason and give the method to fix the error.
-    if hasattr(state, "history_text") and state.history_text:
+    if hasattr(state, "review_history") and len(state.review_history) > 0:
         # <similar_case_reference>:相似案例参考，帮助LLM理解问题
         # <foamfiles> 当前OpenFOAM文件结构
         # <current_error_logs>: 错误日志内容
@@ -130,11 +200,13 @@ def reviewer_node(state):
             f"I have modified the files according to your previous suggestions. If the error persists, please provide further guidance. Make sure your suggestions adhere to user requirements and do not contradict it. Also, please consider the previous attempts and try a different approach."
         )
         """
+        # The model does not keep earlier prompts, so the history is sent compacted to a fixed token budget
+        history = state.review_history.render()
         reviewer_user_prompt = (
-            f"<similar_case_reference>For the similar case reference, please refer to the one previously provided to you. It will not be repeated here.</similar_case_reference>\n"
-            f"<foamfiles>For the foamfiles, please refer to the one previously provided to you. It will not be repeated here.</foamfiles>\n"
-            f"<current_error_logs>{state.error_logs}</current_error_logs>\n"
-            f"<user_requirement>For the user_requirement, please refer to the one previously provided to you. It will not be repeated here.</user_requirement>\n\n"
+            f"<foamfiles>{foamfiles_text}</foamfiles>\n"
+            f"<current_error_logs>{error_logs}</current_error_logs>\n"
+            f"<history>\n{history}\n</history>\n\n"
+            f"<user_requirement>{state.user_requirement}</user_requirement>\n\n"
             f"I have modified the files according to your previous suggestions. If the error persists, please provide further guidance. Make sure your suggestions adhere to user requirements and do not contradict it. Also, please consider the previous attempts and try a different approach."
         )
         '''
@@ -152,9 +224,9 @@ def reviewer_node(state):
         '''
         # 保存到文件
         save_to_txt(state.tutorial_reference, "similar_case_reference")
-        save_to_txt(state.foamfiles, "foamfiles")
-        save_to_txt(state.error_logs, "current_error_logs")
-        save_to_txt(state.history_text, "history_text")
+        save_to_txt(foamfiles_text, "foamfiles")
+        save_to_txt(error_logs, "current_error_logs")
+        save_to_txt(history, "history_text")
 
     else:
         """
@@ -163,8 +235,8 @@ def reviewer_node(state):
         """
         reviewer_user_prompt = (
             f"<similar_case_reference>{state.tutorial_reference}</similar_case_reference>\n"
-            f"<foamfiles>{str(state.foamfiles)}</foamfiles>\n"
-            f"<error_logs>{state.error_logs}</error_logs>\n"
+            f"<foamfiles>{foamfiles_text}</foamfiles>\n"
+            f"<error_logs>{error_logs}</error_logs>\n"
             f"<user_requirement>{state.user_requirement}</user_requirement>\n"
             "Please review the error logs and provide guidance on how to resolve the reported errors. Make sure your suggestions adhere to user requirements and do not contradict it."
         )
@@ -173,51 +245,40 @@ def reviewer_node(state):
     review_response = state.llm_service.invoke(reviewer_user_prompt, REVIEWER_SYSTEM_PROMPT)
     review_content = review_response
     
-    # Initialize history_text if it doesn't exist
-    if not hasattr(state, "history_text"):
-        state.history_text = []
-        
-    # Add current attempt to history
-    current_attempt = [
-        f"<Attempt {len(state.history_text)//4 + 1}>\n"
-        f"<Error_Logs>\n{state.error_logs}\n</Error_Logs>",
-        f"<Review_Analysis>\n{review_content}\n</Review_Analysis>",
-        f"</Attempt>\n"  # Closing tag for Attempt with empty line
-    ]
-    # 这里的历史记录会随着迭代次数的增加会不断变长
-    state.history_text.extend(current_attempt)
+    # Add current attempt to history; older attempts are folded into a digest when it is rendered
+    if auto_fixes:
+        review_content = f"Deterministic auto-fix: {'; '.join(auto_fixes)}\n{review_content}"
+    state.review_history.add_attempt(state.error_logs, review_content)
     
     
     print(review_content)
 
     # Return the revised foamfile content.
     rewrite_user_prompt = (
-        f"<foamfiles>{str(state.foamfiles)}</foamfiles>\n"
-        f"<error_logs>{state.error_logs}</error_logs>\n"
+        f"<foamfiles>{foamfiles_text}</foamfiles>\n"
+        f"<error_logs>{error_logs}</error_logs>\n"
         f"<reviewer_analysis>{review_content}</reviewer_analysis>\n\n"
         f"<user_requirement>{state.user_requirement}</user_requirement>\n\n"
         "Please update the relevant OpenFOAM files to resolve the reported errors, ensuring that all modifications strictly adhere to the specified formats. Ensure all modifications adhere to user requirement."
     )
-    rewrite_response = state.llm_service.invoke(rewrite_user_prompt, REWRITE_SYSTEM_PROMPT, pydantic_obj=FoamPydantic)
+    rewritten = None
+    if config.patch_rewrite:
+        # Targeted edits cost far fewer output tokens than complete files; a full rewrite is the fallback
+        edits_response = state.llm_service.invoke(rewrite_user_prompt, REWRITE_EDITS_SYSTEM_PROMPT, pydantic_obj=FoamEditsPydantic)
+        try:
+            changed = apply_edits(state.foamfiles.list_foamfile, edits_response.list_edit)
+            rewritten = [FoamfilePydantic(file_name=file_name, folder_name=folder_name, content=content)
+                         for (folder_name, file_name), content in changed.items()]
+        except FoamPatchError as e:
+            print(f"Warning: the edits could not be applied ({e}), asking for complete files instead.")
+    if rewritten is None:
+        rewrite_response = state.llm_service.invoke(rewrite_user_prompt, REWRITE_SYSTEM_PROMPT, pydantic_obj=FoamPydantic)
+        rewritten = rewrite_response.list_foamfile
     
     # Save the modified files.
     print(f"============================== Rewrite ==============================")
-    for foamfile in rewrite_response.list_foamfile:
-        print(f"Modified the file: {foamfile.file_name} in folder: {foamfile.folder_name}")
-        file_path = os.path.join(state.case_dir, foamfile.folder_name, foamfile.file_name)
-        save_file(file_path, foamfile.content)
-        
-        # Update state
-        if foamfile.folder_name not in state.dir_structure:
-            state.dir_structure[foamfile.folder_name] = []
-        if foamfile.file_name not in state.dir_structure[foamfile.folder_name]:
-            state.dir_structure[foamfile.folder_name].append(foamfile.file_name)
-        
-        for f in state.foamfiles.list_foamfile:
-            if f.folder_name == foamfile.folder_name and f.file_name == foamfile.file_name:
-                state.foamfiles.list_foamfile.remove(f)
-                break
-            
-        state.foamfiles.list_foamfile.append(foamfile)
+    rewritten_files = [f"{foamfile.folder_name}/{foamfile.file_name}" for foamfile in rewritten]
+    state.review_history.record_modified_files(list(dict.fromkeys(auto_fixed_files + rewritten_files)))
+    apply_foamfiles(state, rewritten)
     
     return {"goto": "runner"}
@@ -5,47 +5,141 @@ from pydantic import BaseModel, Field
 import re
 from utils import (
     save_file, remove_files, remove_file,
-    run_command, check_foam_errors, retrieve_faiss, remove_numeric_folders
+    run_command, check_foam_errors, retrieve_faiss, remove_numeric_folders, FoamfilePydantic
 )
+from foam_validator import validate_foamfiles
+from solver_monitor import ResidualMonitor
+from parallel_run import prepare_parallel_run
+from allrun_steps import split_allrun, first_step_to_run, write_resume_script, record_steps, skipped_logs, mark_steps_done
+from mesh_cache import get_mesh_cache, mesh_steps_end, mesh_key
+from smoke_run import smoke_control_dict
 
 
-def runner_node(state):
+def reload_foamfiles(state, paths: List[tuple]) -> None:
     """
-    Runner node: Generate an Allrun script, execute it, and check for errors.
-    On error, update state.error_command and state.error_content.
+    Replace the content of the given (folder_name, file_name) foamfiles in state.foamfiles with the
+    files on disk, adding the ones state.foamfiles does not have yet.
+    """
+    for folder_name, file_name in paths:
+        file_path = os.path.join(state.case_dir, folder_name, file_name)
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r") as f:
+            content = f.read()
+        for foamfile in state.foamfiles.list_foamfile:
+            if foamfile.folder_name.strip("./") == folder_name.strip("./") and foamfile.file_name == file_name:
+                foamfile.content = content
+                break
+        else:
+            state.foamfiles.list_foamfile.append(FoamfilePydantic(file_name=file_name, folder_name=folder_name, content=content))
+
+
+def execute_allrun(state, allrun_file_path: str) -> list:
+    """
+    Execute the Allrun script of the case, skipping the leading steps that are up to date, and
+    return the error logs of the run.
     """
     config = state.config
     case_dir = state.case_dir
-    allrun_file_path = os.path.join(case_dir, "Allrun")
     
-    print(f"============================== Runner ==============================")
+    # Find the Allrun steps that can be skipped because their inputs and outputs did not change
+    split = None
+    if config.resume_allrun:
+        with open(allrun_file_path, "r") as f:
+            split = split_allrun(f.read())
+    mesh_cache, cached_mesh_key = get_mesh_cache(config), None
+    if split is not None:
+        allrun_lines, allrun_steps = split
+        start = first_step_to_run(case_dir, allrun_steps)
+        # Restore the mesh instead of running the meshing steps if these inputs were meshed before
+        mesh_end = mesh_steps_end(allrun_steps)
+        if mesh_cache is not None and start < mesh_end:
+            cached_mesh_key = mesh_key(case_dir, allrun_steps[:mesh_end])
+            if mesh_cache.restore(cached_mesh_key, case_dir):
+                mark_steps_done(case_dir, allrun_steps, mesh_end)
+                start, cached_mesh_key = mesh_end, None
+        if start > 0:
+            print(f"Resuming the Allrun from step {start + 1} of {len(allrun_steps)}: {allrun_steps[start].command if start < len(allrun_steps) else 'nothing to run'}")
     
     # Clean up any previous log and error files.
     out_file = os.path.join(case_dir, "Allrun.out")
     err_file = os.path.join(case_dir, "Allrun.err")
-    remove_files(case_dir, prefix="log")
+    if split is not None:
+        kept_logs = skipped_logs(allrun_steps, start)
+        for file in os.listdir(case_dir):
+            if file.startswith("log") and not any(file.startswith(prefix) for prefix in kept_logs):
+                remove_file(os.path.join(case_dir, file))
+    else:
+        remove_files(case_dir, prefix="log")
     remove_file(err_file)
     remove_file(out_file)
     remove_numeric_folders(case_dir)
     
-    # Execute the Allrun script if it exists
-    if os.path.exists(allrun_file_path):
-        run_command(allrun_file_path, out_file, err_file, case_dir, config)
-    else:
-        print("No Allrun script found. Continuing without it.")
+    residual_monitor = ResidualMonitor(case_dir, getattr(state, "case_solver", None), config)
+    script_path = write_resume_script(case_dir, allrun_lines, start) if split is not None else allrun_file_path
+    abort_reason = run_command(script_path, out_file, err_file, case_dir, config, monitors=[residual_monitor])
+    if split is not None:
+        records = record_steps(case_dir, allrun_steps, start)
+        if cached_mesh_key is not None and len(records) >= mesh_end and all(record["status"] == 0 for record in records[:mesh_end]):
+            mesh_cache.store(cached_mesh_key, case_dir)
     
-    # Check for errors if Allrun was executed
-    if os.path.exists(allrun_file_path):
-        state.error_logs = check_foam_errors(case_dir)
+    error_logs = check_foam_errors(case_dir)
+    if residual_monitor.diagnosis:
+        error_logs.append(residual_monitor.diagnosis)
+    if abort_reason and len(error_logs) == 0:
+        # The run was stopped for a reason the log files do not show as an error
+        error_logs = [{"file": "Allrun.err", "error_content": f"ERROR: {abort_reason}"}]
+    return error_logs
 
-        if len(state.error_logs) > 0:
-            print("Errors detected in the Allrun execution.")
+
+def runner_node(state):
+    """
+    Runner node: Generate an Allrun script, execute it, and check for errors.
+    On error, update state.error_command and state.error_content.
+    """
+    config = state.config
+    case_dir = state.case_dir
+    allrun_file_path = os.path.join(case_dir, "Allrun")
+    
+    print(f"============================== Runner ==============================")
+    
+    # Catch broken dictionaries locally instead of launching the solver
+    if config.preflight_validation and hasattr(state, "foamfiles"):
+        preflight_errors = validate_foamfiles(state.foamfiles.list_foamfile, getattr(state, "case_solver", None))
+        if len(preflight_errors) > 0:
+            state.error_logs = preflight_errors
+            print("Errors detected in the pre-flight validation. Skipping the Allrun execution.")
             print(state.error_logs)
             return {"goto": "reviewer"}
-        else:
-            print("Allrun executed successfully without errors.")
-            return {"goto": "end"}
-    else:
+    
+    # Switch large cases to decomposePar/mpirun before the logs of the previous run (log.checkMesh) are removed
+    if config.parallel_run and os.path.exists(allrun_file_path):
+        subdomains = prepare_parallel_run(case_dir, getattr(state, "case_solver", None), config)
+        if subdomains > 1 and hasattr(state, "foamfiles"):
+            # The reviewer must see the parallel Allrun, or rewriting it would switch back to a serial run
+            reload_foamfiles(state, [("./", "Allrun"), ("system", "decomposeParDict")])
+    
+    if not os.path.exists(allrun_file_path):
         print("No Allrun script to execute. Workflow completed.")
         return {"goto": "end"}
-        
+    
+    # Run a few time steps first so that configuration errors show up before the full simulation
+    smoke_run = False
+    if config.smoke_test:
+        with smoke_control_dict(case_dir, config.smoke_test_steps) as smoke_run:
+            if smoke_run:
+                print(f"Smoke run of {config.smoke_test_steps} time steps before the full simulation.")
+                state.error_logs = execute_allrun(state, allrun_file_path)
+    if smoke_run and len(state.error_logs) > 0:
+        print("Errors detected in the smoke run.")
+        print(state.error_logs)
+        return {"goto": "reviewer"}
+    
+    state.error_logs = execute_allrun(state, allrun_file_path)
+    if len(state.error_logs) > 0:
+        print("Errors detected in the Allrun execution.")
+        print(state.error_logs)
+        return {"goto": "reviewer"}
+    else:
+        print("Allrun executed successfully without errors.")
+        return {"goto": "end"}
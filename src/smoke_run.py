@@ -0,0 +1,87 @@
+# smoke_run.py
+"""
+Short smoke runs of a case before the full simulation.
+
+system/controlDict is patched in place to stop after a few time steps and restored afterwards, so
+configuration errors show up within seconds while the full run keeps the generated settings.
+"""
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from foam_parser import FoamParseError, entry_words, parse_foam_dict
+
+
+def _number(dictionary, keyword: str) -> Optional[float]:
+    words = entry_words(dictionary.get(keyword))
+    if len(words) != 1:
+        return None
+    try:
+        return float(words[0])
+    except ValueError:
+        # $variables and #calc expressions cannot be evaluated here
+        return None
+
+
+def smoke_overrides(control_dict: str, steps: int) -> Optional[Dict[str, str]]:
+    """
+    Return the controlDict entries that stop a run after `steps` time steps, or None if the
+    run is not longer than that anyway or the times cannot be read.
+    """
+    try:
+        dictionary = parse_foam_dict(control_dict)
+    except FoamParseError:
+        return None
+    start_time = _number(dictionary, "startTime") or 0.0
+    end_time, delta_t = _number(dictionary, "endTime"), _number(dictionary, "deltaT")
+    if end_time is None or not delta_t or delta_t <= 0:
+        return None
+    smoke_end_time = start_time + steps * delta_t
+    if smoke_end_time >= end_time:
+        return None
+    return {
+        "stopAt": "endTime",
+        "endTime": f"{smoke_end_time:.12g}",
+        "writeControl": "timeStep",
+        "writeInterval": str(steps),
+    }
+
+
+def apply_overrides(control_dict: str, overrides: Dict[str, str]) -> str:
+    """
+    Set top-level entries of a controlDict, appending the ones it does not define. Only unindented
+    entries are replaced, so function objects keep their own writeControl and writeInterval.
+    """
+    for keyword, value in overrides.items():
+        pattern = re.compile(rf"^({keyword}\s+)[^;]*;", re.MULTILINE)
+        if pattern.search(control_dict):
+            control_dict = pattern.sub(rf"\g<1>{value};", control_dict, count=1)
+        else:
+            control_dict += f"\n{keyword} {value};\n"
+    return control_dict
+
+
+@contextmanager
+def smoke_control_dict(case_dir: str, steps: int) -> Iterator[bool]:
+    """
+    Patch system/controlDict for a smoke run of `steps` time steps and restore it on exit.
+    Yields False (and leaves the file untouched) if no smoke run is needed or possible.
+    """
+    path = os.path.join(case_dir, "system", "controlDict")
+    if not os.path.exists(path):
+        yield False
+        return
+    with open(path, "r") as f:
+        original = f.read()
+    overrides = smoke_overrides(original, steps)
+    if overrides is None:
+        yield False
+        return
+    with open(path, "w") as f:
+        f.write(apply_overrides(original, overrides))
+    try:
+        yield True
+    finally:
+        with open(path, "w") as f:
+            f.write(original)
@@ -0,0 +1,139 @@
+# solver_monitor.py
+"""
+Live monitor for the solver log of a running case.
+
+ResidualMonitor follows log.<solver> while the Allrun executes, parses time steps, Courant numbers,
+initial residuals and execution time, and asks run_command to stop the run once the solution
+diverges or stops making progress.
+"""
+import math
+import os
+import re
+import time
+from typing import Dict, Optional
+
+TIME_PATTERN = re.compile(r"^Time = (\S+)")
+COURANT_PATTERN = re.compile(r"^Courant Number mean: (\S+) max: (\S+)")
+RESIDUAL_PATTERN = re.compile(r"Solving for (\w+), Initial residual = (\S+), Final residual = (\S+), No Iterations (\d+)")
+EXECUTION_TIME_PATTERN = re.compile(r"^ExecutionTime = (\S+) s")
+
+
+def _to_float(text: str) -> float:
+    try:
+        return float(text.rstrip(","))
+    except ValueError:
+        # OpenFOAM prints nan/inf in several spellings
+        return math.nan
+
+
+class ResidualMonitor:
+    def __init__(self, working_dir: str, solver: Optional[str], config: object):
+        self.working_dir = working_dir
+        self.solver = solver
+        self.max_courant = getattr(config, "divergence_max_courant", 1e3)
+        self.max_residual = getattr(config, "divergence_max_residual", 1e3)
+        self.stall_seconds = getattr(config, "stall_timeout", 1800)
+
+        self.log_path = None
+        self.time = None
+        self.time_steps = 0
+        self.courant_max = None
+        self.residuals: Dict[str, float] = {}
+        self.execution_time = None
+        self.finished = False
+        # Filled when the run is stopped, in the format of utils.check_foam_errors
+        self.diagnosis = None
+
+        self._offset = 0
+        self._partial = ""
+        self._last_progress = time.monotonic()
+
+    def _find_log(self) -> Optional[str]:
+        if self.solver:
+            path = os.path.join(self.working_dir, f"log.{self.solver}")
+            return path if os.path.exists(path) else None
+        # Without a known solver, follow the first solver-like log
+        for name in sorted(os.listdir(self.working_dir)):
+            if name.startswith("log.") and name.endswith("Foam"):
+                return os.path.join(self.working_dir, name)
+        return None
+
+    def _read_new_lines(self) -> list:
+        size = os.path.getsize(self.log_path)
+        if size <= self._offset:
+            return []
+        with open(self.log_path, "rb") as f:
+            f.seek(self._offset)
+            text = self._partial + f.read(size - self._offset).decode(errors="replace")
+        self._offset = size
+        lines = text.split("\n")
+        # Keep an unfinished last line for the next read
+        self._partial = lines.pop()
+        return lines
+
+    def _parse(self, line: str) -> None:
+        line = line.strip()
+        if line == "End":
+            self.finished = True
+            return
+        match = TIME_PATTERN.match(line)
+        if match:
+            self.time = match.group(1)
+            self.time_steps += 1
+            self._last_progress = time.monotonic()
+            return
+        match = COURANT_PATTERN.match(line)
+        if match:
+            self.courant_max = _to_float(match.group(2))
+            return
+        match = RESIDUAL_PATTERN.search(line)
+        if match:
+            self.residuals[match.group(1)] = _to_float(match.group(2))
+            return
+        match = EXECUTION_TIME_PATTERN.match(line)
+        if match:
+            self.execution_time = _to_float(match.group(1))
+
+    def _diverged(self) -> Optional[str]:
+        if self.courant_max is not None and (math.isnan(self.courant_max) or self.courant_max > self.max_courant):
+            return f"Courant number max is {self.courant_max} (limit {self.max_courant})"
+        for field, residual in self.residuals.items():
+            if math.isnan(residual) or math.isinf(residual):
+                return f"initial residual of {field} is {residual}"
+            if residual > self.max_residual:
+                return f"initial residual of {field} is {residual} (limit {self.max_residual})"
+        return None
+
+    def _stop(self, reason: str) -> str:
+        log_name = os.path.basename(self.log_path) if self.log_path else f"log.{self.solver}"
+        residuals = ", ".join(f"{field}: {residual:.3g}" for field, residual in self.residuals.items())
+        self.diagnosis = {
+            "file": log_name,
+            "error_content": (
+                f"ERROR: The solver run was terminated early: {reason}.\n"
+                f"Last time step: {self.time} after {self.time_steps} steps, execution time {self.execution_time} s.\n"
+                f"Last Courant number max: {self.courant_max}.\n"
+                f"Last initial residuals: {residuals or 'none'}."
+            ),
+        }
+        return f"{reason} in {log_name}"
+
+    def check(self) -> Optional[str]:
+        """
+        Parse the new part of the solver log and return an abort reason if the run diverged or stalled.
+        """
+        if self.log_path is None:
+            self.log_path = self._find_log()
+            if self.log_path is None:
+                self._last_progress = time.monotonic()
+                return None
+
+        for line in self._read_new_lines():
+            self._parse(line)
+            reason = self._diverged()
+            if reason:
+                return self._stop(f"solution diverged at Time = {self.time}, {reason}")
+
+        if self.stall_seconds and not self.finished and time.monotonic() - self._last_progress > self.stall_seconds:
+            return self._stop(f"no new time step for {self.stall_seconds} seconds after Time = {self.time}")
+        return None
@@ -0,0 +1,116 @@
+# stream_completion.py
+"""
+Detection of complete foamfiles and scripts in streamed LLM output, used to stop generation early.
+"""
+import re
+
+# Code fence languages of shell scripts
+SHELL_FENCES = ["sh", "bash", "shell", "zsh"]
+
+
+class FoamCompletionDetector:
+    """
+    Incrementally tracks code fences and brace balance of streamed LLM output to tell when a
+    complete OpenFOAM dictionary (or fenced script) has been emitted, so generation can be stopped.
+    Output counts as complete when a code fence closes with balanced braces, or, without fences,
+    when the closing "// *****... //" banner of a foamfile follows a closed FoamFile header.
+    Shell scripts are complete when their fence closes.
+    """
+    END_BANNER = re.compile(r'//\s*\*{10,}\s*//')
+
+    def __init__(self):
+        # Chunks are joined on demand; appending to one string would copy it for every chunk
+        self._chunks = []
+        self.complete = False
+        self._line = []
+        self._prev = ""
+        self._depth = 0
+        self._in_block_comment = False
+        self._in_line_comment = False
+        self._in_string = False
+        self._fence_open = False
+        self._fenced_content = False
+        self._header_closed = False
+        self._in_header = False
+        # Shell scripts (```sh fences or a #! line) have no FoamFile comments or braces to track;
+        # `cd ${0%/*}` would otherwise open a block comment that never closes
+        self._shell = False
+        # The last characters outside comments and strings, to recognise the FoamFile keyword
+        self._tail = ""
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> bool:
+        self._chunks.append(chunk)
+        for position, c in enumerate(chunk):
+            if c == "\n":
+                self._end_line()
+                self._prev = c
+            else:
+                self._line.append(c)
+                self._prev = self._track(c)
+            if self.complete:
+                # Drop the rest of the chunk after the completing character
+                self._chunks[-1] = chunk[:position + 1]
+                return True
+        # A closing fence at the very end of the stream is not followed by a newline
+        if self._fence_open and self._fenced_content and self._depth == 0 and len(self._line) < 16 and "".join(self._line).strip() == "```":
+            self.complete = True
+        return self.complete
+
+    def _track(self, c: str) -> str:
+        """
+        Update the comment/string/brace state with one character and return the character to
+        remember as the previous one.
+        """
+        if self._shell:
+            return c
+        if self._in_block_comment:
+            if self._prev == "*" and c == "/":
+                self._in_block_comment = False
+                # Do not let the closing "/" of a comment start a new one
+                return ""
+        elif self._in_line_comment:
+            pass
+        elif self._in_string:
+            if c == '"':
+                self._in_string = False
+        elif self._prev == "/" and c == "*":
+            self._in_block_comment = True
+        elif self._prev == "/" and c == "/":
+            self._in_line_comment = True
+        elif c == '"':
+            self._in_string = True
+        elif c == "{":
+            if self._depth == 0 and re.search(r'FoamFile\s*$', self._tail):
+                self._in_header = True
+            self._depth += 1
+        elif c == "}":
+            self._depth -= 1
+            if self._depth == 0 and self._in_header:
+                self._header_closed = True
+                self._in_header = False
+        if not (self._in_block_comment or self._in_line_comment or self._in_string):
+            self._tail = (self._tail + c)[-32:]
+        return c
+
+    def _end_line(self) -> None:
+        line = "".join(self._line).strip()
+        self._line = []
+        self._in_line_comment = False
+        if line.startswith("```"):
+            if self._fence_open and self._fenced_content and self._depth == 0:
+                self.complete = True
+            elif not self._fence_open:
+                self._shell = line[3:].strip().lower() in SHELL_FENCES
+            self._fence_open = not self._fence_open
+            return
+        if line.startswith("#!") and not self._fenced_content and not self._header_closed:
+            self._shell = True
+            self._depth, self._in_block_comment, self._in_string = 0, False, False
+        if self._fence_open and line:
+            self._fenced_content = True
+        if not self._fence_open and self._header_closed and self._depth == 0 and self.END_BANNER.fullmatch(line):
+            self.complete = True
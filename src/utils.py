@@ -2,6 +2,7 @@
 import re
 import subprocess
 import os
+import signal
 from typing import Optional, Any, Type
 from pydantic import BaseModel
 from langchain.chat_models import init_chat_model
@@ -18,7 +19,19 @@ import time
 import random
 from botocore.exceptions import ClientError
 import shutil
+import json
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import faiss
 from config import Config
+from embedding_cache import QueryEmbeddingCache
+from lexical_index import CommandLexicalIndex, LEXICAL_WEIGHT, reciprocal_rank_fusion
+from payload_store import PayloadStore
+from stream_completion import FoamCompletionDetector
+from llm_cache import LLMResponseCache, LLMCacheMiss
+from langchain_core.documents import Document
 from langchain_ollama import ChatOllama
 from langchain_deepseek.chat_models import ChatDeepSeek
 import dotenv
@@ -35,18 +48,172 @@ langfuse_handler = CallbackHandler()
 # 加载.env文件中的环境变量
 dotenv.load_dotenv()
 
-# Global dictionary to store loaded FAISS databases
-FAISS_DB_CACHE = {}
 DATABASE_DIR = f"{Path(__file__).resolve().parent.parent}/database/faiss"
+DATABASE_NAMES = [
+    "openfoam_allrun_scripts",
+    "openfoam_tutorials_structure",
+    "openfoam_tutorials_details",
+    "openfoam_command_help",
+]
+# Databases queried by exact names, which get an exact-name/BM25 index in front of vector search
+LEXICAL_DATABASE_NAMES = ["openfoam_command_help"]
+# Candidates taken from the vector and BM25 rankings before they are fused
+FUSION_DEPTH = 10
+# Metadata fields that retrieve_faiss can filter on, indexed per database when it is loaded
+METADATA_FILTER_FIELDS = ["case_solver", "case_domain", "case_category"]
+METADATA_INDEX_FILE = "metadata_index.json"
 
-embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url="http://localhost:11434", num_gpu=4)
+class FAISSDatabaseRegistry:
+    """
+    Lazily loads the FAISS databases the first time they are requested.
+    Loading is thread-safe, so databases can also be preloaded in the background.
+    """
+    def __init__(self, database_dir: str = DATABASE_DIR, database_names: List[str] = DATABASE_NAMES):
+        self.database_dir = database_dir
+        self.database_names = list(database_names)
+        self.load_times = {}
+        self.embedding_cache = QueryEmbeddingCache()
+        self._embeddings = None
+        self._databases = {}
+        self._lexical_indexes = {}
+        self._payload_stores = {}
+        self._metadata_indexes = {}
+        self._lock = threading.Lock()
+        self._db_locks = {name: threading.Lock() for name in self.database_names}
+
+    @property
+    def embeddings(self) -> OllamaEmbeddings:
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url="http://localhost:11434", num_gpu=4)
+            return self._embeddings
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, reusing the vector from the persistent cache when the query was seen before.
+        """
+        embeddings = self.embeddings
+        return self.embedding_cache.get_or_embed(embeddings.model, query, embeddings.embed_query)
+
+    def embed_queries(self, queries: List[str], max_workers: int = 8) -> List[List[float]]:
+        """
+        Embed several queries at once. Cached queries are served from the cache and the remaining
+        ones are sent to the embedding server concurrently.
+        """
+        embeddings = self.embeddings
+
+        def _embed_many(texts: List[str]) -> List[List[float]]:
+            # The indexes were built with the per-prompt embeddings endpoint, so keep using embed_query
+            # for each text instead of the batch endpoint, which returns normalized vectors.
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as executor:
+                return list(executor.map(embeddings.embed_query, texts))
+
+        return self.embedding_cache.get_or_embed_many(embeddings.model, queries, _embed_many)
+
+    def __contains__(self, database_name: str) -> bool:
+        return database_name in self._db_locks
+
+    def is_loaded(self, database_name: str) -> bool:
+        return database_name in self._databases
+
+    def get(self, database_name: str) -> FAISS:
+        """
+        Return the FAISS database, loading it from disk on first use.
+        """
+        if database_name not in self._db_locks:
+            raise ValueError(f"Database '{database_name}' is not registered.")
+
+        vectordb = self._databases.get(database_name)
+        if vectordb is not None:
+            return vectordb
+
+        with self._db_locks[database_name]:
+            # Another thread may have finished loading while we were waiting.
+            if database_name not in self._databases:
+                start_time = time.perf_counter()
+                self._databases[database_name] = FAISS.load_local(
+                    f"{self.database_dir}/{database_name}", self.embeddings, allow_dangerous_deserialization=True
+                )
+                self.load_times[database_name] = time.perf_counter() - start_time
+                print(f"Loaded FAISS database {database_name} in {self.load_times[database_name]:.2f} seconds")
+        return self._databases[database_name]
+
+    def get_lexical_index(self, database_name: str) -> Optional[CommandLexicalIndex]:
+        """
+        Return the lexical index stored next to the FAISS database, or None if the database has none.
+        Indexes built before the lexical index existed are derived from the FAISS docstore instead.
+        """
+        if database_name not in LEXICAL_DATABASE_NAMES or database_name not in self._db_locks:
+            return None
+        lexical_index = self._lexical_indexes.get(database_name)
+        if lexical_index is not None:
+            return lexical_index
+
+        with self._db_locks[database_name]:
+            if database_name not in self._lexical_indexes:
+                lexical_index = CommandLexicalIndex.load(f"{self.database_dir}/{database_name}")
+                if lexical_index is not None:
+                    self._lexical_indexes[database_name] = lexical_index
+        if database_name not in self._lexical_indexes:
+            vectordb = self.get(database_name)
+            self._lexical_indexes[database_name] = CommandLexicalIndex.from_docstore(vectordb.docstore._dict.values())
+        return self._lexical_indexes[database_name]
+
+    def get_metadata_index(self, database_name: str) -> dict:
+        """
+        Return {field: {value: [FAISS positions]}} for the filterable metadata fields of a database.
+        The index is written by the builder scripts; older stores derive it from the docstore.
+        """
+        metadata_index = self._metadata_indexes.get(database_name)
+        if metadata_index is not None:
+            return metadata_index
+
+        path = f"{self.database_dir}/{database_name}/{METADATA_INDEX_FILE}"
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                metadata_index = json.load(f)
+        else:
+            vectordb = self.get(database_name)
+            metadata_index = {field: {} for field in METADATA_FILTER_FIELDS}
+            for position, docstore_id in vectordb.index_to_docstore_id.items():
+                metadata = vectordb.docstore.search(docstore_id).metadata or {}
+                for field in METADATA_FILTER_FIELDS:
+                    if field in metadata:
+                        metadata_index[field].setdefault(metadata[field], []).append(position)
+        self._metadata_indexes[database_name] = metadata_index
+        return metadata_index
+
+    def get_payload_store(self, database_name: str) -> Optional[PayloadStore]:
+        """
+        Return the side store holding the large document fields, or None for databases built before it existed.
+        """
+        if database_name not in self._payload_stores:
+            self._payload_stores[database_name] = PayloadStore.open(f"{self.database_dir}/{database_name}")
+        return self._payload_stores[database_name]
+
+    def preload(self, database_names: Optional[List[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load the given databases (all registered databases by default) ahead of time.
+        With background=True the loading runs in a daemon thread, which is returned.
+        """
+        database_names = self.database_names if database_names is None else database_names
 
-FAISS_DB_CACHE = {
-    "openfoam_allrun_scripts": FAISS.load_local(f"{DATABASE_DIR}/openfoam_allrun_scripts", embeddings, allow_dangerous_deserialization=True),
-    "openfoam_tutorials_structure": FAISS.load_local(f"{DATABASE_DIR}/openfoam_tutorials_structure", embeddings, allow_dangerous_deserialization=True),
-    "openfoam_tutorials_details": FAISS.load_local(f"{DATABASE_DIR}/openfoam_tutorials_details", embeddings, allow_dangerous_deserialization=True),
-    "openfoam_command_help": FAISS.load_local(f"{DATABASE_DIR}/openfoam_command_help", embeddings, allow_dangerous_deserialization=True)
-}
+        def _load_all():
+            for database_name in database_names:
+                try:
+                    self.get(database_name)
+                except Exception as e:
+                    # The error is raised again when the database is actually requested.
+                    print(f"Warning: Failed to preload FAISS database {database_name}: {e}")
+
+        if not background:
+            _load_all()
+            return None
+        thread = threading.Thread(target=_load_all, name="faiss-preload", daemon=True)
+        thread.start()
+        return thread
+
+FAISS_DB_REGISTRY = FAISSDatabaseRegistry()
 
 class FoamfilePydantic(BaseModel):
     file_name: str = Field(description="Name of the OpenFOAM input file")
@@ -56,6 +223,17 @@ class FoamfilePydantic(BaseModel):
 class FoamPydantic(BaseModel):
     list_foamfile: List[FoamfilePydantic] = Field(description="List of OpenFOAM configuration files")
 
+class FoamEditPydantic(BaseModel):
+    file_name: str = Field(description="Name of the OpenFOAM file to edit")
+    folder_name: str = Field(description="Folder of the file")
+    action: str = Field(description="'set' or 'delete' the entry at key_path, 'diff' to apply a unified diff, or 'rewrite' to replace the whole file")
+    key_path: List[str] = Field(default_factory=list, description="Keys from the top of the dictionary to the entry, e.g. ['divSchemes', 'div(phi,U)'] or ['boundaryField', 'inlet']")
+    value: str = Field(default="", description="New value of the entry for 'set', e.g. 'Gauss linear' or '{ type zeroGradient; }'")
+    content: str = Field(default="", description="Unified diff for 'diff', complete file content for 'rewrite'")
+
+class FoamEditsPydantic(BaseModel):
+    list_edit: List[FoamEditPydantic] = Field(description="List of edits of OpenFOAM files")
+
 class ResponseWithThinkPydantic(BaseModel):
     think: str = Field(description="Thought process of the LLM")
     response: str = Field(description="Response of the LLM")
@@ -73,9 +251,21 @@ class LLMService:
         self.total_tokens = 0
         self.failed_calls = 0
         self.retry_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stats_lock = threading.Lock()
+        
+        # Optional on-disk response cache
+        cache_mode = getattr(config, "llm_cache_mode", "off")
+        self.response_cache = None
+        if cache_mode != "off":
+            self.response_cache = LLMResponseCache(getattr(config, "llm_cache_dir"), cache_mode)
         
         # Initialize the LLM
-        if self.model_provider.lower() == "bedrock":
+        if cache_mode == "replay":
+            # Strict replay never reaches the provider, so no client or model server is needed
+            self.llm = None
+        elif self.model_provider.lower() == "bedrock":
             bedrock_runtime = tracking_aws.new_default_client()
             self.llm = ChatBedrockConverse(
                 client=bedrock_runtime, 
@@ -130,11 +320,112 @@ class LLMService:
         else:
             raise ValueError(f"{self.model_provider} is not a supported model_provider")
     
+    def _increment(self, **counters) -> None:
+        # Statistics are shared by concurrent calls from threads and coroutines
+        with self._stats_lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+    
+    def _cache_lookup(self, user_prompt: str, system_prompt: Optional[str], pydantic_obj: Optional[Type[BaseModel]], early_stop: bool = False) -> tuple:
+        """
+        Return (cache_key, cached_response). cached_response is None on a miss or when caching is off.
+        """
+        if self.response_cache is None:
+            return None, None
+        cache_key = self.response_cache.key(self.model_provider, self.model_version, self.temperature,
+                                            system_prompt, user_prompt, pydantic_obj,
+                                            self._can_stream(pydantic_obj, early_stop))
+        if self.response_cache.reads:
+            try:
+                response = self.response_cache.get(cache_key, pydantic_obj)
+                self._increment(cache_hits=1)
+                return cache_key, response
+            except LLMCacheMiss:
+                self._increment(cache_misses=1)
+                if self.response_cache.mode == "replay":
+                    self._increment(failed_calls=1)
+                    raise
+        return cache_key, None
+    
+    def _build_messages(self, user_prompt: str, system_prompt: Optional[str]) -> list:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+    
+    def _count_tokens(self, text: str) -> int:
+        if self.model_provider.lower() == "ollama":
+            # For Ollama, use a simple approximation based on characters (roughly 4 chars per token)
+            return len(text) // 4
+        try:
+            return self.llm.get_num_tokens(text)
+        except Exception as e:
+            print(f"Warning: Token counting error: {e}")
+            # Fallback approximation if tokenizer fails
+            return len(text) // 4
+    
+    def _prepare_call(self, pydantic_obj: Optional[Type[BaseModel]]) -> tuple:
+        """
+        Return the runnable to call and a function extracting the final response from its output.
+        """
+        if pydantic_obj:
+            return self.llm.with_structured_output(pydantic_obj), lambda response: response
+        if self.model_version.startswith("deepseek"):
+            # Extract the resposne without the think
+            return self.llm.with_structured_output(ResponseWithThinkPydantic), lambda response: response.response
+        return self.llm, lambda response: response.content
+    
+    def _can_stream(self, pydantic_obj: Optional[Type[BaseModel]], early_stop: bool) -> bool:
+        # Structured output (including the deepseek think/response wrapper) needs the full completion
+        return early_stop and pydantic_obj is None and not self.model_version.startswith("deepseek")
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        content = chunk.content
+        if isinstance(content, str):
+            return content
+        # Some providers stream a list of content blocks
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    
+    def _record_response(self, response: Any, prompt_tokens: int, cache_key: Optional[str]) -> None:
+        completion_tokens = self._count_tokens(str(response))
+        self._increment(
+            total_prompt_tokens=prompt_tokens,
+            total_completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        if cache_key is not None and self.response_cache.writes:
+            self.response_cache.put(cache_key, response)
+    
+    def _retry_delay(self, e: Exception, retry_count: int, max_retries: int) -> float:
+        """
+        Return the backoff delay before the next attempt, or raise if the error is not retryable.
+        """
+        if not isinstance(e, ClientError) or e.response['Error']['Code'] not in ('Throttling', 'TooManyRequestsException'):
+            self._increment(failed_calls=1)
+            raise e
+        
+        self._increment(retry_count=1)
+        if retry_count > max_retries:
+            self._increment(failed_calls=1)
+            raise Exception(f"Maximum retries ({max_retries}) exceeded: {str(e)}")
+        
+        base_delay = 1.0
+        max_delay = 60.0
+        delay = min(max_delay, base_delay * (2 ** (retry_count - 1)))
+        jitter = random.uniform(0, 0.1 * delay)
+        sleep_time = delay + jitter
+        
+        print(f"ThrottlingException occurred: {str(e)}. Retrying in {sleep_time:.2f} seconds (attempt {retry_count}/{max_retries})")
+        return sleep_time
+    
     def invoke(self, 
               user_prompt: str, 
               system_prompt: Optional[str] = None, 
               pydantic_obj: Optional[Type[BaseModel]] = None,
-              max_retries: int = 10) -> Any:
+              max_retries: int = 10,
+              early_stop: bool = False) -> Any:
         """
         Invoke the LLM with the given prompts and return the response.
         
@@ -143,95 +434,100 @@ class LLMService:
             system_prompt: Optional system prompt
             pydantic_obj: Optional Pydantic model for structured output
             max_retries: Maximum number of retries for throttling errors
+            early_stop: Stream the response and stop as soon as a complete foamfile or fenced
+                code block has been emitted (plain text responses only)
             
         Returns:
             The LLM response with token usage statistics
         """
-        self.total_calls += 1
+        cache_key, cached_response = self._cache_lookup(user_prompt, system_prompt, pydantic_obj, early_stop)
+        if cached_response is not None:
+            return cached_response
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": user_prompt})
+        self._increment(total_calls=1)
         
-        # Calculate prompt tokens
-        prompt_tokens = 0
-        if self.model_provider.lower() == "ollama":
-            # For Ollama, use a simple approximation based on characters
-            for message in messages:
-                # Approximate token count (roughly 4 chars per token)
-                prompt_tokens += len(message["content"]) // 4
-        else:
+        messages = self._build_messages(user_prompt, system_prompt)
+        prompt_tokens = sum(self._count_tokens(message["content"]) for message in messages)
+        runnable, extract = self._prepare_call(pydantic_obj)
+        
+        streaming = self._can_stream(pydantic_obj, early_stop)
+        
+        retry_count = 0
+        while True:
             try:
-                for message in messages:
-                    prompt_tokens += self.llm.get_num_tokens(message["content"])
+                if streaming:
+                    detector = FoamCompletionDetector()
+                    for chunk in self.llm.stream(messages):
+                        if detector.feed(self._chunk_text(chunk)):
+                            # Leaving the loop closes the stream, which cancels the generation
+                            break
+                    response = detector.text
+                else:
+                    response = extract(runnable.invoke(messages))
+                self._record_response(response, prompt_tokens, cache_key)
+                return response
             except Exception as e:
-                print(f"Warning: Token counting error: {e}")
-                # Fallback approximation if tokenizer fails
-                for message in messages:
-                    prompt_tokens += len(message["content"]) // 4
+                retry_count += 1
+                time.sleep(self._retry_delay(e, retry_count, max_retries))
+    
+    async def ainvoke(self, 
+                      user_prompt: str, 
+                      system_prompt: Optional[str] = None, 
+                      pydantic_obj: Optional[Type[BaseModel]] = None,
+                      max_retries: int = 10,
+                      early_stop: bool = False) -> Any:
+        """
+        Asynchronous version of invoke using the provider's native async client.
+        Retries, caching and statistics behave exactly as in invoke.
+        """
+        cache_key, cached_response = self._cache_lookup(user_prompt, system_prompt, pydantic_obj, early_stop)
+        if cached_response is not None:
+            return cached_response
+        
+        self._increment(total_calls=1)
+        
+        messages = self._build_messages(user_prompt, system_prompt)
+        prompt_tokens = sum(self._count_tokens(message["content"]) for message in messages)
+        runnable, extract = self._prepare_call(pydantic_obj)
+        
+        streaming = self._can_stream(pydantic_obj, early_stop)
         
         retry_count = 0
         while True:
             try:
-                if pydantic_obj:
-                    structured_llm = self.llm.with_structured_output(pydantic_obj)
-                    response = structured_llm.invoke(messages)
-                else:
-                    if self.model_version.startswith("deepseek"):
-                        structured_llm = self.llm.with_structured_output(ResponseWithThinkPydantic)
-                        response = structured_llm.invoke(messages)
-
-                        # Extract the resposne without the think
-                        response = response.response
-                    else:
-                        response = self.llm.invoke(messages)
-                        response = response.content
-
-                # Calculate completion tokens
-                response_content = str(response)
-                if self.model_provider.lower() == "ollama":
-                    # For Ollama, use a simple approximation based on characters
-                    completion_tokens = len(response_content) // 4
+                if streaming:
+                    detector = FoamCompletionDetector()
+                    async for chunk in self.llm.astream(messages):
+                        if detector.feed(self._chunk_text(chunk)):
+                            break
+                    response = detector.text
                 else:
-                    try:
-                        completion_tokens = self.llm.get_num_tokens(response_content)
-                    except Exception as e:
-                        print(f"Warning: Token counting error: {e}")
-                        # Fallback approximation if tokenizer fails
-                        completion_tokens = len(response_content) // 4
-                total_tokens = prompt_tokens + completion_tokens
-                
-                # Update statistics
-                self.total_prompt_tokens += prompt_tokens
-                self.total_completion_tokens += completion_tokens
-                self.total_tokens += total_tokens
-                
+                    response = extract(await runnable.ainvoke(messages))
+                self._record_response(response, prompt_tokens, cache_key)
                 return response
-                
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'Throttling' or e.response['Error']['Code'] == 'TooManyRequestsException':
-                    retry_count += 1
-                    self.retry_count += 1
-                    
-                    if retry_count > max_retries:
-                        self.failed_calls += 1
-                        raise Exception(f"Maximum retries ({max_retries}) exceeded: {str(e)}")
-                    
-                    base_delay = 1.0
-                    max_delay = 60.0
-                    delay = min(max_delay, base_delay * (2 ** (retry_count - 1)))
-                    jitter = random.uniform(0, 0.1 * delay)
-                    sleep_time = delay + jitter
-                    
-                    print(f"ThrottlingException occurred: {str(e)}. Retrying in {sleep_time:.2f} seconds (attempt {retry_count}/{max_retries})")
-                    time.sleep(sleep_time)
-                else:
-                    self.failed_calls += 1
-                    raise e
             except Exception as e:
-                self.failed_calls += 1
-                raise e
+                retry_count += 1
+                await asyncio.sleep(self._retry_delay(e, retry_count, max_retries))
+    
+    async def ainvoke_many(self, requests: List[dict], max_concurrency: int = 4) -> List[Any]:
+        """
+        Run several ainvoke calls with at most max_concurrency requests in flight.
+        Each request is a dict of ainvoke keyword arguments (user_prompt, system_prompt, pydantic_obj, ...).
+        Responses are returned in the order of the requests.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def _bounded(request: dict) -> Any:
+            async with semaphore:
+                return await self.ainvoke(**request)
+        
+        return await asyncio.gather(*(_bounded(request) for request in requests))
+    
+    def invoke_many(self, requests: List[dict], max_concurrency: int = 4) -> List[Any]:
+        """
+        Synchronous entry point for ainvoke_many, for use from the (synchronous) workflow nodes.
+        """
+        return asyncio.run(self.ainvoke_many(requests, max_concurrency))
     
     def get_statistics(self) -> dict:
         """
@@ -243,6 +539,8 @@ class LLMService:
         return {
             "total_calls": self.total_calls,
             "failed_calls": self.failed_calls,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
             "retry_count": self.retry_count,
             "total_prompt_tokens": self.total_prompt_tokens,
             "total_completion_tokens": self.total_completion_tokens,
@@ -261,6 +559,8 @@ class LLMService:
         print(f"Total calls: {stats['total_calls']}")
         print(f"Failed calls: {stats['failed_calls']}")
         print(f"Total retries: {stats['retry_count']}")
+        print(f"Cache hits: {stats['cache_hits']}")
+        print(f"Cache misses: {stats['cache_misses']}")
         print(f"Total prompt tokens: {stats['total_prompt_tokens']}")
         print(f"Total completion tokens: {stats['total_completion_tokens']}")
         print(f"Total tokens: {stats['total_tokens']}")
@@ -327,44 +627,169 @@ def remove_numeric_folders(case_dir: str) -> None:
                 # Not a numeric value, so we keep this folder
                 pass
 
-def run_command(script_path: str, out_file: str, err_file: str, working_dir: str, config : Config) -> None:
+class FatalErrorMonitor:
+    """
+    Scans Allrun.out, Allrun.err and the log.* files of a running case as they grow and reports the
+    first "FOAM FATAL ERROR" / "FOAM FATAL IO ERROR". Only the new bytes of each file are read.
+    """
+    PATTERN = re.compile(r"FOAM FATAL (IO )?ERROR")
+    # Bytes kept from the previous chunk so that a match split between two reads is still found
+    OVERLAP = 64
+
+    def __init__(self, working_dir: str, out_file: str, err_file: str):
+        self.working_dir = working_dir
+        self.fixed_files = [out_file, err_file]
+        self._offsets = {}
+        self._tails = {}
+
+    def _files(self) -> list:
+        logs = [os.path.join(self.working_dir, name) for name in os.listdir(self.working_dir) if name.startswith("log")]
+        return self.fixed_files + sorted(logs)
+
+    def check(self) -> Optional[str]:
+        """
+        Return a description of the first fatal error found since the last call, or None.
+        """
+        for path in self._files():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            offset = self._offsets.get(path, 0)
+            if size <= offset:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(size - offset).decode(errors='replace')
+            self._offsets[path] = size
+            text = self._tails.get(path, "") + chunk
+            self._tails[path] = text[-self.OVERLAP:]
+            match = self.PATTERN.search(text)
+            if match:
+                return f"{match.group(0)} reported in {os.path.basename(path)}"
+        return None
+
+
+# Sourced OpenFOAM environments, keyed by WM_PROJECT_DIR
+_OPENFOAM_ENV_CACHE = {}
+
+def openfoam_environment(openfoam_dir: str) -> Optional[dict]:
+    """
+    Return the environment of a shell that sourced {openfoam_dir}/etc/bashrc, captured once per
+    OpenFOAM installation and reused by later executions. None if the bashrc cannot be sourced.
+    """
+    if openfoam_dir in _OPENFOAM_ENV_CACHE:
+        return _OPENFOAM_ENV_CACHE[openfoam_dir]
+    start_time = time.monotonic()
+    environment = None
+    try:
+        result = subprocess.run(
+            ["bash", "-c", f"source {openfoam_dir}/etc/bashrc > /dev/null 2>&1 && env -0"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            timeout=120
+        )
+        if result.returncode == 0:
+            environment = {}
+            for entry in result.stdout.decode(errors="replace").split("\0"):
+                name, separator, value = entry.partition("=")
+                if separator:
+                    environment[name] = value
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Warning: could not capture the OpenFOAM environment: {e}")
+    if environment is None:
+        print(f"Warning: sourcing {openfoam_dir}/etc/bashrc failed, it will be sourced for every execution.")
+    else:
+        print(f"Captured the OpenFOAM environment of {openfoam_dir} in {time.monotonic() - start_time:.2f} s")
+    _OPENFOAM_ENV_CACHE[openfoam_dir] = environment
+    return environment
+
+def _terminate_process_group(process: subprocess.Popen, grace_seconds: float = 5.0) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def run_command(script_path: str, out_file: str, err_file: str, working_dir: str, config : Config, monitors: Optional[list] = None) -> Optional[str]:
+    """
+    Execute the script with the OpenFOAM environment, streaming stdout/stderr straight into out_file and err_file.
+    The environment is sourced once per installation and reused (config.cache_openfoam_env).
+    While it runs, the monitors (objects with a check() method returning an abort reason or None) are polled;
+    by default a FatalErrorMonitor stops the run at the first FOAM FATAL ERROR (config.abort_on_fatal_error).
+    The whole process group is killed on abort, timeout, or when this function is left by an exception.
+    
+    Returns:
+        The reason a monitor aborted the run, or None if it ran to completion or timed out.
+    """
     print(f"Executing script {script_path} in {working_dir}")
     os.chmod(script_path, 0o777)
     openfoam_dir = os.getenv("WM_PROJECT_DIR")
-    command = f"source {openfoam_dir}/etc/bashrc && bash {os.path.abspath(script_path)}"
+    environment = openfoam_environment(openfoam_dir) if getattr(config, "cache_openfoam_env", True) else None
+    if environment is not None:
+        command = f"bash {os.path.abspath(script_path)}"
+    else:
+        command = f"source {openfoam_dir}/etc/bashrc && bash {os.path.abspath(script_path)}"
     timeout_seconds = config.max_time_limit
-
+    
+    monitors = list(monitors or [])
+    if getattr(config, "abort_on_fatal_error", True):
+        monitors.append(FatalErrorMonitor(working_dir, out_file, err_file))
+    
+    abort_reason = None
+    start_time = time.monotonic()
     with open(out_file, 'w') as out, open(err_file, 'w') as err:
         process = subprocess.Popen(
             ['bash', "-c", command],
             cwd=working_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=out,
+            stderr=err,
             stdin=subprocess.DEVNULL,
-            text=True
+            env=environment,
+            start_new_session=True
         )
-        # stdout, stderr = process.communicate()
-        # out.write(stdout)
-        # err.write(stderr)
-
+        
+        # The script runs in its own session, so neither Ctrl+C nor a signal to this process reaches it:
+        # whatever ends this loop (an exception, SystemExit from a SIGTERM handler) must stop its process group
         try:
-            stdout, stderr = process.communicate(timeout=timeout_seconds)
-            out.write(stdout)
-            err.write(stderr)
-        except subprocess.TimeoutExpired:
-            process.kill()
-            stdout, stderr = process.communicate()
-            timeout_message = (
-                "OpenFOAM execution took too long. "
-                "This case, if set up right, does not require such large execution times.\n"
-            )
-            out.write(timeout_message + stdout)
-            err.write(timeout_message + stderr)
-            print(f"Execution timed out: {script_path}")
-
-    
+            while True:
+                try:
+                    process.wait(timeout=config.monitor_interval)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                
+                if time.monotonic() - start_time > timeout_seconds:
+                    _terminate_process_group(process)
+                    timeout_message = (
+                        "OpenFOAM execution took too long. "
+                        "This case, if set up right, does not require such large execution times.\n"
+                    )
+                    out.write(timeout_message)
+                    err.write(timeout_message)
+                    print(f"Execution timed out: {script_path}")
+                    break
+                
+                for monitor in monitors:
+                    abort_reason = monitor.check()
+                    if abort_reason:
+                        break
+                if abort_reason:
+                    _terminate_process_group(process)
+                    err.write(f"\nExecution aborted: {abort_reason}\n")
+                    print(f"Execution aborted: {abort_reason}")
+                    break
+        finally:
+            if process.poll() is None:
+                _terminate_process_group(process)
 
     print(f"Executed script {script_path}")
+    return abort_reason
 
 def check_foam_errors(directory: str) -> list:
     error_logs = []
@@ -439,6 +864,51 @@ def find_similar_file(description: str, tutorial: str) -> str:
         return "None"
     return tutorial[start_pos:end_pos + len(end_marker)]
 
+def parse_tutorial_files(tutorial: str) -> dict:
+    """
+    Parse the <tutorials> block of a tutorial reference into {(directory name, file name): file content}.
+    """
+    tutorial_files = {}
+    for dir_match in re.finditer(r'<directory_begin>directory name:\s*(.*?)\n(.*?)</directory_end>', tutorial, re.DOTALL):
+        dir_name = dir_match.group(1).strip()
+        for file_match in re.finditer(r'<file_begin>file name:\s*(.*?)\n\s*<file_content>(.*?)</file_content>', dir_match.group(2), re.DOTALL):
+            tutorial_files[(dir_name, file_match.group(1).strip())] = file_match.group(2)
+    return tutorial_files
+
+def foamfile_class(content: str) -> str:
+    match = re.search(r'FoamFile\s*\{[^}]*?\bclass\s+(\w+)\s*;', content, re.DOTALL)
+    return match.group(1) if match else ""
+
+def guess_foamfile_class(folder_name: str, file_name: str) -> str:
+    # Field files in the time directories are volume fields, everything else is a plain dictionary
+    if folder_name == "0" or folder_name.replace(".", "", 1).isdigit():
+        return "volVectorField" if file_name.startswith("U") else "volScalarField"
+    return "dictionary"
+
+def find_reference_files(tutorial_files: dict, folder_name: str, file_name: str, max_siblings: int = 1) -> list:
+    """
+    Select the tutorial files to show as reference for generating folder_name/file_name.
+    The best match comes first: the same file, then the same file name in another directory, then a file
+    of the same class in the same directory. Up to max_siblings further files of the same directory follow.
+    Returns a list of ((directory name, file name), content).
+    """
+    matches = []
+    if (folder_name, file_name) in tutorial_files:
+        matches.append((folder_name, file_name))
+    else:
+        same_name = [key for key in tutorial_files if key[1] == file_name]
+        if same_name:
+            matches.append(same_name[0])
+        else:
+            target_class = guess_foamfile_class(folder_name, file_name)
+            same_class = [key for key in tutorial_files if key[0] == folder_name and foamfile_class(tutorial_files[key]) == target_class]
+            if same_class:
+                matches.append(same_class[0])
+    
+    siblings = [key for key in tutorial_files if key[0] == folder_name and key not in matches]
+    matches.extend(siblings[:max_siblings])
+    return [(key, tutorial_files[key]) for key in matches]
+
 def read_commands(file_path: str) -> str:
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Commands file not found: {file_path}")
@@ -453,25 +923,155 @@ def find_input_file(case_dir: str, command: str) -> str:
                 return os.path.join(root, file)
     return ""
 
-def retrieve_faiss(database_name: str, query: str, topk: int = 1) -> dict:
+def retrieve_faiss(database_name: str, query: str, topk: int = 1, filters: Optional[dict] = None) -> dict:
     """
     Retrieve a similar case from a FAISS database.
+    
+    filters maps metadata fields (see METADATA_FILTER_FIELDS) to required values, e.g.
+    {"case_solver": "simpleFoam"}. Only matching documents are searched; if no document matches
+    all filters, the last filters are dropped one at a time until some do, and the full index is
+    searched if none match at all.
     """
     
-    if database_name not in FAISS_DB_CACHE:
+    if database_name not in FAISS_DB_REGISTRY:
         raise ValueError(f"Database '{database_name}' is not loaded.")
     
+    # Exact command names do not need the embedder; keyword matches are fused with the vector ranking
+    lexical_docs = []
+    if not filters:
+        exact_doc = retrieve_exact(database_name, query)
+        if exact_doc is not None:
+            return format_faiss_results(database_name, [exact_doc])
+        lexical_docs = retrieve_lexical(database_name, query, max(topk, FUSION_DEPTH))
+    
     # Tokenize the query
     query = tokenize(query)
     
-    vectordb = FAISS_DB_CACHE[database_name]
-    docs = vectordb.similarity_search(query, k=topk)
+    vectordb = FAISS_DB_REGISTRY.get(database_name)
+    query_embedding = FAISS_DB_REGISTRY.embed_query(query)
+    positions = filter_positions(database_name, filters) if filters else None
+    if positions is None:
+        docs = vectordb.similarity_search_by_vector(query_embedding, k=max(topk, FUSION_DEPTH) if lexical_docs else topk)
+        docs = fuse_documents(docs, lexical_docs, topk)
+    else:
+        vector = np.array([query_embedding], dtype=np.float32)
+        if vectordb._normalize_L2:
+            faiss.normalize_L2(vector)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(positions, dtype=np.int64)))
+        _, indices = vectordb.index.search(vector, min(topk, len(positions)), params=params)
+        docs = [vectordb.docstore.search(vectordb.index_to_docstore_id[i]) for i in indices[0] if i != -1]
     if not docs:
         raise ValueError(f"No documents found for query: {query}")
     
+    return format_faiss_results(database_name, docs)
+
+
+def retrieve_faiss_batch(database_name: str, queries: List[str], topk: int = 1) -> List[list]:
+    """
+    Retrieve similar documents for several queries with one embedding batch and one FAISS search.
+    Results are returned in the order of the queries.
+    """
+    if database_name not in FAISS_DB_REGISTRY:
+        raise ValueError(f"Database '{database_name}' is not loaded.")
+    if not queries:
+        return []
+    
+    results = [None] * len(queries)
+    vector_positions, lexical_docs = [], {}
+    for position, query in enumerate(queries):
+        exact_doc = retrieve_exact(database_name, query)
+        if exact_doc is not None:
+            results[position] = format_faiss_results(database_name, [exact_doc])
+        else:
+            vector_positions.append(position)
+            lexical_docs[position] = retrieve_lexical(database_name, query, max(topk, FUSION_DEPTH))
+    if not vector_positions:
+        return results
+    
+    tokenized_queries = [tokenize(queries[position]) for position in vector_positions]
+    
+    vectordb = FAISS_DB_REGISTRY.get(database_name)
+    query_embeddings = np.array(FAISS_DB_REGISTRY.embed_queries(tokenized_queries), dtype=np.float32)
+    if vectordb._normalize_L2:
+        faiss.normalize_L2(query_embeddings)
+    _, indices = vectordb.index.search(query_embeddings, max(topk, FUSION_DEPTH) if any(lexical_docs.values()) else topk)
+    
+    for position, query, row in zip(vector_positions, tokenized_queries, indices):
+        docs = [vectordb.docstore.search(vectordb.index_to_docstore_id[i]) for i in row if i != -1]
+        docs = fuse_documents(docs, lexical_docs[position], topk)
+        if not docs:
+            raise ValueError(f"No documents found for query: {query}")
+        results[position] = format_faiss_results(database_name, docs)
+    
+    return results
+
+
+def filter_positions(database_name: str, filters: dict) -> Optional[List[int]]:
+    """
+    Return the FAISS positions of the documents matching the metadata filters.
+    Filters are relaxed from the last one backwards until something matches; None means no filter matched.
+    """
+    metadata_index = FAISS_DB_REGISTRY.get_metadata_index(database_name)
+    filter_items = [(field, value) for field, value in filters.items() if value]
+    while filter_items:
+        positions = None
+        for field, value in filter_items:
+            matches = set(metadata_index.get(field, {}).get(value, []))
+            positions = matches if positions is None else positions & matches
+        if positions:
+            return sorted(positions)
+        print(f"Warning: No documents in {database_name} match {dict(filter_items)}, relaxing the filter.")
+        filter_items = filter_items[:-1]
+    return None
+
+
+def retrieve_exact(database_name: str, query: str) -> Optional[Document]:
+    """
+    Look the query up as a command name in the lexical index of the database.
+    Returns None when the database has no lexical index or the query is not a command name.
+    """
+    lexical_index = FAISS_DB_REGISTRY.get_lexical_index(database_name)
+    position = lexical_index.exact(query) if lexical_index is not None else None
+    if position is None:
+        return None
+    record = lexical_index.records[position]
+    return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+
+def retrieve_lexical(database_name: str, query: str, topk: int = 1) -> List[Document]:
+    """
+    Return the BM25 matches of the query in the lexical index of the database, best first.
+    Returns an empty list when the database has no lexical index or nothing matched.
+    """
+    lexical_index = FAISS_DB_REGISTRY.get_lexical_index(database_name)
+    if lexical_index is None:
+        return []
+    return [Document(page_content=record["page_content"], metadata=record["metadata"]) for record in lexical_index.search(query, topk)]
+
+
+def fuse_documents(vector_docs: List[Document], lexical_docs: List[Document], topk: int) -> List[Document]:
+    """
+    Merge the vector and BM25 rankings of a query by reciprocal-rank fusion; the vector ranking alone if BM25 found nothing.
+    """
+    if not lexical_docs:
+        return vector_docs[:topk]
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], [1.0, LEXICAL_WEIGHT], topk, key=lambda doc: doc.page_content)
+
+
+def format_faiss_results(database_name: str, docs: list) -> List[dict]:
+    """
+    Convert retrieved documents into the result dictionaries of the given database.
+    Large fields are read from the payload store unless the document metadata carries them itself.
+    """
     formatted_results = []
     for doc in docs:
-        metadata = doc.metadata or {}
+        metadata = dict(doc.metadata or {})
+        
+        payload_id = metadata.get("payload_id")
+        if payload_id is not None:
+            payload_store = FAISS_DB_REGISTRY.get_payload_store(database_name)
+            if payload_store is not None:
+                metadata = {**payload_store.get(payload_id), **metadata}
         
         if database_name == "openfoam_allrun_scripts":
             formatted_results.append({
@@ -514,11 +1114,9 @@ def retrieve_faiss(database_name: str, query: str, topk: int = 1) -> dict:
             })
         else:
             raise ValueError(f"Unknown database name: {database_name}")
-    
-    
 
     return formatted_results
-        
+
 
 def parse_directory_structure(data: str) -> dict:
     """
@@ -0,0 +1,17 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+CAVITY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cavity")
+
+
+@pytest.fixture
+def cavity_foamfiles():
+    """The foamfiles of the icoFoam cavity tutorial, as the input writer produces them."""
+    foamfiles = []
+    for folder_name in ("system", "constant", "0"):
+        for file_name in sorted(os.listdir(os.path.join(CAVITY_DIR, folder_name))):
+            with open(os.path.join(CAVITY_DIR, folder_name, file_name)) as f:
+                foamfiles.append(SimpleNamespace(folder_name=folder_name, file_name=file_name, content=f.read()))
+    return foamfiles
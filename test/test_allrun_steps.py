@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from allrun_steps import (  # noqa: E402
+    STATUS_FILE, AllrunStep, first_step_to_run, mark_steps_done, record_steps, split_allrun, write_resume_script,
+)
+
+ALLRUN = """#!/bin/sh
+cd ${0%/*} || exit 1
+. $WM_PROJECT_DIR/bin/tools/RunFunctions
+
+runApplication -s 1 blockMesh
+setFields > log.setFields 2>&1
+runApplication icoFoam
+"""
+
+
+def _write(case_dir, path, content):
+    full_path = os.path.join(case_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as f:
+        f.write(content)
+
+
+def _case(tmp_path):
+    _write(tmp_path, "system/blockMeshDict", "vertices ();\n")
+    _write(tmp_path, "system/setFieldsDict", "regions ();\n")
+    _write(tmp_path, "constant/polyMesh/points", "()\n")
+    _write(tmp_path, "0/alpha.water", "internalField uniform 0;\n")
+    return str(tmp_path)
+
+
+def test_split_allrun_runapplication_and_plain_commands():
+    lines, steps = split_allrun(ALLRUN)
+    assert [step.command for step in steps] == ["runApplication -s 1 blockMesh", "setFields > log.setFields 2>&1", "runApplication icoFoam"]
+    assert [step.application for step in steps] == ["blockMesh", "setFields", "icoFoam"]
+    assert [step.skippable for step in steps] == [True, True, False]
+    assert lines[:4] == ["#!/bin/sh", "cd ${0%/*} || exit 1", ". $WM_PROJECT_DIR/bin/tools/RunFunctions", ""]
+
+
+def test_split_allrun_rejects_control_flow():
+    assert split_allrun("#!/bin/sh\nfor i in 1 2\ndo\n    blockMesh\ndone\n") is None
+
+
+def test_snappy_hex_mesh_is_skippable_only_with_overwrite():
+    assert AllrunStep(0, "runApplication snappyHexMesh -overwrite").skippable
+    assert AllrunStep(0, "runApplication -o snappyHexMesh -overwrite").application == "snappyHexMesh"
+    assert not AllrunStep(0, "runApplication snappyHexMesh").skippable
+    assert not AllrunStep(0, "mpirun -np 4 snappyHexMesh -parallel > log.snappyHexMesh").skippable
+
+
+def test_resume_after_failure_in_the_middle(tmp_path):
+    case_dir = _case(tmp_path)
+    _, steps = split_allrun(ALLRUN)
+    _write(case_dir, STATUS_FILE, "0 0\n1 1\n")
+    records = record_steps(case_dir, steps, 0)
+    assert [record["status"] for record in records] == [0, 1]
+    assert first_step_to_run(case_dir, steps) == 1
+
+    # An edited input makes its step run again
+    mark_steps_done(case_dir, steps, 2)
+    assert first_step_to_run(case_dir, steps) == 2
+    _write(case_dir, "system/blockMeshDict", "vertices ((0 0 0));\n")
+    assert first_step_to_run(case_dir, steps) == 0
+
+
+def test_no_step_is_skipped_after_snappy_hex_mesh_without_overwrite(tmp_path):
+    case_dir = _case(tmp_path)
+    _, steps = split_allrun("blockMesh\nsnappyHexMesh\nsetFields\nicoFoam\n")
+    mark_steps_done(case_dir, steps, 3)
+    assert first_step_to_run(case_dir, steps) == 1
+
+
+def test_resume_script_status_file(tmp_path):
+    case_dir = str(tmp_path)
+    lines, steps = split_allrun("#!/bin/sh\ncd ${0%/*} || exit 1\ntrue\nfalse\ntrue\n")
+    path = write_resume_script(case_dir, lines, 1)
+    with open(path) as f:
+        assert f.read().splitlines() == [
+            "#!/bin/sh",
+            "cd ${0%/*} || exit 1",
+            'echo "Skipped true (outputs up to date)"',
+            "false",
+            f'echo "1 $?" >> {STATUS_FILE}',
+            "true",
+            f'echo "2 $?" >> {STATUS_FILE}',
+        ]
+    subprocess.run(["sh", path], cwd=case_dir, check=True, capture_output=True)
+    with open(os.path.join(case_dir, STATUS_FILE)) as f:
+        assert f.read() == "1 1\n2 0\n"
+    assert [record["status"] for record in record_steps(case_dir, steps, 1)] == [1]
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from auto_fixes import AutoFixer  # noqa: E402
+from foam_parser import parse_foam_dict  # noqa: E402
+
+HEADER = "FoamFile\n{\n    version     2.0;\n    format      ascii;\n    class       dictionary;\n}\n"
+
+
+class Foamfile:
+    def __init__(self, folder_name, file_name, content):
+        self.folder_name = folder_name
+        self.file_name = file_name
+        self.content = content
+
+
+def _fix(tmp_path, foamfiles, error_content):
+    fixer = AutoFixer(str(tmp_path / "stats.json"))
+    return fixer.apply(foamfiles, str(tmp_path), [{"file": "log.simpleFoam", "error_content": error_content}])
+
+
+def test_undefined_div_scheme_v2206(tmp_path):
+    fv_schemes = Foamfile("system", "fvSchemes", HEADER + "divSchemes\n{\n    default none;\n}\n")
+    error_content = (
+        "--> FOAM FATAL IO ERROR: (openfoam-2206)\n"
+        "Entry 'div(phi,U)' not found in dictionary \"system/fvSchemes/divSchemes\"\n"
+    )
+    changed, unresolved, _ = _fix(tmp_path, [fv_schemes], error_content)
+    assert unresolved == []
+    assert list(parse_foam_dict(changed[("system", "fvSchemes")])["divSchemes"]["div(phi,U)"]) == ["Gauss", "upwind"]
+
+
+def test_undefined_solver_foundation(tmp_path):
+    fv_solution = Foamfile("system", "fvSolution", HEADER + "solvers\n{\n}\n")
+    error_content = (
+        "--> FOAM FATAL IO ERROR:\n"
+        "keyword p is undefined in dictionary \"/case/system/fvSolution/solvers\"\n"
+    )
+    changed, unresolved, _ = _fix(tmp_path, [fv_solution], error_content)
+    assert unresolved == []
+    assert list(parse_foam_dict(changed[("system", "fvSolution")])["solvers"]["p"]["solver"]) == ["GAMG"]
@@ -0,0 +1,76 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from case_snapshots import CaseSnapshots, snapshot_iteration  # noqa: E402
+
+
+def _write(case_dir, path, content):
+    full_path = os.path.join(case_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as f:
+        f.write(content)
+
+
+def _read(case_dir, path):
+    with open(os.path.join(case_dir, path)) as f:
+        return f.read()
+
+
+def _state(tmp_path, auto_rollback):
+    case_dir = str(tmp_path)
+    _write(case_dir, "system/fvSchemes", "divSchemes { default none; }\n")
+    foamfile = SimpleNamespace(folder_name="system", file_name="fvSchemes", content=_read(case_dir, "system/fvSchemes"))
+    return SimpleNamespace(
+        case_dir=case_dir,
+        config=SimpleNamespace(auto_rollback=auto_rollback),
+        snapshots=CaseSnapshots(case_dir),
+        foamfiles=SimpleNamespace(list_foamfile=[foamfile]),
+    )
+
+
+def _error(file, content):
+    return {"file": file, "error_content": content}
+
+
+def test_output_folders_are_not_recorded(tmp_path):
+    case_dir = str(tmp_path)
+    for path in ["system/controlDict", "0/U", "0.5/U", "processor0/0/U", "postProcessing/probes/0/U",
+                 "dynamicCode/inlet/code.C", "log.icoFoam", "Allrun.out"]:
+        _write(case_dir, path, "x\n")
+    assert sorted(CaseSnapshots(case_dir).take(1)["files"]) == ["0/U", "system/controlDict"]
+
+
+def test_rollback_is_opt_in(tmp_path):
+    state = _state(tmp_path, auto_rollback=False)
+    state.error_logs = [_error("log.simpleFoam", "Entry 'div(phi,U)' not found")]
+    assert not snapshot_iteration(state, 1)
+    _write(state.case_dir, "system/fvSchemes", "divSchemes { }\n")
+    state.error_logs = state.error_logs + [_error("log.simpleFoam", "Entry 'div(phi,k)' not found")]
+    assert not snapshot_iteration(state, 2)
+    assert _read(state.case_dir, "system/fvSchemes") == "divSchemes { }\n"
+
+
+def test_rollback_when_errors_are_added(tmp_path):
+    state = _state(tmp_path, auto_rollback=True)
+    state.error_logs = [_error("log.simpleFoam", "Entry 'div(phi,U)' not found at time 0.1")]
+    assert not snapshot_iteration(state, 1)
+    _write(state.case_dir, "system/fvSchemes", "divSchemes { }\n")
+    error_logs = [_error("log.simpleFoam", "Entry 'div(phi,U)' not found at time 0.2"),
+                  _error("log.simpleFoam", "Entry 'div(phi,k)' not found")]
+    state.error_logs = error_logs
+    assert snapshot_iteration(state, 2)
+    assert _read(state.case_dir, "system/fvSchemes") == "divSchemes { default none; }\n"
+    assert state.foamfiles.list_foamfile[0].content == "divSchemes { default none; }\n"
+    assert state.error_logs == error_logs
+
+
+def test_no_rollback_when_the_run_gets_further(tmp_path):
+    state = _state(tmp_path, auto_rollback=True)
+    state.error_logs = [_error("preflight:system/fvSchemes", "Missing keyword divSchemes")]
+    assert not snapshot_iteration(state, 1)
+    state.error_logs = [_error("log.simpleFoam", "Entry 'div(phi,U)' not found"),
+                        _error("log.simpleFoam", "Entry 'div(phi,k)' not found")]
+    assert not snapshot_iteration(state, 2)
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from foam_edit import scan, set_entry  # noqa: E402
+from foam_parser import FoamDict, FoamList, FoamParseError, entry_words, find_dimensions, parse_foam_dict, tokenize_foam  # noqa: E402
+from foam_validator import mesh_patches, validate_foamfiles  # noqa: E402
+
+
+def _cavity(foamfiles, path):
+    return next(foamfile.content for foamfile in foamfiles if f"{foamfile.folder_name}/{foamfile.file_name}" == path)
+
+
+def test_cavity_parses(cavity_foamfiles):
+    control_dict = parse_foam_dict(_cavity(cavity_foamfiles, "system/controlDict"))
+    assert entry_words(control_dict["application"]) == ["icoFoam"]
+    assert isinstance(control_dict["FoamFile"], FoamDict)
+
+    block_mesh_dict = parse_foam_dict(_cavity(cavity_foamfiles, "system/blockMeshDict"))
+    assert len(block_mesh_dict["vertices"][0]) == 8
+    assert mesh_patches(block_mesh_dict) == {"movingWall": "wall", "fixedWalls": "wall", "frontAndBack": "empty"}
+
+    u = parse_foam_dict(_cavity(cavity_foamfiles, "0/U"))
+    assert find_dimensions(u["dimensions"]) == [0, 1, -1, 0, 0, 0, 0]
+    moving_wall = u["boundaryField"]["movingWall"]
+    assert entry_words(moving_wall["type"]) == ["fixedValue"]
+    assert entry_words(moving_wall["value"]) == ["uniform"] and moving_wall["value"][1] == FoamList(["1", "0", "0"])
+
+
+def test_cavity_round_trip(cavity_foamfiles):
+    for foamfile in cavity_foamfiles:
+        text = foamfile.content
+        # Tokens point back at their source text, which the editor relies on
+        for token in tokenize_foam(text):
+            assert text[token.start:token.end] == token
+        # Setting every top-level plain entry to its own value text leaves the dictionary unchanged
+        edited = text
+        for key, entry in scan(text).entries.items():
+            if entry.block is None:
+                value = text[entry.key.end:entry.end].strip().rstrip(";")
+                edited = set_entry(edited, [key], value)
+        assert parse_foam_dict(edited) == parse_foam_dict(text)
+
+
+def test_cavity_validates(cavity_foamfiles):
+    assert validate_foamfiles(cavity_foamfiles, "icoFoam") == []
+
+
+def test_validator_reports_missing_patch(cavity_foamfiles):
+    for foamfile in cavity_foamfiles:
+        if foamfile.file_name == "p":
+            foamfile.content = set_entry(foamfile.content, ["boundaryField", "movingWall"], "{ }").replace("movingWall", "lid")
+    errors = validate_foamfiles(cavity_foamfiles, "icoFoam")
+    assert [(error["file"], error["check"]) for error in errors] == [("preflight:0/p", "boundary")]
+    assert "movingWall" in errors[0]["error_content"]
+
+
+@pytest.mark.parametrize("text, message, line", [
+    ("a\n{\n    b 1;\n", "'{' opened on line 2 is never closed", 3),
+    ("a\n{\n    b 1;\n}\n}\n", "unexpected '}' without a matching '{'", 5),
+    ("a\n{\n    b 1\n}\n", "missing ';' after the value of 'b'", 3),
+    ("a 1;\nb 2\n", "missing ';' after the value of 'b'", 2),
+    ("a (1 2;\n", "unexpected ';' inside the list opened on line 1", 1),
+])
+def test_syntax_errors(text, message, line):
+    with pytest.raises(FoamParseError) as error:
+        parse_foam_dict(text)
+    assert (error.value.message, error.value.line) == (message, line)
+    # The editor refuses the same text
+    with pytest.raises(FoamParseError) as error:
+        scan(text)
+    assert error.value.line == line
+
+
+def test_include_and_macros():
+    text = (
+        '#include "include/initialConditions"\n'
+        "flowVelocity (10 0 0);\n"
+        "internalField uniform $flowVelocity;\n"
+        "boundaryField\n{\n"
+        '    #includeEtc "caseDicts/setConstraintTypes"\n'
+        '    inlet { type fixedValue; value $internalField; }\n'
+        "    outlet { $:boundaryField.inlet; type zeroGradient; }\n"
+        "    wall { type fixedValue; value ${..inlet.value}; }\n"
+        "}\n"
+    )
+    dictionary = parse_foam_dict(text)
+    assert dictionary.includes == [("#include", '"include/initialConditions"')]
+    assert list(dictionary["internalField"]) == ["uniform", "$flowVelocity"]
+    boundary_field = dictionary["boundaryField"]
+    assert boundary_field.includes == [("#includeEtc", '"caseDicts/setConstraintTypes"')]
+    assert list(boundary_field) == ["inlet", "outlet", "wall"]
+    assert list(boundary_field["inlet"]["value"]) == ["$internalField"]
+    assert "$:boundaryField.inlet" in boundary_field["outlet"]
+    assert list(boundary_field["wall"]["value"]) == ["${..inlet.value}"]
+
+    # Edits next to directives keep them
+    edited = set_entry(text, ["boundaryField", "outlet", "type"], "inletOutlet")
+    assert edited.count("#include") == 2
+    assert entry_words(parse_foam_dict(edited)["boundaryField"]["outlet"]["type"]) == ["inletOutlet"]
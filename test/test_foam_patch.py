@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from foam_parser import parse_foam_dict  # noqa: E402
+from foam_patch import FoamPatchError, apply_edits  # noqa: E402
+
+HEADER = "FoamFile\n{\n    version     2.0;\n    format      ascii;\n    class       dictionary;\n}\n"
+
+
+class Foamfile:
+    def __init__(self, folder_name, file_name, content):
+        self.folder_name = folder_name
+        self.file_name = file_name
+        self.content = content
+
+
+class Edit:
+    def __init__(self, folder_name, file_name, action, key_path=(), value="", content=""):
+        self.folder_name = folder_name
+        self.file_name = file_name
+        self.action = action
+        self.key_path = list(key_path)
+        self.value = value
+        self.content = content
+
+
+def _u_file():
+    return Foamfile("0", "U", HEADER + "internalField uniform (0 0 0);\nboundaryField\n{\n    inlet\n    {\n        type zeroGradient;\n    }\n}\n")
+
+
+def test_no_edits_raise():
+    with pytest.raises(FoamPatchError):
+        apply_edits([_u_file()], [])
+
+
+def test_edit_without_change_raises():
+    edit = Edit("0", "U", "set", ["boundaryField", "inlet", "type"], "zeroGradient")
+    with pytest.raises(FoamPatchError):
+        apply_edits([_u_file()], [edit])
+
+
+@pytest.mark.parametrize("folder_name", ["./0", "0/", "./0/"])
+def test_edit_folder_is_normalized(folder_name):
+    edit = Edit(folder_name, "U", "set", ["boundaryField", "inlet", "type"], "fixedValue")
+    changed = apply_edits([_u_file()], [edit])
+    assert list(changed) == [("0", "U")]
+    assert list(parse_foam_dict(changed[("0", "U")])["boundaryField"]["inlet"]["type"]) == ["fixedValue"]
+
+
+def test_case_folder_keeps_its_name():
+    allrun = Foamfile("./", "Allrun", "#!/bin/sh\nblockMesh\n")
+    edit = Edit(".", "Allrun", "rewrite", content="#!/bin/sh\nblockMesh\nicoFoam\n")
+    assert list(apply_edits([allrun], [edit])) == [("./", "Allrun")]
+
+
+def test_set_and_delete_on_cavity(cavity_foamfiles):
+    edits = [
+        Edit("system", "fvSchemes", "set", ["divSchemes", "div(phi,U)"], "Gauss limitedLinearV 1"),
+        Edit("system", "fvSchemes", "set", ["wallDist", "method"], "meshWave"),
+        Edit("system", "fvSolution", "delete", ["solvers", "pFinal"]),
+        Edit("0", "U", "set", ["boundaryField", "fixedWalls"], "{\n    type            fixedValue;\n    value           uniform (0 0 0);\n}"),
+    ]
+    changed = apply_edits(cavity_foamfiles, edits)
+    assert sorted(changed) == [("0", "U"), ("system", "fvSchemes"), ("system", "fvSolution")]
+
+    fv_schemes = parse_foam_dict(changed[("system", "fvSchemes")])
+    assert list(fv_schemes["divSchemes"]["div(phi,U)"]) == ["Gauss", "limitedLinearV", "1"]
+    assert list(fv_schemes["wallDist"]["method"]) == ["meshWave"]
+    fv_solution = parse_foam_dict(changed[("system", "fvSolution")])
+    assert list(fv_solution["solvers"]) == ["p", "U"]
+    fixed_walls = parse_foam_dict(changed[("0", "U")])["boundaryField"]["fixedWalls"]
+    assert list(fixed_walls["type"]) == ["fixedValue"]
+    # The rest of the file is kept as it was
+    assert "// * * * *" in changed[("system", "fvSolution")]
+    assert changed[("system", "fvSolution")].count("\n") < next(f.content for f in cavity_foamfiles if f.file_name == "fvSolution").count("\n")
+
+
+def test_delete_missing_entry_raises(cavity_foamfiles):
+    with pytest.raises(FoamPatchError):
+        apply_edits(cavity_foamfiles, [Edit("system", "fvSolution", "delete", ["solvers", "k"])])
+
+
+def test_edit_that_breaks_the_dictionary_raises(cavity_foamfiles):
+    with pytest.raises(FoamPatchError):
+        apply_edits(cavity_foamfiles, [Edit("system", "controlDict", "set", ["endTime"], "(0.5")])
+
+
+def test_set_in_missing_file_raises(cavity_foamfiles):
+    with pytest.raises(FoamPatchError):
+        apply_edits(cavity_foamfiles, [Edit("0", "k", "set", ["internalField"], "uniform 0.1")])
@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from lexical_index import LEXICAL_WEIGHT, CommandLexicalIndex, reciprocal_rank_fusion  # noqa: E402
+
+HELP_TEXTS = {
+    "blockMesh": "A multi-block mesh generator. Reads system/blockMeshDict and writes the mesh to the domain.",
+    "snappyHexMesh": "Automatic split hex mesher. Refines and morphs the mesh to snap to a surface.",
+    "setFields": "Set values on a selected set of cells/patchfaces through a dictionary.",
+    "decomposePar": "Automatically decomposes a mesh and fields of a case for parallel execution.",
+    "topoSet": "Operates on cellSets/faceSets/pointSets through a dictionary.",
+    "checkMesh": "Checks validity of a mesh.",
+}
+
+
+def _index():
+    return CommandLexicalIndex([
+        {"page_content": f"<command>{command}</command>", "metadata": {"command": command, "help_text": help_text}}
+        for command, help_text in HELP_TEXTS.items()
+    ])
+
+
+def _fuse(vector_ranking, lexical_ranking, topk=1):
+    return reciprocal_rank_fusion([vector_ranking, lexical_ranking], [1.0, LEXICAL_WEIGHT], topk)
+
+
+def test_exact_name():
+    index = _index()
+    for query in ["blockMesh", "blockmesh", "runApplication blockMesh", "mpirun -np 4 decomposePar -force"]:
+        assert index.records[index.exact(query)]["metadata"]["command"] in query.replace("blockmesh", "blockMesh")
+    # A sentence that mentions a command is not a name lookup
+    assert index.exact("fill the region below the surface with water using setFields") is None
+
+
+def test_semantic_query_is_not_taken_over_by_a_keyword_match():
+    index = _index()
+    query = "initialise a bubble of water inside the domain"
+    lexical_ranking = [record["metadata"]["command"] for record in index.search(query, 10)]
+    # "domain" in the help of blockMesh is the rarest word the query shares with any help text
+    assert lexical_ranking[0] == "blockMesh"
+    vector_ranking = ["setFields", "topoSet", "snappyHexMesh"]
+    assert _fuse(vector_ranking, lexical_ranking) == ["setFields"]
+
+
+def test_keyword_match_lifts_a_vector_candidate():
+    index = _index()
+    lexical_ranking = [record["metadata"]["command"] for record in index.search("decompose the mesh for parallel execution", 10)]
+    assert lexical_ranking[0] == "decomposePar"
+    vector_ranking = ["setFields", "decomposePar", "topoSet"]
+    assert _fuse(vector_ranking, lexical_ranking, topk=2) == ["decomposePar", "setFields"]
+
+
+def test_fusion_without_lexical_matches_keeps_the_vector_ranking():
+    assert _fuse(["a", "b", "c"], [], topk=3) == ["a", "b", "c"]
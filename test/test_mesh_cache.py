@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from allrun_steps import split_allrun  # noqa: E402
+from mesh_cache import MeshCache, mesh_key, mesh_steps_end  # noqa: E402
+
+
+def _steps(script):
+    return split_allrun(script)[1]
+
+
+def _write(case_dir, path, content):
+    full_path = os.path.join(case_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as f:
+        f.write(content)
+
+
+def test_snappy_hex_mesh_with_overwrite_is_cached():
+    steps = _steps("blockMesh\nsurfaceFeatureExtract\nsnappyHexMesh -overwrite\ncheckMesh\nsimpleFoam\n")
+    assert mesh_steps_end(steps) == 3
+
+
+def test_snappy_hex_mesh_without_overwrite_ends_the_prefix():
+    steps = _steps("blockMesh\nsurfaceFeatureExtract\nsnappyHexMesh\ncheckMesh\nsimpleFoam\n")
+    assert mesh_steps_end(steps) == 2
+
+
+def test_mesh_copied_later_is_not_cached():
+    steps = _steps("blockMesh\nsnappyHexMesh\ncp -r 1/polyMesh constant/\nsimpleFoam\n")
+    assert mesh_steps_end(steps) == 0
+
+
+def test_store_and_restore(tmp_path):
+    case_dir, other_case_dir = str(tmp_path / "case"), str(tmp_path / "other")
+    for directory in (case_dir, other_case_dir):
+        _write(directory, "system/blockMeshDict", "vertices ();\n")
+    _write(case_dir, "constant/polyMesh/points", "(0 0 0)\n")
+    steps = _steps("blockMesh\nsnappyHexMesh\nsimpleFoam\n")
+    end = mesh_steps_end(steps)
+    key = mesh_key(case_dir, steps[:end])
+    assert key == mesh_key(other_case_dir, steps[:end])
+
+    cache = MeshCache(tmp_path / "cache", 1 << 20)
+    assert not cache.restore(key, other_case_dir)
+    cache.store(key, case_dir)
+    assert cache.restore(key, other_case_dir)
+    with open(os.path.join(other_case_dir, "constant/polyMesh/points")) as f:
+        assert f.read() == "(0 0 0)\n"
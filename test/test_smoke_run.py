@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from foam_parser import entry_words, parse_foam_dict  # noqa: E402
+from smoke_run import smoke_control_dict  # noqa: E402
+
+
+def _case(tmp_path, cavity_foamfiles):
+    control_dict = next(foamfile.content for foamfile in cavity_foamfiles if foamfile.file_name == "controlDict")
+    os.makedirs(tmp_path / "system")
+    path = tmp_path / "system" / "controlDict"
+    path.write_text(control_dict)
+    return str(tmp_path), path, control_dict
+
+
+def test_smoke_run_patches_and_restores_control_dict(tmp_path, cavity_foamfiles):
+    case_dir, path, original = _case(tmp_path, cavity_foamfiles)
+    with smoke_control_dict(case_dir, 10) as smoke_run:
+        assert smoke_run
+        dictionary = parse_foam_dict(path.read_text())
+        # deltaT 0.005, so 10 steps end at 0.05 instead of 0.5
+        assert entry_words(dictionary["endTime"]) == ["0.05"]
+        assert entry_words(dictionary["writeControl"]) == ["timeStep"]
+        assert entry_words(dictionary["writeInterval"]) == ["10"]
+        assert entry_words(dictionary["application"]) == ["icoFoam"]
+    assert path.read_text() == original
+
+
+def test_smoke_run_restores_control_dict_on_error(tmp_path, cavity_foamfiles):
+    case_dir, path, original = _case(tmp_path, cavity_foamfiles)
+    with pytest.raises(RuntimeError):
+        with smoke_control_dict(case_dir, 10):
+            raise RuntimeError("run failed")
+    assert path.read_text() == original
+
+
+def test_short_run_needs_no_smoke_run(tmp_path, cavity_foamfiles):
+    case_dir, path, original = _case(tmp_path, cavity_foamfiles)
+    with smoke_control_dict(case_dir, 1000) as smoke_run:
+        assert not smoke_run
+        assert path.read_text() == original
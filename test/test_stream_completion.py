@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stream_completion import FoamCompletionDetector  # noqa: E402
+
+ALLRUN = "#!/bin/sh\ncd ${0%/*} || exit 1\n. $WM_PROJECT_DIR/bin/tools/RunFunctions\n\nrunApplication blockMesh\nrunApplication icoFoam\n"
+FOAMFILE = (
+    "FoamFile\n{\n    version     2.0;\n    format      ascii;\n    class       dictionary;\n    object      controlDict;\n}\n"
+    "// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //\n\n"
+    "application     icoFoam;\n\n"
+    "// ************************************************************************* //\n"
+)
+
+
+def _stream(text, chunk_size=7):
+    detector = FoamCompletionDetector()
+    for position in range(0, len(text), chunk_size):
+        if detector.feed(text[position:position + chunk_size]):
+            break
+    return detector
+
+
+def test_fenced_allrun_with_parameter_expansion_completes():
+    for fence in ("```bash", "```sh", "```"):
+        detector = _stream(f"{fence}\n{ALLRUN}```\nThis script runs the case.")
+        assert detector.complete
+        assert detector.text.endswith("runApplication icoFoam\n```\n")
+
+
+def test_foamfile_completes_at_end_banner():
+    detector = _stream(FOAMFILE + "Some explanation after the file.")
+    assert detector.complete
+    assert detector.text == FOAMFILE
+
+
+def test_fence_inside_an_open_dictionary_does_not_complete():
+    detector = _stream("```\nFoamFile\n{\n    version 2.0;\n}\nsolvers\n{\n```\n")
+    assert not detector.complete